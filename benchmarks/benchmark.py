@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2017, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the BSD 3-Clause License:
+# http://opensource.org/licenses/BSD-3-Clause
+#
+
+'''
+Decoding benchmarks.  Run from the repository root, optionally with the
+names of the benchmarks to run:
+
+    python benchmarks/benchmark.py [unescape] [memo] [compact] [dicts] [key_paths]
+
+Times are the best of several runs, in process time.  Peak memory is from
+`tracemalloc`.  Benchmarks that use options a version of the package does
+not have are skipped, so that the same script can be used to compare
+versions.
+'''
+
+
+from __future__ import (division, print_function, absolute_import,
+                        unicode_literals)
+
+
+import sys
+import os
+import gc
+import time
+import timeit
+import tracemalloc
+if all(os.path.isdir(x) for x in ['bespon', 'benchmarks']):
+    sys.path.insert(0, '.')
+
+import bespon
+
+
+
+
+REPEAT = 7
+N = 100000
+
+
+def best_time(func, repeat=REPEAT):
+    return min(timeit.repeat(func, number=1, repeat=repeat, timer=time.process_time))
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def decoder(**kwargs):
+    '''
+    Return a decoder with the given options, or None if an option is not
+    supported.
+    '''
+    try:
+        return bespon.BespONDecoder(**kwargs)
+    except TypeError:
+        return None
+
+
+def report(benchmark, name, seconds=None, peak=None, extra=None):
+    line = '{0:<10} {1:<34}'.format(benchmark, name)
+    if seconds is not None:
+        line += ' {0:8.3f} s'.format(seconds)
+    if peak is not None:
+        line += ' {0:8.2f} MB peak'.format(peak/1e6)
+    if extra is not None:
+        line += ' ' + extra
+    print(line)
+
+
+
+
+def bench_unescape():
+    '''
+    Strings typical of config files, which rarely contain escapes.
+    '''
+    docs = [('quoted strings, no escapes', '\n'.join('k{0} = "value {0} with spaces"'.format(n) for n in range(N))),
+            ('block strings, no escapes', '\n'.join('k{0} = |"""\n    line one {0}\n    line two\n    |"""/'.format(n) for n in range(N//4))),
+            ('quoted strings, escapes', '\n'.join('k{0} = "tab\\t{0} \\u{{e9}}"'.format(n) for n in range(N)))]
+    dec = bespon.BespONDecoder()
+    for name, doc in docs:
+        report('unescape', name, best_time(lambda: dec.decode(doc)))
+    unescape_unicode = dec._unescape_unicode
+    strings = ['value {0} with spaces'.format(n) for n in range(N)]
+    report('unescape', 'unescape_unicode(), no escapes', best_time(lambda: [unescape_unicode(s) for s in strings]))
+    strings = ['line one {0}\nline two\n'.format(n) for n in range(N)]
+    report('unescape', 'unescape_unicode(), newline', best_time(lambda: [unescape_unicode(s, '\r\n') for s in strings]))
+
+
+def bench_memo():
+    '''
+    Memory retained by a long-lived decoder after many distinct escapes.
+    '''
+    dec = bespon.BespONDecoder()
+    docs = ['\n'.join('k{0} = "\\u{{{1:x}}}"'.format(n, 0x4E00 + m*2000 + n) for n in range(2000)) for m in range(20)]
+    tracemalloc.start()
+    try:
+        # AST nodes refer to their parents, so they are only freed by
+        # garbage collection
+        gc.collect()
+        initial = tracemalloc.get_traced_memory()[0]
+        for doc in docs:
+            dec.decode(doc)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - initial
+    finally:
+        tracemalloc.stop()
+    report('memo', '40000 distinct \\u escapes', extra='{0:8.2f} MB retained, {1} memo entries'.format(retained/1e6, len(dec._unescape._unescape_unicode_dict)))
+
+
+def bench_compact():
+    '''
+    Scalar-heavy documents, with and without `compact_ast`.
+    '''
+    docs = [('list', '\n'.join('* {0}'.format(n) for n in range(N))),
+            ('dict', '\n'.join('k{0} = "v{0}"'.format(n) for n in range(N))),
+            ('records', '\n'.join('* {{id = {0}, name = "n{0}", ok = true, x = 1.5}}'.format(n) for n in range(N//4)))]
+    for compact in (False, True):
+        dec = decoder(compact_ast=True) if compact else bespon.BespONDecoder()
+        if dec is None:
+            continue
+        for name, doc in docs:
+            report('compact', '{0}, compact_ast={1}'.format(name, compact),
+                   best_time(lambda: dec.decode(doc)), peak_memory(lambda: dec.decode(doc)))
+
+
+def bench_dicts():
+    '''
+    Dict-heavy documents.
+    '''
+    docs = [('flat dict', '\n'.join('k{0} = {0}'.format(n) for n in range(N))),
+            ('nested dicts', '\n'.join('k{0} =\n  a = 1\n  b =\n    c = 2'.format(n) for n in range(N//4))),
+            ('inline dicts', '\n'.join('k{0} = {{a = 1, b = {{c = 2}}}}'.format(n) for n in range(N//4)))]
+    dec = bespon.BespONDecoder()
+    for name, doc in docs:
+        report('dicts', name, best_time(lambda: dec.decode(doc)), peak_memory(lambda: dec.decode(doc)))
+
+
+def bench_key_paths():
+    '''
+    Documents made of key paths.
+    '''
+    n = 60000
+    docs = [('kN.b.c.d = 1', '\n'.join('k{0}.b.c.d = 1'.format(m) for m in range(n))),
+            ('kN.b.c.d = 1, kN.b.x = 2', '\n'.join('k{0}.b.c.d = 1\nk{0}.b.x = 2'.format(m) for m in range(n//2))),
+            ('service.http.kN = N', '\n'.join('service.http.k{0} = {0}'.format(m) for m in range(n)))]
+    dec = bespon.BespONDecoder()
+    for name, doc in docs:
+        report('key_paths', name, best_time(lambda: dec.decode(doc)), peak_memory(lambda: dec.decode(doc)))
+
+
+
+
+benchmarks = {'unescape': bench_unescape,
+              'memo': bench_memo,
+              'compact': bench_compact,
+              'dicts': bench_dicts,
+              'key_paths': bench_key_paths}
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or benchmarks:
+        benchmarks[name]()
@@ -17,7 +17,8 @@ from .version import __version__, __version_info__
 
 from .loading import load, loads
 from .dumping import dump, dumps
-from .load_types import LoadType
+from .load_types import LoadType, SpilledBytes
 from .roundtrip import load_roundtrip_ast, loads_roundtrip_ast
 from .decoding import BespONDecoder
+from .incremental import IncrementalDecoder
 from .encoding import BespONEncoder
@@ -14,7 +14,7 @@ from __future__ import (division, print_function, absolute_import,
                         unicode_literals)
 
 import sys
-import collections
+import array
 from . import erring
 from . import astnodes
 from . import grammar
@@ -39,13 +39,16 @@ class Ast(object):
     __slots__ = ['state', 'full_ast', 'max_nesting_depth',
                  'source', 'source_lines', 'root', 'pos', 'section_pos',
                  'scalar_nodes', 'line_comments', 'empty_default',
+                 'compact_nodes',
                  '_unresolved_collection_nodes',
                  '_unresolved_alias_nodes',
                  '_in_tag_cached_pos', '_in_tag_cached_doc_comment',
                  '_first_section', '_last_section',
-                 '_labels']
+                 '_labels', '_alias_sites', '_alias_dependents',
+                 '_key_path_tries', '_key_path_trie_records']
 
-    def __init__(self, state, max_nesting_depth, empty_default=None):
+    def __init__(self, state, max_nesting_depth, empty_default=None,
+                 compact=False, key_path_tries=False):
         self.state = state
         self.full_ast = state.full_ast
         self.max_nesting_depth = max_nesting_depth
@@ -57,6 +60,13 @@ class Ast(object):
         if self.full_ast:
             self.scalar_nodes = []
             self.line_comments = []
+            self.compact_nodes = None
+        elif compact:
+            # Scalars are only needed for their values and locations once
+            # they are in a collection, so they may be stored compactly
+            self.compact_nodes = astnodes.CompactNodeStore(state)
+        else:
+            self.compact_nodes = None
         self._unresolved_collection_nodes = []
         self._unresolved_alias_nodes = []
         self._in_tag_cached_pos = None
@@ -64,6 +74,20 @@ class Ast(object):
         self._first_section = None
         self._last_section = None
         self._labels = {}
+        self._alias_sites = {}
+        self._alias_dependents = None
+        # Key paths may build tries of plain dicts when a full AST isn't
+        # needed
+        self._key_path_tries = [] if key_path_tries and not self.full_ast else None
+        # For each key path added to a trie, the start of the previous record
+        # for the trie plus one (zero for none); the first lineno, first
+        # colno, and last colno of the key path; the first lineno and first
+        # colno including any doc comment; and the first lineno, first colno,
+        # last lineno, and last colno of the value, if any
+        if self._key_path_tries is None:
+            self._key_path_trie_records = None
+        else:
+            self._key_path_trie_records = array.array('L')
 
     def __bool__(self):
         if len(self.root) > 0:
@@ -74,7 +98,8 @@ class Ast(object):
         __nonzero__ = __bool__
 
 
-    def _indentation_climb_to_indent(self, state_or_scalar_node, pos, len=len):
+    def _indentation_climb_to_indent(self, state_or_scalar_node, pos,
+                                     KeyPathTrieNode=astnodes.KeyPathTrieNode, len=len):
         '''
         Starting at `pos`, climb to a higher level in the AST with less
         indentation that is potentially compatible with `state_or_scalar_node`.
@@ -90,6 +115,9 @@ class Ast(object):
         section_pos = self.section_pos
         while (len_indent < len(pos.indent) or pos.key_path_parent is not None) and pos is not section_pos and parent is not root:
             if pos._open:
+                if type(pos) is KeyPathTrieNode:
+                    # Errors refer to the level of the trie where data ended
+                    pos = pos._materialize()
                 if pos.implicit_type == 'dict':
                     if not pos:
                         raise erring.ParseError('An indentation-style dict-like object cannot be empty', pos)
@@ -108,7 +136,7 @@ class Ast(object):
         return pos
 
 
-    def _section_climb_to_root(self, pos):
+    def _section_climb_to_root(self, pos, KeyPathTrieNode=astnodes.KeyPathTrieNode):
         '''
         Starting at `pos`, climb to the highest level in the AST below root,
         which is where sections may be created.
@@ -118,6 +146,9 @@ class Ast(object):
         parent = pos.parent
         while parent is not root:
             if pos._open:
+                if type(pos) is KeyPathTrieNode:
+                    # Errors refer to the level of the trie where data ended
+                    pos = pos._materialize()
                 if pos.implicit_type == 'dict':
                     if not pos:
                         raise erring.ParseError('An indentation-style dict-like object cannot be empty', pos)
@@ -136,7 +167,7 @@ class Ast(object):
         return pos
 
 
-    def _key_path_climb_to_start(self, pos):
+    def _key_path_climb_to_start(self, pos, KeyPathTrieNode=astnodes.KeyPathTrieNode):
         '''
         Starting at `pos`, which was created by a key path, climb to the
         higher level in that AST corresponding to the top of the key path.
@@ -145,6 +176,9 @@ class Ast(object):
         last_lineno = pos.last_lineno
         last_colno = pos.last_colno
         if pos._open:
+            if type(pos) is KeyPathTrieNode:
+                # Errors refer to the level of the trie where data ended
+                pos = pos._materialize()
             if pos.implicit_type == 'dict':
                 if not pos:
                     raise erring.ParseError('An indentation-style dict-like object cannot be empty', pos)
@@ -190,6 +224,10 @@ class Ast(object):
             return
         if not state.next_scalar_is_keyable:
             raise erring.ParseError('Object is not a valid key for a dict-like object', scalar_node)
+        if state.intern_keys:
+            key = scalar_node.final_val
+            if type(key) is str:
+                scalar_node.final_val = state.intern_table.setdefault(key, key)
         if scalar_node.tag is not None and scalar_node.tag.label is not None:
             raise erring.ParseError('Labeling dict keys is not supported', scalar_node)
         # Temp variables must be used with care; otherwise, don't update self
@@ -233,7 +271,16 @@ class Ast(object):
         state.next_scalar = None
         state.next_cache = False
         if not scalar_node._resolved:
+            # Only aliases are unresolved
             self._unresolved_alias_nodes.append(scalar_node)
+            try:
+                self._alias_sites[scalar_node.target_label].append(scalar_node)
+            except KeyError:
+                self._alias_sites[scalar_node.target_label] = [scalar_node]
+        elif state.intern_values:
+            val = scalar_node.final_val
+            if type(val) is str and len(val) <= state.intern_values:
+                scalar_node.final_val = state.intern_table.setdefault(val, val)
         if self.section_pos is not self.pos:
             self.pos.check_append_scalar_val(scalar_node)
         else:
@@ -248,11 +295,13 @@ class Ast(object):
         # inline mode, that would be taken care of by closing delimiters.
         # In indentation mode, keys and list element openers `*` can trigger
         # climbing the AST based on indentation.
-        self._unresolved_collection_nodes.append(collection_node)
         if self.section_pos is not self.pos:
             self.pos.check_append_collection(collection_node)
         else:
             self.pos.check_append_key_path_collection(collection_node)
+        # Append after any key path trie at the current position has been
+        # replaced by nodes, so that the collection follows its parent
+        self._unresolved_collection_nodes.append(collection_node)
         # Wait to check nesting depth until after appending, because nesting
         # depth is inherited from parent, and parent is set during appending.
         if collection_node.nesting_depth > self.max_nesting_depth:
@@ -260,16 +309,21 @@ class Ast(object):
         self.pos = collection_node
 
 
-    def _append_key_path_collection(self, collection_node):
+    def _append_key_path_collection(self, collection_node, parent=None):
         '''
-        Append a collection created within a key path.
+        Append a collection created within a key path.  By default, the
+        collection is appended at the current position.  When a key path
+        passes through pre-existing collections, `parent` is the last of
+        these, which is where the collection must go.
         '''
         # There is never a need to climb to a higher level in the AST.  In
         # inline mode, that would be taken care of by closing delimiters.
         # In indentation mode, keys and list element openers `*` can trigger
         # climbing the AST based on indentation.
+        if parent is None:
+            parent = self.pos
+        parent.check_append_key_path_collection(collection_node)
         self._unresolved_collection_nodes.append(collection_node)
-        self.pos.check_append_key_path_collection(collection_node)
         if collection_node.nesting_depth > self.max_nesting_depth:
             raise erring.ParseError('Max nesting depth for collections was exceeded; max depth = {0}'.format(self.max_nesting_depth), collection_node)
         self.pos = collection_node
@@ -313,8 +367,8 @@ class Ast(object):
             self.pos = pos
         else:
             key_path_parent = pos.key_path_parent
-            last_lineno = state.last_lineno
-            last_colno = state.last_colno
+            last_lineno = state.lineno
+            last_colno = state.colno
             while pos is not key_path_parent:
                 pos.last_lineno = last_lineno
                 pos.last_colno = last_colno
@@ -324,7 +378,9 @@ class Ast(object):
             for kp_elem in pos._key_path_scope:
                 kp_elem._key_path_traversable = False
             pos._key_path_scope = None
-            self.pos = pos.parent
+            pos = pos.parent
+            state.inline = pos.inline
+            self.pos = pos
 
 
     def start_inline_list(self, ListlikeNode=astnodes.ListlikeNode,
@@ -519,7 +575,9 @@ class Ast(object):
     def _append_key_path(self, kp_node,
                          open_indentation_list=OPEN_INDENTATION_LIST,
                          DictlikeNode=astnodes.DictlikeNode,
-                         ListlikeNode=astnodes.ListlikeNode, len=len):
+                         ListlikeNode=astnodes.ListlikeNode,
+                         KeyPathTrieNode=astnodes.KeyPathTrieNode,
+                         len=len, type=type):
         '''
         Create the AST node corresponding to the elements in a key path.
         '''
@@ -528,6 +586,8 @@ class Ast(object):
             raise erring.ParseError('Key paths are not valid in tags', kp_node)
         pos = self.pos
         if kp_node.inline:
+            if type(pos) is KeyPathTrieNode:
+                pos = pos._materialize()
             initial_pos = pos
         elif pos is self.section_pos:
             dict_node = DictlikeNode(kp_node)
@@ -549,29 +609,58 @@ class Ast(object):
                 raise erring.IndentationError(kp_node)
             initial_pos = pos
         pos = initial_pos
-        for kp_elem, next_kp_elem in zip(kp_node[:-1], kp_node[1:]):
-            if pos.implicit_type == 'dict' and kp_elem.final_val in pos:
-                key_node = pos.key_nodes[kp_elem.final_val]
-                pos = pos[kp_elem.final_val]
-                if state.full_ast:
-                    if key_node.key_path_occurrences is None:
-                        key_node.key_path_occurrences = [kp_elem]
-                    else:
-                        key_node.key_path_occurrences.append(kp_elem)
-                if not pos._key_path_traversable:
-                    raise erring.ParseError('Key path encountered an object that already exists, or a pre-existing node that was created outside of the current scope and is now locked', kp_elem, pos)
-            else:
-                pos.check_append_key_path_scalar_key(kp_elem)
-                if next_kp_elem == open_indentation_list:
+        full_ast = state.full_ast
+        len_kp_node_minus_one = len(kp_node) - 1
+        if (self._key_path_tries is not None and type(pos) is DictlikeNode and
+                len_kp_node_minus_one > 0 and open_indentation_list not in kp_node):
+            trie_node = pos.get(kp_node[0].final_val)
+            # Levels take their indentation from the key path that creates
+            # them, so a trie is only used by key paths with the same
+            # indentation as the key path that created it
+            if trie_node is None or (type(trie_node) is KeyPathTrieNode and
+                                     kp_node.external_indent == trie_node.indent and
+                                     kp_node.external_at_line_start == trie_node.at_line_start and
+                                     kp_node.inline == trie_node.inline and
+                                     kp_node.inline_indent == trie_node.inline_indent):
+                if self._append_key_path_to_trie(kp_node, pos, trie_node):
+                    return
+        # Walk through existing collections created by key paths in the
+        # current scope, then create any remaining levels.  Once a level is
+        # created, all following levels must be new as well.
+        index = 0
+        while index < len_kp_node_minus_one:
+            kp_elem = kp_node[index]
+            key = kp_elem.final_val
+            if pos.implicit_type != 'dict' or key not in pos:
+                break
+            if full_ast:
+                key_node = pos.key_nodes[key]
+                if key_node.key_path_occurrences is None:
+                    key_node.key_path_occurrences = [kp_elem]
+                else:
+                    key_node.key_path_occurrences.append(kp_elem)
+            pos = pos[key]
+            if pos.implicit_type not in ('dict', 'list') or not pos._key_path_traversable:
+                raise erring.ParseError('Key path encountered an object that already exists, or a pre-existing node that was created outside of the current scope and is now locked', kp_elem, pos)
+            if type(pos) is KeyPathTrieNode:
+                # Continue with the node that replaces the trie
+                pos._materialize()
+                pos = pos.parent[pos.index]
+            index += 1
+        if index < len_kp_node_minus_one:
+            key_path_scope = initial_pos._key_path_scope
+            if key_path_scope is None:
+                key_path_scope = initial_pos._key_path_scope = []
+            while index < len_kp_node_minus_one:
+                pos.check_append_key_path_scalar_key(kp_node[index])
+                if kp_node[index+1] == open_indentation_list:
                     collection_node = ListlikeNode(kp_node, key_path_parent=initial_pos, _key_path_traversable=True)
                 else:
                     collection_node = DictlikeNode(kp_node, key_path_parent=initial_pos, _key_path_traversable=True)
-                self._append_key_path_collection(collection_node)
+                self._append_key_path_collection(collection_node, pos)
                 pos = collection_node
-                if initial_pos._key_path_scope is None:
-                    initial_pos._key_path_scope = [collection_node]
-                else:
-                    initial_pos._key_path_scope.append(collection_node)
+                key_path_scope.append(collection_node)
+                index += 1
         if kp_node[-1] == open_indentation_list:
             if pos.implicit_type != 'list':
                 raise erring.ParseError('Key path cannot open list; incompatible with pre-existing object', kp_node, pos)
@@ -581,10 +670,205 @@ class Ast(object):
         self.pos = pos
 
 
+    def _append_key_path_to_trie(self, kp_node, initial_pos, trie_node,
+                                 KeyPathTrieNode=astnodes.KeyPathTrieNode,
+                                 dict=dict, len=len, type=type):
+        '''
+        Append a key path without a list opener `*` to the key path trie
+        that starts at `initial_pos`, creating the trie if `trie_node` is
+        None.  Returns False when the key path would result in an error,
+        such as a duplicate key or a key path passing through a value or a
+        locked collection.  The trie is then replaced by nodes, so that the
+        error is raised by the usual key path handling, with the same
+        locations as without tries.
+        '''
+        len_kp_node_minus_one = len(kp_node) - 1
+        if trie_node is None:
+            if initial_pos.nesting_depth + len_kp_node_minus_one > self.max_nesting_depth:
+                return False
+            initial_pos.check_append_key_path_scalar_key(kp_node[0])
+            trie_node = KeyPathTrieNode(kp_node, initial_pos)
+            initial_pos.check_append_key_path_collection(trie_node)
+            key_path_scope = initial_pos._key_path_scope
+            if key_path_scope is None:
+                key_path_scope = initial_pos._key_path_scope = []
+            key_path_scope.append(trie_node)
+            self._key_path_tries.append(trie_node)
+        elif not trie_node._key_path_traversable or trie_node._awaiting_val:
+            trie_node._materialize()
+            return False
+        level = trie_node.final_val
+        index = 1
+        while index < len_kp_node_minus_one:
+            key = kp_node[index].final_val
+            if key not in level:
+                break
+            level = level[key]
+            if type(level) is not dict:
+                trie_node._materialize()
+                return False
+            index += 1
+        if index < len_kp_node_minus_one:
+            if trie_node.nesting_depth + len_kp_node_minus_one - 1 > self.max_nesting_depth:
+                trie_node._materialize()
+                return False
+            while index < len_kp_node_minus_one:
+                next_level = {}
+                level[kp_node[index].final_val] = next_level
+                level = next_level
+                index += 1
+        elif kp_node[-1].final_val in level:
+            trie_node._materialize()
+            return False
+        kp_elem = kp_node[-1]
+        locations = self._key_path_trie_records
+        last_location = trie_node._last_location
+        trie_node._last_location = len(locations)
+        locations.extend((0 if last_location is None else last_location + 1,
+                          kp_node.first_lineno, kp_node.first_colno, kp_node.last_colno,
+                          kp_node.external_first_lineno, kp_node.external_first_colno,
+                          0, 0, 0, 0))
+        trie_node._level = level
+        trie_node._next_key = kp_elem.final_val
+        trie_node._next_key_node = kp_elem
+        trie_node.last_lineno = kp_elem.last_lineno
+        trie_node.last_colno = kp_elem.last_colno
+        trie_node._awaiting_val = True
+        trie_node._open = True
+        self.pos = trie_node
+        return True
+
+
+    def _key_path_trie_locations(self, trie_node, len=len):
+        '''
+        Find the locations of the keys and values in a key path trie, and of
+        the levels below it, from the locations of the key paths and values
+        that were added to it.  Key paths are split into elements again from
+        the source.  Keys and levels are located by the key paths that
+        created them, and levels end with the last value added to them or
+        to levels they contain.
+        '''
+        state = self.state
+        source_lines = state.source_lines
+        key_path_elems = state.key_path_elems
+        locations = self._key_path_trie_records
+        record_starts = []
+        record_start = trie_node._last_location
+        while record_start is not None:
+            record_starts.append(record_start)
+            previous = locations[record_start]
+            record_start = previous - 1 if previous else None
+        # Keys and values are identified by the id of their level and by
+        # their key
+        key_locations = {}
+        val_locations = {}
+        level_locations = {}
+        for record_start in reversed(record_starts):
+            (lineno, first_colno, last_colno, external_lineno, external_colno,
+             val_first_lineno, val_first_colno, val_last_lineno, val_last_colno) = locations[record_start+1:record_start+10]
+            offset = first_colno - 1
+            if lineno == 1:
+                offset += state.bom_offset
+            kp_elems = key_path_elems[source_lines[lineno-1][offset:offset+last_colno-first_colno+1]]
+            if val_first_lineno:
+                val_location = (val_first_lineno, val_first_colno, val_last_lineno, val_last_colno)
+                end = (val_last_lineno, val_last_colno)
+            else:
+                # The last key path may still be waiting for its value
+                val_location = None
+                end = (lineno, last_colno)
+            level = trie_node.final_val
+            last_index = len(kp_elems) - 1
+            for index in range(1, last_index + 1):
+                key, implicit_type, first_offset, last_offset = kp_elems[index]
+                level_key = (id(level), key)
+                if index == last_index:
+                    key_locations[level_key] = (lineno, first_colno + first_offset, first_colno + last_offset, implicit_type)
+                    if val_location is not None:
+                        val_locations[level_key] = val_location
+                    break
+                if level_key not in key_locations:
+                    key_locations[level_key] = (lineno, first_colno + first_offset, first_colno + last_offset, implicit_type)
+                level = level[key]
+                level_location = level_locations.get(id(level))
+                if level_location is None:
+                    level_locations[id(level)] = [external_lineno, external_colno, end[0], end[1]]
+                elif end > tuple(level_location[2:]):
+                    level_location[2:] = end
+        return (key_locations, val_locations, level_locations)
+
+
+    def _materialize_key_path_trie(self, trie_node,
+                                   DictlikeNode=astnodes.DictlikeNode,
+                                   KeyPathElementNode=astnodes.KeyPathElementNode,
+                                   trie_implicit_types=astnodes.TRIE_IMPLICIT_TYPES,
+                                   dict=dict, type=type):
+        '''
+        Replace a key path trie with the dict-like nodes that key paths would
+        otherwise have created, and return the node for the trie's current
+        level.  Keys and values that were stored directly are given nodes at
+        their original locations.
+        '''
+        if trie_node._materialized_node is not None:
+            return trie_node._materialized_node
+        state = self.state
+        key_path_parent = trie_node.key_path_parent
+        key_path_scope = key_path_parent._key_path_scope
+        traversable = trie_node._key_path_traversable
+        unresolved_collection_nodes = self._unresolved_collection_nodes
+        key_locations, val_locations, level_locations = self._key_path_trie_locations(trie_node)
+        current_level = trie_node._level
+        current_node = None
+        stack = [(trie_node.final_val, key_path_parent, trie_node.index)]
+        while stack:
+            level, parent, index = stack.pop()
+            node = DictlikeNode(trie_node, key_path_parent=key_path_parent, _key_path_traversable=True)
+            node._key_path_traversable = traversable
+            if level is not trie_node.final_val:
+                node.first_lineno, node.first_colno, node.last_lineno, node.last_colno = level_locations[id(level)]
+            if level is trie_node.final_val or level is current_level:
+                # These end with the latest data, like the trie
+                node.last_lineno = trie_node.last_lineno
+                node.last_colno = trie_node.last_colno
+            parent[index] = node
+            node.parent = parent
+            node.index = index
+            node.nesting_depth = parent.nesting_depth + 1
+            parent._unresolved_dependency_count += 1
+            unresolved_collection_nodes.append(node)
+            if key_path_scope is not None:
+                key_path_scope.append(node)
+            key_nodes = node.key_nodes
+            for key, val in level.items():
+                lineno, first_colno, last_colno, implicit_type = key_locations[(id(level), key)]
+                key_nodes[key] = KeyPathElementNode(state, lineno, first_colno, last_colno, implicit_type, key)
+                if type(val) is dict:
+                    # Placeholder that keeps key order
+                    node[key] = None
+                    stack.append((val, node, key))
+                else:
+                    first_lineno, first_colno, last_lineno, last_colno = val_locations[(id(level), key)]
+                    val_node = KeyPathElementNode(state, first_lineno, first_colno, last_colno, trie_implicit_types[type(val)], val)
+                    val_node.last_lineno = last_lineno
+                    node[key] = val_node
+            if level is current_level:
+                current_node = node
+        if trie_node._awaiting_val:
+            current_node.key_nodes[trie_node._next_key] = trie_node._next_key_node
+            current_node._next_key = trie_node._next_key
+            current_node._awaiting_val = True
+        current_node._open = trie_node._open
+        trie_node._materialized_node = current_node
+        if self.pos is trie_node:
+            self.pos = current_node
+        return current_node
+
+
     def start_section(self, section_node,
                       open_indentation_list=OPEN_INDENTATION_LIST,
                       DictlikeNode=astnodes.DictlikeNode,
-                      ListlikeNode=astnodes.ListlikeNode):
+                      ListlikeNode=astnodes.ListlikeNode,
+                      KeyPathTrieNode=astnodes.KeyPathTrieNode):
         '''
         Start a section.
         '''
@@ -632,22 +916,25 @@ class Ast(object):
                     if pos.implicit_type != 'dict':
                         raise erring.ParseError('Key path is incompatible with previously created object', kp_elem, pos)
                     if kp_elem.final_val in pos:
+                        key_node = pos.key_nodes[kp_elem.final_val]
                         pos = pos[kp_elem.final_val]
-                        key_node = pos.index
                         if state.full_ast:
                             if key_node.key_path_occurrences is None:
                                 key_node.key_path_occurrences = [kp_elem]
                             else:
                                 key_node.key_path_occurrences.append(kp_elem)
-                        if not pos._key_path_traversable:
+                        if pos.implicit_type not in ('dict', 'list') or not pos._key_path_traversable:
                             raise erring.ParseError('Key path cannot pass through a pre-existing node that was created outside of the current scope and is now locked', kp_elem, pos)
+                        if type(pos) is KeyPathTrieNode:
+                            pos._materialize()
+                            pos = pos.parent[pos.index]
                     else:
                         pos.check_append_key_path_scalar_key(kp_elem)
                         if next_kp_elem == open_indentation_list:
                             collection_node = ListlikeNode(kp_node, key_path_parent=initial_pos, _key_path_traversable=True)
                         else:
                             collection_node = DictlikeNode(kp_node, key_path_parent=initial_pos, _key_path_traversable=True)
-                        self._append_key_path_collection(collection_node)
+                        self._append_key_path_collection(collection_node, pos)
                         pos = collection_node
                 if kp_node[-1] == open_indentation_list:
                     pos._open = True
@@ -682,6 +969,119 @@ class Ast(object):
         self._labels[node.tag.label] = node
 
 
+    def label_node(self, label):
+        '''
+        Return the node with a given label.
+        '''
+        try:
+            return self._labels[label]
+        except KeyError:
+            raise KeyError('Label "{0}" does not exist'.format(label))
+
+
+    def alias_sites(self, label):
+        '''
+        Return a list of all alias nodes that refer to a given label (or to
+        a path starting at the label), in the order in which they appear.
+        '''
+        try:
+            return self._alias_sites[label][:]
+        except KeyError:
+            return []
+
+
+    def alias_dependents(self, node):
+        '''
+        Return a list of all alias nodes whose target is a given node, after
+        all aliases have been resolved.
+        '''
+        alias_dependents = self._alias_dependents
+        if alias_dependents is None:
+            alias_dependents = {}
+            for alias_nodes in self._alias_sites.values():
+                for alias_node in alias_nodes:
+                    target_id = id(alias_node.target_node)
+                    try:
+                        alias_dependents[target_id].append(alias_node)
+                    except KeyError:
+                        alias_dependents[target_id] = [alias_node]
+            self._alias_dependents = alias_dependents
+        try:
+            return alias_dependents[id(node)][:]
+        except KeyError:
+            return []
+
+
+    def walk(self, node=None, implicit_types=None, events=False,
+             tuple=tuple, type=type, reversed=reversed):
+        '''
+        Iterate over nodes in document order (pre-order), starting at `node`
+        or at the root data node.  Doc comments and tags come before the
+        nodes they belong to, and keys before their values.  Aliases are not
+        followed.
+
+        If `implicit_types` is given, only nodes with those implicit types
+        are given, although all nodes are still traversed.  If `events` is
+        true, `("enter", node)` and `("exit", node)` pairs are given instead,
+        with the exit of a collection following all of its contents.
+
+        This uses an explicit stack, so that the time per node does not
+        depend on nesting depth.
+        '''
+        if node is None:
+            if not self.root:
+                return
+            node = self.root[0]
+        if implicit_types is not None and not isinstance(implicit_types, (set, frozenset)):
+            implicit_types = set(implicit_types)
+        # Stack entries are nodes waiting to be entered, or tuples for
+        # collection exit events.
+        stack = [node]
+        if node.implicit_type not in ('doc_comment', 'tag'):
+            if node.tag is not None:
+                stack.append(node.tag)
+            if node.doc_comment is not None:
+                stack.append(node.doc_comment)
+        push = stack.append
+        pop = stack.pop
+        while stack:
+            node = pop()
+            if type(node) is tuple:
+                if implicit_types is None or node[1].implicit_type in implicit_types:
+                    yield node
+                continue
+            implicit_type = node.implicit_type
+            selected = implicit_types is None or implicit_type in implicit_types
+            if selected:
+                if events:
+                    yield ('enter', node)
+                else:
+                    yield node
+            if implicit_type == 'dict':
+                children = []
+                key_nodes = node.key_nodes
+                # Keys that have been replaced in a roundtrip AST may have
+                # a separate order
+                key_order = node._key_order
+                for k in (node if key_order is None else key_order):
+                    children.append(key_nodes[k])
+                    children.append(node[k])
+            elif implicit_type == 'list':
+                children = node
+            else:
+                if events and selected:
+                    yield ('exit', node)
+                continue
+            if events:
+                push(('exit', node))
+            for child in reversed(children):
+                push(child)
+                if child.tag is not None:
+                    push(child.tag)
+                if child.doc_comment is not None:
+                    push(child.doc_comment)
+
+
     def _resolve(self, home_alias=grammar.LIT_GRAMMAR['home_alias'],
                  self_alias=grammar.LIT_GRAMMAR['self_alias'],
                  dict=dict, list=list, set=set, reversed=reversed, len=len,
@@ -972,12 +1372,11 @@ class Ast(object):
         raise ValueError
 
 
-    def _resolve_dict_config(self, dict_node, dict_tag,
-                             OrderedDict=collections.OrderedDict):
+    def _resolve_dict_config(self, dict_node, dict_tag, dict=dict):
         '''
         Resolve a dict-like node with collection configuration.
         '''
-        config_nodes = OrderedDict()
+        config_nodes = dict()
         if 'init' in dict_tag:
             init_aliases = dict_tag['init']
             if init_aliases.implicit_type == 'alias':
@@ -1074,7 +1473,7 @@ class Ast(object):
         list_tag.collection_config_nodes = config_nodes
 
 
-    def finalize(self):
+    def finalize(self, KeyPathTrieNode=astnodes.KeyPathTrieNode):
         '''
         Check AST for errors and return to root node.
         '''
@@ -1085,10 +1484,13 @@ class Ast(object):
                 raise erring.ParseError('The last section has an end delimiter, unlike preceding sections; section end delimiters must be used for all sections, or not at all', self._last_section)
         # Temp variables must be used with care; otherwise, don't update self
         state = self.state
-        pos = self.pos
         root = self.root
         if state.next_scalar:
             self.append_scalar_val()
+        pos = self.pos
+        if type(pos) is KeyPathTrieNode and pos.inline:
+            # Errors refer to the level of the trie where data ended
+            pos = pos._materialize()
         if state.next_cache:
             raise erring.ParseError('Data ended before a tag or doc comment was resolved', state, unresolved_cache=True)
         if pos.inline:
@@ -1105,6 +1507,10 @@ class Ast(object):
         elif pos is not root:
             while pos is not root:
                 if pos._open:
+                    if type(pos) is KeyPathTrieNode:
+                        # Errors refer to the level of the trie where data
+                        # ended
+                        pos = pos._materialize()
                     if pos.implicit_type == 'dict':
                         if not pos:
                             raise erring.ParseError('An indentation-style dict-like object cannot be empty', pos)
@@ -1120,6 +1526,13 @@ class Ast(object):
                     pos._key_path_scope = None
                 pos = parent
             self.pos = pos
+        if self._key_path_tries and any(node.target_path is not None for node in self._unresolved_alias_nodes):
+            # Alias paths pass through nodes, so tries must be replaced.  When
+            # errors are being collected, a trie may already have been
+            # replaced by the value of a duplicate key.
+            for trie_node in self._key_path_tries:
+                if trie_node.parent[trie_node.index] is trie_node:
+                    self._materialize_key_path_trie(trie_node)
         self._resolve()
         # Update source with final locations
         self.source.last_lineno = state.lineno
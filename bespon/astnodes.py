@@ -17,7 +17,7 @@ Abstract syntax tree (AST) nodes.
 from __future__ import (division, print_function, absolute_import,
                         unicode_literals)
 
-import collections
+import array
 import itertools
 from . import grammar
 from . import load_types
@@ -47,6 +47,11 @@ _reserved_word_types = {grammar.LIT_GRAMMAR['none_type']: 'none',
                         grammar.LIT_GRAMMAR['bool_true']: 'bool',
                         grammar.LIT_GRAMMAR['bool_false']: 'bool'}
 
+# Final values that may be stored directly in key path tries, with the
+# implicit types of the scalars that produce them under the default parsers
+TRIE_IMPLICIT_TYPES = {type(None): 'none', bool: 'bool', int: 'int',
+                       float: 'float', type(''): 'str'}
+
 
 
 
@@ -179,7 +184,7 @@ class RootNode(list):
             raise erring.IndentationError(node)
         self.append(node)
         node.parent = self
-        node.index = len(self)
+        node.index = len(self) - 1
         node.nesting_depth = self.nesting_depth + 1
         self._unresolved_dependency_count += 1
         self.indent = node.external_indent
@@ -300,7 +305,21 @@ def _set_tag_doc_comment_externals(self, state, block=False, len=len):
         self.external_first_lineno = self.first_lineno
         self.external_first_colno = self.first_colno
     else:
-        raise erring.ParseError('Tag is incompatible with object', tag_node, self)
+        state.recover(erring.ParseError('Tag is incompatible with object', tag_node, self))
+        # When errors are being collected, continue as if there were no tag
+        self.doc_comment = doc_comment_node
+        self.tag = None
+        state.next_tag = None
+        state.next_doc_comment = None
+        state.next_cache = False
+        if doc_comment_node is None:
+            external_node = tag_node
+        else:
+            external_node = doc_comment_node
+        self.external_indent = external_node.indent
+        self.external_at_line_start = external_node.at_line_start
+        self.external_first_lineno = external_node.first_lineno
+        self.external_first_colno = external_node.first_colno
 
 
 
@@ -388,6 +407,110 @@ class FullScalarNode(object):
 
 
 
+class CompactScalarNode(object):
+    '''
+    Stand-in for a `ScalarNode` whose data is in a `CompactNodeStore`.
+    '''
+    __slots__ = ['_store', '_id', 'final_val']
+
+    tag = None
+    doc_comment = None
+    _resolved = True
+    _key_path_traversable = False
+
+    def __init__(self, store, node_id, final_val):
+        self._store = store
+        self._id = node_id
+        self.final_val = final_val
+
+    @property
+    def _state(self):
+        return self._store._state
+
+    @property
+    def implicit_type(self):
+        return self._store.implicit_types[self._store.implicit_type_ids[self._id]]
+
+    @property
+    def first_lineno(self):
+        return self._store.locations[4*self._id]
+
+    @property
+    def first_colno(self):
+        return self._store.locations[4*self._id+1]
+
+    @property
+    def last_lineno(self):
+        return self._store.locations[4*self._id+2]
+
+    @property
+    def last_colno(self):
+        return self._store.locations[4*self._id+3]
+
+
+class CompactNodeStore(object):
+    '''
+    Compact storage for resolved, untagged scalar nodes that have been added
+    to a collection when a full AST is not being created.  At that point,
+    only the final value, the implicit type, and the location (for error
+    messages) are still needed.  Implicit types and locations are stored in
+    arrays indexed by node id, and collections hold lightweight
+    `CompactScalarNode` objects in place of full scalar nodes.
+    '''
+    __slots__ = ['_state', 'implicit_type_ids', 'locations', '_free_node']
+
+    implicit_types = ('none', 'bool', 'int', 'float', 'complex', 'rational', 'str')
+    implicit_types_to_ids = {t: n for n, t in enumerate(implicit_types)}
+
+    def __init__(self, state):
+        self._state = state
+        self.implicit_type_ids = array.array('B')
+        # First lineno, first colno, last lineno, last colno for each node
+        self.locations = array.array('L')
+        # Last node that was compacted, which may be reused
+        self._free_node = None
+
+    def __len__(self):
+        return len(self.implicit_type_ids)
+
+    def compact(self, node, CompactScalarNode=CompactScalarNode, ScalarNode=ScalarNode,
+                len=len, type=type):
+        '''
+        Return a compact equivalent of a scalar node.  Nodes that are not
+        plain, resolved scalars are returned unchanged.
+        '''
+        if node.tag is not None or not node._resolved:
+            return node
+        implicit_type_id = self.implicit_types_to_ids.get(node.implicit_type)
+        if implicit_type_id is None:
+            return node
+        implicit_type_ids = self.implicit_type_ids
+        node_id = len(implicit_type_ids)
+        implicit_type_ids.append(implicit_type_id)
+        self.locations.extend((node.first_lineno, node.first_colno, node.last_lineno, node.last_colno))
+        if type(node) is ScalarNode:
+            self._free_node = node
+        return CompactScalarNode(self, node_id, node.final_val)
+
+    def new_scalar_node(self, state, first_lineno, first_colno, last_lineno, last_colno,
+                        implicit_type, delim=None, block=False, ScalarNode=ScalarNode):
+        '''
+        Create a `ScalarNode`, reusing the last node that was compacted when
+        possible.  A compacted node is no longer referenced, since only its
+        compact equivalent is kept.
+        '''
+        node = self._free_node
+        if node is None:
+            return ScalarNode(state, first_lineno, first_colno, last_lineno, last_colno,
+                              implicit_type, delim, block)
+        self._free_node = None
+        node.__init__(state, first_lineno, first_colno, last_lineno, last_colno,
+                      implicit_type, delim, block)
+        return node
+
+
+
+
 class CommentNode(object):
     '''
     Line comment or doc comment.
@@ -522,31 +645,37 @@ class ListlikeNode(list):
                     raise erring.IndentationError(node)
                 self.internal_indent = node.external_indent
             else:
-                raise erring.IndentationError(node)
+                self._state.recover(erring.IndentationError(node))
+        self.last_lineno = node.last_lineno
+        self.last_colno = node.last_colno
+        compact_nodes = self._state.ast.compact_nodes
+        if compact_nodes is not None:
+            node = compact_nodes.compact(node)
         self.append(node)
         if not node._resolved:
             node.parent = self
-            node.index = len(self)
+            node.index = len(self) - 1
             self._unresolved_dependency_count += 1
         elif self._state.full_ast:
             node.parent = self
-            node.index = len(self)
-        self.last_lineno = node.last_lineno
-        self.last_colno = node.last_colno
+            node.index = len(self) - 1
         self._open = False
 
 
     def check_append_key_path_scalar_val(self, node, len=len):
+        self.last_lineno = node.last_lineno
+        self.last_colno = node.last_colno
+        compact_nodes = self._state.ast.compact_nodes
+        if compact_nodes is not None:
+            node = compact_nodes.compact(node)
         self.append(node)
         if not node._resolved:
             node.parent = self
-            node.index = len(self)
+            node.index = len(self) - 1
             self._unresolved_dependency_count += 1
         elif self._state.full_ast:
             node.parent = self
-            node.index = len(self)
-        self.last_lineno = node.last_lineno
-        self.last_colno = node.last_colno
+            node.index = len(self) - 1
         self._open = False
 
 
@@ -570,7 +699,7 @@ class ListlikeNode(list):
                 raise erring.IndentationError(node)
         self.append(node)
         node.parent = self
-        node.index = len(self)
+        node.index = len(self) - 1
         node.nesting_depth = self.nesting_depth + 1
         self.last_lineno = node.last_lineno
         self.last_colno = node.last_colno
@@ -580,7 +709,7 @@ class ListlikeNode(list):
     def check_append_key_path_collection(self, node, len=len):
         self.append(node)
         node.parent = self
-        node.index = len(self)
+        node.index = len(self) - 1
         node.nesting_depth = self.nesting_depth + 1
         self.last_lineno = node.last_lineno
         self.last_colno = node.last_colno
@@ -589,19 +718,22 @@ class ListlikeNode(list):
 
 
 
-class DictlikeNode(collections.OrderedDict):
+class DictlikeNode(dict):
     '''
-    Dict-like collection.
+    Dict-like collection.  This is based on `dict`, which preserves insertion
+    order under all supported versions of Python.  Order-preserving types
+    such as `odict` are only used for final values, when requested by tags.
     '''
     __slots__ = (_node_common_slots + _node_data_slots +
                  _node_collection_slots +
-                 ['_next_key', '_awaiting_val', 'key_nodes', 'start_trailing_comment', 'end_trailing_comment'])
+                 ['_next_key', '_awaiting_val', 'key_nodes', '_key_order', '_key_index',
+                  'start_trailing_comment', 'end_trailing_comment'])
 
     def __init__(self, state_or_scalar_node,
                  set_tag_doc_comment_externals=_set_tag_doc_comment_externals,
                  key_path_parent=None, _key_path_traversable=False,
-                 OrderedDict=collections.OrderedDict):
-        OrderedDict.__init__(self)
+                 dict=dict):
+        dict.__init__(self)
 
         self.view = None
         self.start_trailing_comment = None
@@ -614,6 +746,8 @@ class DictlikeNode(collections.OrderedDict):
         self._key_path_scope = None
         self._awaiting_val = False
         self.key_nodes = {}
+        self._key_order = None
+        self._key_index = None
 
         state = state_or_scalar_node._state
         self._state = state
@@ -665,18 +799,22 @@ class DictlikeNode(collections.OrderedDict):
             if not node.external_at_line_start:
                 raise erring.ParseError('A key must be at the start of the line in indentation-style syntax', node)
             if node.external_indent != self.indent:
-                raise erring.IndentationError(node)
+                self._state.recover(erring.IndentationError(node))
             # Set `_open` so that dict-like and list-like objects share a
             # common test for completeness.
             self._open = True
         # No need to check for valid key type; already done at AST level
         key = node.final_val
         if key in self:
-            raise erring.ParseError('Duplicate keys are prohibited', node, self.key_nodes[key])
-        self.key_nodes[key] = node
-        self._next_key = key
+            # When errors are being collected, the last value is kept
+            self._state.recover(erring.ParseError('Duplicate keys are prohibited', node, self.key_nodes[key]))
         self.last_lineno = node.last_lineno
         self.last_colno = node.last_colno
+        compact_nodes = self._state.ast.compact_nodes
+        if compact_nodes is not None:
+            node = compact_nodes.compact(node)
+        self.key_nodes[key] = node
+        self._next_key = key
         self._awaiting_val = True
 
 
@@ -685,11 +823,15 @@ class DictlikeNode(collections.OrderedDict):
             raise erring.ParseError('Missing value; cannot add a key until the previous key has been given a value', node, self.key_nodes[self._next_key])
         key = node.final_val
         if key in self:
-            raise erring.ParseError('Duplicate keys are prohibited', node, self.key_nodes[key])
-        self.key_nodes[key] = node
-        self._next_key = key
+            # When errors are being collected, the last value is kept
+            self._state.recover(erring.ParseError('Duplicate keys are prohibited', node, self.key_nodes[key]))
         self.last_lineno = node.last_lineno
         self.last_colno = node.last_colno
+        compact_nodes = self._state.ast.compact_nodes
+        if compact_nodes is not None:
+            node = compact_nodes.compact(node)
+        self.key_nodes[key] = node
+        self._next_key = key
         self._awaiting_val = True
         self._open = True
 
@@ -705,7 +847,12 @@ class DictlikeNode(collections.OrderedDict):
             # same line as the key, because any value that starts on that line
             # will be consistent with the key indentation.
             if len(node.external_indent) <= len(self.indent) or not node.external_indent.startswith(self.indent):
-                raise erring.IndentationError(node)
+                self._state.recover(erring.IndentationError(node))
+        self.last_lineno = node.last_lineno
+        self.last_colno = node.last_colno
+        compact_nodes = self._state.ast.compact_nodes
+        if compact_nodes is not None:
+            node = compact_nodes.compact(node)
         self[self._next_key] = node
         if not node._resolved:
             node.parent = self
@@ -714,8 +861,6 @@ class DictlikeNode(collections.OrderedDict):
         elif self._state.full_ast:
             node.parent = self
             node.index = self._next_key
-        self.last_lineno = node.last_lineno
-        self.last_colno = node.last_colno
         self._awaiting_val = False
         self._open = False
 
@@ -723,6 +868,11 @@ class DictlikeNode(collections.OrderedDict):
     def check_append_key_path_scalar_val(self, node):
         if not self._awaiting_val:
             raise erring.ParseError('Missing key; cannot add a value until a key has been given', node)
+        self.last_lineno = node.last_lineno
+        self.last_colno = node.last_colno
+        compact_nodes = self._state.ast.compact_nodes
+        if compact_nodes is not None:
+            node = compact_nodes.compact(node)
         self[self._next_key] = node
         if not node._resolved:
             node.parent = self
@@ -731,8 +881,6 @@ class DictlikeNode(collections.OrderedDict):
         elif self._state.full_ast:
             node.parent = self
             node.index = self._next_key
-        self.last_lineno = node.last_lineno
-        self.last_colno = node.last_colno
         self._awaiting_val = False
         self._open = False
 
@@ -777,7 +925,7 @@ class DictlikeNode(collections.OrderedDict):
 
 
 
-class TagNode(collections.OrderedDict):
+class TagNode(dict):
     '''
     Tag for explicit typing, configuring collection types, defining labels,
     or setting newlines for string types.
@@ -793,9 +941,9 @@ class TagNode(collections.OrderedDict):
 
     def __init__(self, state, first_lineno, first_colno, external_inline,
                  set_tag_doc_comment_externals=_set_tag_doc_comment_externals,
-                 OrderedDict=collections.OrderedDict,
+                 dict=dict,
                  default_compatible_implicit_types = load_types.IMPLICIT_TYPES):
-        OrderedDict.__init__(self)
+        dict.__init__(self)
 
         self.implicit_type = 'tag'
         self.type = None
@@ -1013,7 +1161,7 @@ class AliasListNode(list):
             raise erring.ParseError('Only aliases are allowed in alias lists', node)
         self.append(node)
         node.parent = self
-        node.index = len(self)
+        node.index = len(self) - 1
         self._unresolved_dependency_count += 1
         self.last_lineno = node.last_lineno
         self.last_colno = node.last_colno
@@ -1068,6 +1216,184 @@ class AliasNode(object):
 
 
 
+def parse_key_path_raw_val(key_path_raw_val,
+                           open_indentation_list=OPEN_INDENTATION_LIST,
+                           path_separator=PATH_SEPARATOR,
+                           reserved_word_patterns=_reserved_word_patterns,
+                           key_path_reserved_word_vals=_key_path_reserved_word_vals,
+                           reserved_word_types=_reserved_word_types,
+                           len=len):
+    '''
+    Split a raw key path into elements and check them for reserved words.
+
+    Returns a tuple with an element for each part of the key path.  This is
+    `open_indentation_list` for a list opener, and otherwise a tuple
+    `(final_val, implicit_type, first_offset, last_offset)`, where the
+    offsets are column offsets from the start of the key path.  Invalid
+    elements have an implicit type of `None` and an error message as their
+    final value.  Since the result depends only on the raw value, it can be
+    memoized.
+    '''
+    elems = []
+    first_offset = last_offset = 0
+    for kp_elem_raw in key_path_raw_val.split(path_separator):
+        if kp_elem_raw == open_indentation_list:
+            elems.append(kp_elem_raw)
+            last_offset += 2
+            first_offset = last_offset
+            continue
+        last_offset += len(kp_elem_raw) - 1
+        if kp_elem_raw in reserved_word_patterns:
+            try:
+                kp_elem_final = key_path_reserved_word_vals[kp_elem_raw]
+            except KeyError:
+                if kp_elem_raw.lower() in reserved_word_types:
+                    msg = 'Invalid capitalization of reserved word "{0}"'.format(kp_elem_raw.lower())
+                elif kp_elem_raw == kp_elem_raw.lower():
+                    msg = 'Reserved word "{0}" is not allowed in key paths'.format(kp_elem_raw.lower())
+                else:
+                    msg = 'Reserved word "{0}" is not allowed in key paths, and has invalid capitalization'.format(kp_elem_raw.lower())
+                elems.append((msg, None, first_offset, last_offset))
+                return tuple(elems)
+            implicit_type = reserved_word_types[kp_elem_raw]
+        else:
+            kp_elem_final = kp_elem_raw
+            implicit_type = 'str'
+        elems.append((kp_elem_final, implicit_type, first_offset, last_offset))
+        last_offset += 2
+        first_offset = last_offset
+    return tuple(elems)
+
+
+
+
+class KeyPathElementNode(object):
+    '''
+    Minimal scalar node for a key path element, used when a full AST is not
+    being created.  Key path elements are always resolved and never have
+    tags or doc comments, so only the value, implicit type, and location are
+    needed.
+    '''
+    __slots__ = ['_state', 'implicit_type', 'final_val',
+                 'first_lineno', 'first_colno', 'last_lineno', 'last_colno']
+
+    tag = None
+    doc_comment = None
+    _resolved = True
+
+    def __init__(self, state, lineno, first_colno, last_colno, implicit_type, final_val):
+        self._state = state
+        self.implicit_type = implicit_type
+        self.final_val = final_val
+        self.first_lineno = self.last_lineno = lineno
+        self.first_colno = first_colno
+        self.last_colno = last_colno
+
+
+
+
+class KeyPathTrieNode(object):
+    '''
+    Dict-like object created by key paths when a full AST is not being
+    created.  Levels below it are plain dicts that are also the final values,
+    and untagged, resolved scalar values are stored as their final values,
+    so no nodes are kept and nothing is left to resolve.  Anything else
+    that is added replaces the trie with the dict-like nodes that key paths
+    would otherwise have created.  The locations of the key paths and values
+    that are added are kept in an array shared by all tries, so that these
+    nodes have the same locations as nodes created directly.
+    '''
+    __slots__ = (_node_common_slots + _node_data_slots +
+                 _node_collection_slots +
+                 ['_level', '_next_key', '_next_key_node', '_awaiting_val',
+                  '_materialized_node', '_last_location'])
+
+
+    def __init__(self, kp_node, key_path_parent):
+        self.implicit_type = 'dict'
+        self._state = kp_node._state
+        self.indent = self.external_indent = kp_node.external_indent
+        self.at_line_start = self.external_at_line_start = kp_node.external_at_line_start
+        self.inline = kp_node.inline
+        self.inline_indent = kp_node.inline_indent
+        self.first_lineno = self.last_lineno = self.external_first_lineno = kp_node.external_first_lineno
+        self.first_colno = self.last_colno = self.external_first_colno = kp_node.external_first_colno
+        self._resolved = True
+        self.final_val = self._level = {}
+        self.doc_comment = None
+        self.tag = None
+        self.view = None
+        self.key_path_parent = key_path_parent
+        self._key_path_traversable = True
+        self._key_path_scope = None
+        self._unresolved_dependency_count = 0
+        self.extra_dependents = None
+        self._next_key = None
+        self._next_key_node = None
+        self._awaiting_val = False
+        self._open = False
+        self._materialized_node = None
+        # Start of the record for the last key path in
+        # `Ast._key_path_trie_records`
+        self._last_location = None
+
+
+    def __len__(self):
+        return len(self._level)
+
+
+    def _materialize(self):
+        return self._state.ast._materialize_key_path_trie(self)
+
+
+    def check_append_scalar_key(self, node):
+        return self._materialize().check_append_scalar_key(node)
+
+
+    def check_append_key_path_scalar_key(self, node):
+        return self._materialize().check_append_key_path_scalar_key(node)
+
+
+    def check_append_scalar_val(self, node, len=len, type=type,
+                                trie_implicit_types=TRIE_IMPLICIT_TYPES):
+        if not self._awaiting_val:
+            raise erring.ParseError('Missing key; cannot add a value until a key has been given', node)
+        if node.tag is not None or not node._resolved or type(node.final_val) not in trie_implicit_types:
+            return self._materialize().check_append_scalar_val(node)
+        if self.inline:
+            if not node.external_indent.startswith(self.inline_indent):
+                raise erring.IndentationError(node)
+        elif node.external_at_line_start:
+            if len(node.external_indent) <= len(self.indent) or not node.external_indent.startswith(self.indent):
+                self._state.recover(erring.IndentationError(node))
+        self._level[self._next_key] = node.final_val
+        locations = self._state.ast._key_path_trie_records
+        record_val_start = self._last_location + 6
+        locations[record_val_start] = node.first_lineno
+        locations[record_val_start+1] = node.first_colno
+        locations[record_val_start+2] = node.last_lineno
+        locations[record_val_start+3] = node.last_colno
+        self.last_lineno = node.last_lineno
+        self.last_colno = node.last_colno
+        self._next_key_node = None
+        self._awaiting_val = False
+        self._open = False
+
+
+    def check_append_key_path_scalar_val(self, node):
+        return self._materialize().check_append_key_path_scalar_val(node)
+
+
+    def check_append_collection(self, node):
+        return self._materialize().check_append_collection(node)
+
+
+    def check_append_key_path_collection(self, node):
+        return self._materialize().check_append_key_path_collection(node)
+
+
+
+
 class KeyPathNode(list):
     '''
     Abstract key path.
@@ -1082,11 +1408,8 @@ class KeyPathNode(list):
     def __init__(self, state, key_path_raw_val,
                  set_tag_doc_comment_externals=_set_tag_doc_comment_externals,
                  open_indentation_list=OPEN_INDENTATION_LIST,
-                 path_separator=PATH_SEPARATOR,
-                 reserved_word_patterns=_reserved_word_patterns,
-                 key_path_reserved_word_vals=_key_path_reserved_word_vals,
-                 reserved_word_types=_reserved_word_types,
-                 ScalarNode=ScalarNode, FullScalarNode=FullScalarNode,
+                 KeyPathElementNode=KeyPathElementNode,
+                 FullScalarNode=FullScalarNode,
                  list=list):
         list.__init__(self)
 
@@ -1113,47 +1436,29 @@ class KeyPathNode(list):
             # won't introduce any errors and doesn't require any checks
             set_tag_doc_comment_externals(self, state)
 
-        first_colno = last_colno = self.first_colno
+        colno = self.first_colno
         lineno = self.first_lineno
-        for kp_elem_raw in key_path_raw_val.split(path_separator):
-            if kp_elem_raw == open_indentation_list:
-                self.append(kp_elem_raw)
-                last_colno += 2
-                first_colno = last_colno
+        full_ast = state.full_ast
+        intern_table = state.intern_table if state.intern_keys else None
+        for kp_elem in state.key_path_elems[key_path_raw_val]:
+            if kp_elem == open_indentation_list:
+                self.append(kp_elem)
+                continue
+            kp_elem_final, implicit_type, first_offset, last_offset = kp_elem
+            if implicit_type is None:
+                raise erring.ParseError(kp_elem_final, KeyPathElementNode(state, lineno, colno + first_offset, colno + last_offset, 'str', None))
+            if intern_table is not None and implicit_type == 'str':
+                kp_elem_final = intern_table.setdefault(kp_elem_final, kp_elem_final)
+            if not full_ast:
+                kp_elem_node = KeyPathElementNode(state, lineno, colno + first_offset, colno + last_offset,
+                                                  implicit_type, kp_elem_final)
             else:
-                last_colno += len(kp_elem_raw) - 1
-                if kp_elem_raw in reserved_word_patterns:
-                    try:
-                        kp_elem_final = key_path_reserved_word_vals[kp_elem_raw]
-                    except KeyError:
-                        kp_elem_node = ScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
-                        kp_elem_node.first_colno = first_colno
-                        kp_elem_node.last_colno = last_colno
-                        if kp_elem_raw.lower() in _reserved_word_types:
-                            raise erring.ParseError('Invalid capitalization of reserved word "{0}"'.format(kp_elem_raw.lower()), kp_elem_node)
-                        elif kp_elem_raw == kp_elem_raw.lower():
-                            raise erring.ParseError('Reserved word "{0}" is not allowed in key paths'.format(kp_elem_raw.lower()), kp_elem_node)
-                        else:
-                            raise erring.ParseError('Reserved word "{0}" is not allowed in key paths, and has invalid capitalization'.format(kp_elem_raw.lower()), kp_elem_node)
-                    implicit_type = _reserved_word_types[kp_elem_raw]
-                else:
-                    kp_elem_final = kp_elem_raw
-                    implicit_type = 'str'
-                if not self._state.full_ast:
-                    kp_elem_node = ScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
-                else:
-                    kp_elem_node = FullScalarNode(state, lineno, first_colno, lineno, last_colno,
-                                                  implicit_type)
-                kp_elem_node.first_colno = first_colno
-                kp_elem_node.last_colno = last_colno
-                if state.full_ast:
-                    kp_elem_node.raw_val = kp_elem_raw
-                    kp_elem_node.key_path = self
+                kp_elem_node = FullScalarNode(state, lineno, colno + first_offset, lineno, colno + last_offset,
+                                              implicit_type)
+                kp_elem_node.raw_val = key_path_raw_val[first_offset:last_offset+1]
+                kp_elem_node.key_path = self
                 kp_elem_node.final_val = kp_elem_final
-                kp_elem_node._resolved = True
-                self.append(kp_elem_node)
-                last_colno += 2
-                first_colno = last_colno
+            self.append(kp_elem_node)
 
 
 
@@ -19,6 +19,8 @@ from .version import __version__
 import sys
 import collections
 import re
+import tempfile
+import concurrent.futures
 
 from . import erring
 from . import escape
@@ -27,11 +29,37 @@ from . import load_types
 from . import grammar
 from .ast import Ast
 from .astnodes import ScalarNode, FullScalarNode, CommentNode, FullCommentNode, AliasNode, KeyPathNode, SectionNode
+from .astnodes import parse_key_path_raw_val
 
 if sys.version_info.major == 2:
     str = unicode
 
 
+# Maximum number of raw key paths whose processed elements are cached by a
+# decoder.  Generated data often repeats key path prefixes and entire key
+# paths many times.
+MAX_KEY_PATH_CACHE_SIZE = 4096
+
+# Minimum source length (in code points) for which parallel decoding of
+# sections is attempted.  For smaller sources, starting worker processes and
+# transferring results costs more than is gained.
+MIN_PARALLEL_SECTIONS_LENGTH = 2**20
+
+# Lines that start or end a section.  This is only used to find likely
+# section boundaries; sections are always validated by decoding.
+_SECTION_LINE_RE = re.compile(r'^{block_prefix}({assign_key_val}+)({block_suffix}?)[{indent}]*([^{indent}\r\n]*)[{indent}]*([^\r\n]*)'.format(block_prefix=re.escape(grammar.LIT_GRAMMAR['block_prefix']),
+                                                                                                                                                        assign_key_val=re.escape(grammar.LIT_GRAMMAR['assign_key_val']),
+                                                                                                                                                        block_suffix=re.escape(grammar.LIT_GRAMMAR['block_suffix']),
+                                                                                                                                                        indent=grammar.LIT_GRAMMAR['indent']),
+                              re.MULTILINE)
+
+# Lines that may start a top-level key-value pair
+_TOP_LEVEL_LINE_RE = re.compile(r'^(?![{indent}\r\n{comment_delim}{end_inline_dict}{end_inline_list}])'.format(indent=grammar.LIT_GRAMMAR['indent'],
+                                                                                                            comment_delim=re.escape(grammar.LIT_GRAMMAR['comment_delim']),
+                                                                                                            end_inline_dict=re.escape(grammar.LIT_GRAMMAR['end_inline_dict']),
+                                                                                                            end_inline_list=re.escape(grammar.LIT_GRAMMAR['end_inline_list'])),
+                                re.MULTILINE)
+
 
 
 class SourceRange(object):
@@ -214,13 +242,16 @@ class State(object):
                  'next_scalar', 'next_scalar_context', 'next_scalar_is_keyable',
                  'data_types',
                  'core_data_types', 'extended_data_types', 'python_data_types',
-                 'ast', 'full_ast',
+                 'ast', 'full_ast', 'new_scalar_node',
                  'bidi_rtl', 'bidi_rtl_re',
                  'bidi_rtl_last_scalar_last_lineno',
                  'bidi_rtl_last_scalar_last_line',
                  'newline_re', 'unquoted_string_or_key_path_re',
                  'alias_path_re', 'number_re',
                  'escape_unicode', 'unescape_unicode', 'unescape_bytes',
+                 'key_path_elems',
+                 'intern_keys', 'intern_values', 'intern_table',
+                 'errors',
                  'circular_references']
     def __init__(self, decoder, source_raw_string,
                  source_name=None, source_include_depth=0,
@@ -229,7 +260,7 @@ class State(object):
                  indent='', at_line_start=True,
                  inline=False, inline_indent=None,
                  lineno=1, colno=1,
-                 full_ast=False,
+                 full_ast=False, key_path_tries=False,
                  indent_chars=grammar.LIT_GRAMMAR['indent']):
         if not all(x is None or isinstance(x, str) for x in (source_name, inline_indent)):
             raise TypeError
@@ -245,7 +276,7 @@ class State(object):
             if not all(isinstance(x, int) for x in (lineno, colno)):
                 raise TypeError
             raise ValueError
-        if not all(x in (True, False) for x in (at_line_start, inline, full_ast, source_embedded)):
+        if not all(x in (True, False) for x in (at_line_start, inline, full_ast, key_path_tries, source_embedded)):
             raise TypeError
 
         # In some cases, data may be derived either from a `State` instance or
@@ -287,14 +318,37 @@ class State(object):
         self.escape_unicode = decoder._escape_unicode
         self.unescape_unicode = decoder._unescape_unicode
         self.unescape_bytes = decoder._unescape_bytes
+        self.key_path_elems = decoder._key_path_elems
+
+        # Strings are interned per decode rather than with `sys.intern()`, so
+        # that they are released along with the data
+        self.intern_keys = decoder.intern_keys
+        self.intern_values = decoder.intern_values
+        if self.intern_keys or self.intern_values:
+            self.intern_table = {}
+        else:
+            self.intern_table = None
 
         self.circular_references = decoder.circular_references
 
+        if decoder.collect_errors:
+            self.errors = []
+        else:
+            self.errors = None
+
         self._check_literals_set_code_point_attrs(source_raw_string, decoder)
         self.source_lines = source_raw_string.splitlines()
         self.source_lines_iter = iter(self.source_lines)
 
-        self.ast = Ast(self, decoder.max_nesting_depth, decoder.empty_default)
+        self.ast = Ast(self, decoder.max_nesting_depth, decoder.empty_default,
+                       compact=decoder.compact_ast,
+                       key_path_tries=key_path_tries and not full_ast)
+        # Compacted scalar nodes are reused for later scalars, unless errors
+        # are being collected, since errors may refer to nodes
+        if self.ast.compact_nodes is not None and self.errors is None:
+            self.new_scalar_node = self.ast.compact_nodes.new_scalar_node
+        else:
+            self.new_scalar_node = ScalarNode
         if self.full_ast:
             self.ast.source_lines = self.source_lines
 
@@ -372,6 +426,17 @@ class State(object):
         self._traceback_not_valid_literal(source_raw_string, m_not_valid_unicode.start(), decoder)
 
 
+    def recover(self, err):
+        '''
+        Raise an error from which parsing could recover, unless errors are
+        being collected.  In that case, store the error so that parsing may
+        continue.
+        '''
+        if self.errors is None:
+            raise err
+        self.errors.append(err)
+
+
     def source_range_to_loc(self, lineno, colno):
         '''
         Return an object that may be used for creating a traceback to a range
@@ -399,9 +464,14 @@ class BespONDecoder(object):
                  'max_nesting_depth', 'empty_default',
                  'float_overflow_to_inf',
                  'extended_types', 'python_types',
+                 'spill_bytes_threshold', 'spill_bytes_sink',
+                 'compact_ast', 'intern_keys', 'intern_values',
+                 'collect_errors', 'parallel_sections',
+                 '_init_kwargs',
                  '_data_types',
                  '_escape_unicode',
                  '_unescape', '_unescape_unicode', '_unescape_bytes',
+                 '_key_path_elems',
                  '_parse_token', '_parse_scalar_token',
                  '_not_valid_ascii_re', '_not_valid_below_u0590_re',
                  '_not_valid_unicode_re',
@@ -420,6 +490,9 @@ class BespONDecoder(object):
         # Process args
         if args:
             raise TypeError('Explicit keyword arguments are required')
+        # Keep original options for creating equivalent decoders in worker
+        # processes
+        self._init_kwargs = kwargs.copy()
         only_ascii_source = kwargs.pop('only_ascii_source', False)
         only_ascii_unquoted = kwargs.pop('only_ascii_unquoted', True)
         aliases = kwargs.pop('aliases', True)
@@ -430,11 +503,21 @@ class BespONDecoder(object):
         float_overflow_to_inf = kwargs.pop('float_overflow_to_inf', False)
         extended_types = kwargs.pop('extended_types', False)
         python_types = kwargs.pop('python_types', False)
+        compact_ast = kwargs.pop('compact_ast', False)
+        intern_keys = kwargs.pop('intern_keys', False)
+        intern_values = kwargs.pop('intern_values', 0)
+        collect_errors = kwargs.pop('collect_errors', False)
         if any(x not in (True, False) for x in (only_ascii_source, only_ascii_unquoted,
                                                 aliases, circular_references,
                                                 integers, float_overflow_to_inf,
-                                                extended_types, python_types)):
+                                                extended_types, python_types,
+                                                compact_ast, intern_keys,
+                                                collect_errors)):
             raise TypeError
+        if not isinstance(intern_values, int) or intern_values is True or intern_values is False:
+            raise TypeError('intern_values must be an integer')
+        if intern_values < 0:
+            raise ValueError('intern_values must be >= 0')
         if only_ascii_source and not only_ascii_unquoted:
             raise ValueError('Setting only_ascii_source=True is incompatible with only_ascii_unquoted=False')
         if not isinstance(max_nesting_depth, int):
@@ -451,6 +534,17 @@ class BespONDecoder(object):
         self.float_overflow_to_inf = float_overflow_to_inf
         self.extended_types = extended_types
         self.python_types = python_types
+        self.compact_ast = compact_ast
+        self.intern_keys = intern_keys
+        self.intern_values = intern_values
+        self.collect_errors = collect_errors
+
+        parallel_sections = kwargs.pop('parallel_sections', 0)
+        if not isinstance(parallel_sections, int) or parallel_sections is True or parallel_sections is False:
+            raise TypeError('parallel_sections must be an integer')
+        if parallel_sections < 0:
+            raise ValueError('parallel_sections must be >= 0')
+        self.parallel_sections = parallel_sections
 
         custom_parsers = kwargs.pop('custom_parsers', None)
         if custom_parsers is not None and not isinstance(custom_parsers, dict):
@@ -469,6 +563,22 @@ class BespONDecoder(object):
         self.custom_parsers = custom_parsers
         self.custom_types = custom_types
 
+        spill_bytes_threshold = kwargs.pop('spill_bytes_threshold', None)
+        spill_bytes_sink = kwargs.pop('spill_bytes_sink', None)
+        if spill_bytes_threshold is not None:
+            if not isinstance(spill_bytes_threshold, int) or spill_bytes_threshold is True or spill_bytes_threshold is False:
+                raise TypeError('spill_bytes_threshold must be None or an integer')
+            if spill_bytes_threshold < 1:
+                raise ValueError('spill_bytes_threshold must be >= 1')
+        if spill_bytes_sink is None:
+            spill_bytes_sink = tempfile.TemporaryFile
+        elif not hasattr(spill_bytes_sink, '__call__'):
+            raise TypeError('spill_bytes_sink must be a callable that returns a new binary file-like object')
+        elif spill_bytes_threshold is None:
+            raise ValueError('spill_bytes_sink requires spill_bytes_threshold')
+        self.spill_bytes_threshold = spill_bytes_threshold
+        self.spill_bytes_sink = spill_bytes_sink
+
         if kwargs:
             raise TypeError('Unexpected keyword argument(s) {0}'.format(', '.join('"{0}"'.format(k) for k in kwargs)))
 
@@ -500,6 +610,10 @@ class BespONDecoder(object):
         self._unescape_bytes = self._unescape.unescape_bytes
 
 
+        # Memoized processing of raw key paths into elements
+        self._key_path_elems = tooling.boundedkeydefaultdict(parse_key_path_raw_val, MAX_KEY_PATH_CACHE_SIZE)
+
+
         # Create dict of token-based parsing functions.
         #
         # Also create a dict containing only the scalar-related subset of
@@ -644,8 +758,16 @@ class BespONDecoder(object):
         Decode a Unicode string or byte string into Python objects.
         '''
         unicode_string = self._as_unicode_string(unicode_string_or_bytes)
-        state = State(self, unicode_string)
-        self._parse_lines(state)
+        if (self.parallel_sections > 1 and len(unicode_string) >= MIN_PARALLEL_SECTIONS_LENGTH and
+                not self.collect_errors and self.spill_bytes_threshold is None):
+            data = self._decode_sections_parallel(unicode_string)
+            if data is not None:
+                return data
+        state = State(self, unicode_string, key_path_tries=True)
+        if state.errors is None:
+            self._parse_lines(state)
+        else:
+            self._parse_lines_collect_errors(state)
         return state.ast.root.final_val
 
 
@@ -656,10 +778,186 @@ class BespONDecoder(object):
         '''
         unicode_string = self._as_unicode_string(unicode_string_or_bytes)
         state = State(self, unicode_string, full_ast=True)
-        self._parse_lines(state)
+        if state.errors is None:
+            self._parse_lines(state)
+        else:
+            self._parse_lines_collect_errors(state)
         return state.ast
 
 
+    def _split_top_level(self, unicode_string, sections_only=False,
+                         section_line_re=_SECTION_LINE_RE,
+                         top_level_line_re=_TOP_LEVEL_LINE_RE,
+                         whitespace=grammar.LIT_GRAMMAR['indent'],
+                         comment_delim=grammar.LIT_GRAMMAR['comment_delim'],
+                         assign_key_val=grammar.LIT_GRAMMAR['assign_key_val'],
+                         open_indentation_list=grammar.LIT_GRAMMAR['open_indentation_list'],
+                         len=len, tuple=tuple):
+        '''
+        Split a document into independent top-level items:  sections, or
+        top-level key-value pairs when there are no sections.
+
+        Returns a list of `(start, key_path)` for each item, where `start`
+        is the index at which the item begins and `key_path` is a tuple of
+        keys.  The first item also includes any line comments and blank lines
+        at the beginning of the document.  Returns `None` when the document
+        cannot be split this way.  That is the case when it uses section end
+        delimiters, has top-level lines that do not start with an unquoted
+        key or key path (without list openers), or has key paths that could
+        conflict.
+
+        This only finds likely item boundaries.  Each item must still be
+        decoded with `_decode_items()`.  Any decoding error, or any item that
+        uses labels or aliases (which can connect items), indicates that the
+        document must be decoded as a whole.
+        '''
+        if self.only_ascii_unquoted:
+            key_path_re = self._unquoted_string_or_key_path_ascii_re
+        else:
+            key_path_re = self._unquoted_string_or_key_path_unicode_re
+        key_path_elems = self._key_path_elems
+        items = []
+        # Simulate key path handling.  If all key paths are compatible,
+        # values from different items can only share dicts that were created
+        # by key paths, and can be merged directly.
+        intermediate_paths = set()
+        terminal_paths = set()
+        for m in section_line_re.finditer(unicode_string):
+            delim, end_delim, key_path_raw, trailing = m.groups()
+            if end_delim:
+                return None
+            if trailing and (trailing[:1] != comment_delim or trailing[1:2] == comment_delim):
+                return None
+            items.append((m.start(), key_path_raw))
+        if not items:
+            if sections_only:
+                return None
+            len_unicode_string = len(unicode_string)
+            for m in top_level_line_re.finditer(unicode_string):
+                start = m.start()
+                if start == len_unicode_string:
+                    break
+                m_key_path = key_path_re.match(unicode_string, start)
+                if m_key_path is None:
+                    return None
+                if unicode_string[m_key_path.end():].lstrip(whitespace)[:1] != assign_key_val:
+                    return None
+                items.append((start, m_key_path.group(0)))
+        if not items:
+            return None
+        for item_index, (start, key_path_raw) in enumerate(items):
+            m_key_path = key_path_re.match(key_path_raw)
+            if m_key_path is None or m_key_path.end() != len(key_path_raw) or m_key_path.group('reserved_word') is not None:
+                return None
+            if m_key_path.group('key_path') is None:
+                path = (key_path_raw,)
+            else:
+                path = []
+                for kp_elem in key_path_elems[key_path_raw]:
+                    if kp_elem == open_indentation_list or kp_elem[1] is None:
+                        return None
+                    path.append(kp_elem[0])
+                path = tuple(path)
+            for index in range(1, len(path)):
+                if path[:index] in terminal_paths:
+                    return None
+                intermediate_paths.add(path[:index])
+            if path in terminal_paths or path in intermediate_paths:
+                return None
+            terminal_paths.add(path)
+            items[item_index] = (start, path)
+        for line in unicode_string[:items[0][0]].splitlines():
+            line = line.lstrip(whitespace)
+            if line and (line[:1] != comment_delim or line[1:2] == comment_delim):
+                return None
+        items[0] = (0, items[0][1])
+        return items
+
+
+    def _decode_items(self, unicode_string):
+        '''
+        Decode one or more items from `_split_top_level()`.  Returns the
+        data and whether it is independent of the rest of the document,
+        which is the case when no labels or aliases were used.
+        '''
+        state = State(self, unicode_string, key_path_tries=True)
+        if state.errors is None:
+            self._parse_lines(state)
+        else:
+            self._parse_lines_collect_errors(state)
+        ast = state.ast
+        return (ast.root.final_val, not ast._labels and not ast._unresolved_alias_nodes)
+
+
+    def _decode_sections_parallel(self, unicode_string, len=len):
+        '''
+        Decode a document consisting of sections by splitting it into
+        batches of consecutive sections, decoding these in worker processes,
+        and merging the results.
+
+        Returns `None` when the document is not suitable for this (see
+        `_split_top_level()`), so that it must be decoded sequentially.  Any
+        decoding error in a worker also results in `None`, so that errors
+        are always reported by sequential decoding with correct locations,
+        and so does any batch that uses labels or aliases.
+        '''
+        items = self._split_top_level(unicode_string, sections_only=True)
+        if items is None or len(items) < 2:
+            return None
+        batch_length = len(unicode_string) // self.parallel_sections
+        batch_starts = [0]
+        for section_start, _ in items[1:]:
+            if section_start - batch_starts[-1] >= batch_length:
+                batch_starts.append(section_start)
+        if len(batch_starts) < 2:
+            return None
+        batch_starts.append(len(unicode_string))
+        batches = [unicode_string[start:end] for start, end in zip(batch_starts[:-1], batch_starts[1:])]
+        options = self._init_kwargs.copy()
+        options['parallel_sections'] = 0
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=len(batches)) as executor:
+                results = list(executor.map(_decode_sections_batch, [options]*len(batches), batches))
+        except Exception:
+            # Besides decoding errors, this covers options such as custom
+            # parsers that cannot be sent to other processes, and data that
+            # cannot be returned
+            return None
+        if not all(independent for _, independent in results):
+            return None
+        data = results[0][0]
+        for batch_data, _ in results[1:]:
+            self._merge_sections(data, batch_data)
+        return data
+
+
+    @classmethod
+    def _merge_sections(cls, data, batch_data):
+        '''
+        Merge data from a batch of sections into data from preceding
+        sections.  Shared keys can only refer to dicts created by key paths.
+        '''
+        for k, v in batch_data.items():
+            if k in data:
+                cls._merge_sections(data[k], v)
+            else:
+                data[k] = v
+
+
+    def _parse_lines_collect_errors(self, state):
+        '''
+        Process lines as in `_parse_lines()`, but raise all errors together
+        at the end.  Errors from which parsing cannot recover end parsing,
+        and are reported after any previous errors.
+        '''
+        try:
+            self._parse_lines(state)
+        except erring.DecodingException as e:
+            state.errors.append(e)
+        if state.errors:
+            raise erring.DecodingErrors(state.errors)
+
+
     def _parse_lines(self, state,
                      whitespace=grammar.LIT_GRAMMAR['indent'], whitespace_set=grammar.LIT_GRAMMAR['whitespace_set'],
                      len=len):
@@ -1053,7 +1351,6 @@ class BespONDecoder(object):
 
     def _parse_token_literal_string_delim(self, line, state, section=False,
                                           max_delim_length=grammar.PARAMS['max_delim_length'],
-                                          ScalarNode=ScalarNode,
                                           literal_string_delim=grammar.LIT_GRAMMAR['literal_string_delim'],
                                           len=len):
         '''
@@ -1082,7 +1379,7 @@ class BespONDecoder(object):
         elif content_strip_space[-1:] == literal_string_delim:
             content = content[:-1]
         if not state.full_ast:
-            node = ScalarNode(state, first_lineno, first_colno, last_lineno, last_colno,
+            node = state.new_scalar_node(state, first_lineno, first_colno, last_lineno, last_colno,
                               'str', delim=delim)
         else:
             node = FullScalarNode(state, first_lineno, first_colno, last_lineno, last_colno,
@@ -1113,7 +1410,6 @@ class BespONDecoder(object):
 
     def _parse_token_escaped_string_delim(self, line, state, section=False,
                                           max_delim_length=grammar.PARAMS['max_delim_length'],
-                                          ScalarNode=ScalarNode,
                                           FullScalarNode=FullScalarNode,
                                           len=len):
         '''
@@ -1144,7 +1440,7 @@ class BespONDecoder(object):
             delim = line[:len_delim]
             content_lines, continuation_indent, content, last_lineno, last_colno, line = self._parse_delim_inline('escaped string', delim, line_lstrip_delim, state, section=section)
         if not state.full_ast:
-            node = ScalarNode(state, first_lineno, first_colno, last_lineno, last_colno,
+            node = state.new_scalar_node(state, first_lineno, first_colno, last_lineno, last_colno,
                               'str', delim=delim)
         else:
             node = FullScalarNode(state, first_lineno, first_colno, last_lineno, last_colno,
@@ -1158,7 +1454,8 @@ class BespONDecoder(object):
                 try:
                     content_esc = self._unescape_unicode(content)
                 except Exception as e:
-                    raise erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node)
+                    state.recover(erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node))
+                    content_esc = content
             node.final_val = content_esc
         elif not state.data_types[node.tag.type].ascii_bytes:
             if '\\' not in content:
@@ -1167,7 +1464,8 @@ class BespONDecoder(object):
                 try:
                     content_esc = self._unescape_unicode(content)
                 except Exception as e:
-                    raise erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node)
+                    state.recover(erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node))
+                    content_esc = content
             node.final_val = self._type_tagged_scalar(state, node, content_esc)
         else:
             try:
@@ -1180,7 +1478,8 @@ class BespONDecoder(object):
                 try:
                     content_bytes_esc = self._unescape_bytes(content_bytes)
                 except Exception as e:
-                    raise erring.ParseError('Failed to unescape escaped string that is tagged with an ASCII bytes type:\n  {0}'.format(e), node, node.tag['type'])
+                    state.recover(erring.ParseError('Failed to unescape escaped string that is tagged with an ASCII bytes type:\n  {0}'.format(e), node, node.tag['type']))
+                    content_bytes_esc = content_bytes
             node.final_val = self._type_tagged_scalar(state, node, content_bytes_esc)
         state.next_scalar = node
         state.next_scalar_is_keyable = True
@@ -1252,7 +1551,6 @@ class BespONDecoder(object):
 
     def _parse_token_block_prefix(self, line, state,
                                   max_delim_length=grammar.PARAMS['max_delim_length'],
-                                  ScalarNode=ScalarNode,
                                   FullScalarNode=FullScalarNode,
                                   CommentNode=CommentNode,
                                   FullCommentNode=FullCommentNode,
@@ -1337,7 +1635,7 @@ class BespONDecoder(object):
         # nature of the final delimiter.
         if delim_code_point == literal_string_delim:
             if not state.full_ast:
-                node = ScalarNode(state, first_lineno, first_colno, last_lineno, last_colno,
+                node = state.new_scalar_node(state, first_lineno, first_colno, last_lineno, last_colno,
                                   'str', delim=delim, block=True)
             else:
                 node = FullScalarNode(state, first_lineno, first_colno, last_lineno, last_colno,
@@ -1387,7 +1685,7 @@ class BespONDecoder(object):
             state.next_cache = True
         elif delim_code_point == escaped_string_singlequote_delim or delim_code_point == escaped_string_doublequote_delim:
             if not state.full_ast:
-                node = ScalarNode(state, first_lineno, first_colno, last_lineno, last_colno,
+                node = state.new_scalar_node(state, first_lineno, first_colno, last_lineno, last_colno,
                                   'str', delim=delim, block=True)
             else:
                 node = FullScalarNode(state, first_lineno, first_colno, last_lineno, last_colno,
@@ -1405,7 +1703,8 @@ class BespONDecoder(object):
                 try:
                     content_esc = self._unescape_unicode(content)
                 except Exception as e:
-                    raise erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node)
+                    state.recover(erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node))
+                    content_esc = content
                 node.final_val = content_esc
             else:
                 if 'newline' in node.tag:
@@ -1433,13 +1732,15 @@ class BespONDecoder(object):
                     try:
                         content_esc = self._unescape_unicode(content, newline=tag_newline, indent=tag_indent)
                     except Exception as e:
-                        raise erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node)
+                        state.recover(erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node))
+                        content_esc = content
                     node.final_val = content_esc
                 elif not state.data_types[node.tag.type].ascii_bytes:
                     try:
                         content_esc = self._unescape_unicode(content, newline=tag_newline, indent=tag_indent)
                     except Exception as e:
-                        raise erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node)
+                        state.recover(erring.ParseError('Failed to unescape escaped string:\n  {0}'.format(e), node))
+                        content_esc = content
                     node.final_val = self._type_tagged_scalar(state, node, content_esc)
                 else:
                     try:
@@ -1454,7 +1755,8 @@ class BespONDecoder(object):
                     try:
                         content_bytes_esc = self._unescape_bytes(content_bytes, newline=tag_newline_bytes, indent=tag_indent_bytes)
                     except Exception as e:
-                        raise erring.ParseError('Failed to unescape escaped string that is tagged with an ASCII bytes type:\n  {0}'.format(e), node, node.tag['type'])
+                        state.recover(erring.ParseError('Failed to unescape escaped string that is tagged with an ASCII bytes type:\n  {0}'.format(e), node, node.tag['type']))
+                        content_bytes_esc = content_bytes
                     node.final_val = self._type_tagged_scalar(state, node, content_bytes_esc)
             state.next_scalar = node
             state.next_scalar_is_keyable = True
@@ -1522,7 +1824,7 @@ class BespONDecoder(object):
         if group_type == 'int' and self.integers:
             implicit_type = 'int'
             if not state.full_ast:
-                node = ScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
+                node = state.new_scalar_node(state, lineno, first_colno, lineno, last_colno, implicit_type)
             else:
                 node = FullScalarNode(state, lineno, first_colno, lineno, last_colno,
                                       implicit_type, num_base=group_base)
@@ -1543,7 +1845,7 @@ class BespONDecoder(object):
         elif group_type == 'float' or group_type == 'float_inf_or_nan' or (group_type == 'int' and not self.integers):
             implicit_type = 'float'
             if not state.full_ast:
-                node = ScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
+                node = state.new_scalar_node(state, lineno, first_colno, lineno, last_colno, implicit_type)
             else:
                 node = FullScalarNode(state, lineno, first_colno, lineno, last_colno,
                                       implicit_type, num_base=group_base)
@@ -1583,7 +1885,7 @@ class BespONDecoder(object):
                 if cleaned_val_real[-1] == imaginary_unit:
                     cleaned_val_real, cleaned_val_imag = cleaned_val_imag, cleaned_val_real
             if not state.full_ast:
-                node = ScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
+                node = state.new_scalar_node(state, lineno, first_colno, lineno, last_colno, implicit_type)
             else:
                 node = FullScalarNode(state, lineno, first_colno, lineno, last_colno,
                                       implicit_type, num_base=group_base)
@@ -1610,7 +1912,7 @@ class BespONDecoder(object):
         elif group_type == 'rational':
             implicit_type = 'rational'
             if not state.full_ast:
-                node = ScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
+                node = state.new_scalar_node(state, lineno, first_colno, lineno, last_colno, implicit_type)
             else:
                 node = FullScalarNode(state, lineno, first_colno, lineno, last_colno,
                                       implicit_type, num_base=group_base)
@@ -1638,7 +1940,6 @@ class BespONDecoder(object):
                                                  whitespace=grammar.LIT_GRAMMAR['indent'],
                                                  open_indentation_list=grammar.LIT_GRAMMAR['open_indentation_list'],
                                                  assign_key_val=grammar.LIT_GRAMMAR['assign_key_val'],
-                                                 ScalarNode=ScalarNode,
                                                  FullScalarNode=FullScalarNode,
                                                  KeyPathNode=KeyPathNode,
                                                  len=len):
@@ -1670,7 +1971,7 @@ class BespONDecoder(object):
         if group_name == 'unquoted_string':
             implicit_type = 'str'
             if not state.full_ast:
-                node = ScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
+                node = state.new_scalar_node(state, lineno, first_colno, lineno, last_colno, implicit_type)
             else:
                 node = FullScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
                 node.raw_val = raw_val
@@ -1709,7 +2010,7 @@ class BespONDecoder(object):
                 # exists elsewhere (underscore handling, etc.).
                 return self._parse_token_number(raw_val+line, state)
             if not state.full_ast:
-                node = ScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
+                node = state.new_scalar_node(state, lineno, first_colno, lineno, last_colno, implicit_type)
             else:
                 node = FullScalarNode(state, lineno, first_colno, lineno, last_colno, implicit_type)
                 node.raw_val = raw_val
@@ -1791,8 +2092,68 @@ class BespONDecoder(object):
 
 
     def _type_tagged_scalar(self, state, scalar_node, processed_val, num_base=None):
+        data_type = state.data_types[scalar_node.tag.type]
         try:
-            final_val = state.data_types[scalar_node.tag.type].parser(processed_val)
+            if data_type.ascii_bytes and self.spill_bytes_threshold is not None:
+                final_val = self._spill_bytes(data_type, processed_val)
+            else:
+                final_val = data_type.parser(processed_val)
         except Exception as e:
-            raise erring.ParseError('Applying explicit type "{0}" to scalar object failed:\n  {1}'.format(scalar_node.tag.type, e), scalar_node, scalar_node.tag)
+            state.recover(erring.ParseError('Applying explicit type "{0}" to scalar object failed:\n  {1}'.format(scalar_node.tag.type, e), scalar_node, scalar_node.tag))
+            # When errors are being collected, keep the untyped value
+            final_val = processed_val
         return final_val
+
+
+    def _spill_bytes(self, data_type, processed_val,
+                     SpilledBytes=load_types.SpilledBytes,
+                     spill_writers=load_types.SPILL_WRITERS):
+        '''
+        Parse binary data, writing it to a file from `spill_bytes_sink` if
+        it is at least `spill_bytes_threshold` bytes long.  For the built-in
+        Base16 and Base64 parsers, decoded data goes directly to the file in
+        chunks, so that it is never entirely in memory.
+        '''
+        threshold = self.spill_bytes_threshold
+        parser = data_type.parser
+        try:
+            spill_writer = spill_writers.get(parser)
+        except TypeError:
+            spill_writer = None
+        if spill_writer is not None:
+            # Encoded data is always at least as long as the decoded data
+            if len(processed_val) < threshold:
+                return parser(processed_val)
+            fp = self.spill_bytes_sink()
+            try:
+                length = spill_writer(processed_val, fp)
+                if length < threshold:
+                    fp.seek(0)
+                    final_val = fp.read(length)
+                    fp.close()
+                    return final_val
+                fp.flush()
+            except:
+                fp.close()
+                raise
+            return SpilledBytes(fp, length)
+        final_val = parser(processed_val)
+        if not isinstance(final_val, bytes) or len(final_val) < threshold:
+            return final_val
+        fp = self.spill_bytes_sink()
+        try:
+            fp.write(final_val)
+            fp.flush()
+        except:
+            fp.close()
+            raise
+        return SpilledBytes(fp, len(final_val))
+
+
+
+
+def _decode_sections_batch(options, source):
+    '''
+    Decode a batch of sections in a worker process.
+    '''
+    return BespONDecoder(**options)._decode_items(source)
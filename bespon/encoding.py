@@ -18,6 +18,7 @@ import sys
 import re
 import collections
 import fractions
+import binascii
 from . import escape
 from . import grammar
 from . import tooling
@@ -75,6 +76,17 @@ class BespONEncoder(object):
         self.max_section_depth = max_section_depth
         self.inline_depth = inline_depth
 
+        bytes_encoding = kwargs.pop('bytes_encoding', 'escaped')
+        bytes_line_length = kwargs.pop('bytes_line_length', 76)
+        if bytes_encoding not in ('escaped', 'base16', 'base64'):
+            raise ValueError('bytes_encoding must be "escaped", "base16", or "base64"')
+        if not isinstance(bytes_line_length, int) or bytes_line_length is True or bytes_line_length is False:
+            raise TypeError('bytes_line_length must be an integer')
+        if bytes_line_length < 1:
+            raise ValueError('bytes_line_length must be >= 1')
+        self.bytes_encoding = bytes_encoding
+        self.bytes_line_length = bytes_line_length
+
         nesting_indent = kwargs.pop('nesting_indent', grammar.LIT_GRAMMAR['nesting_indent'])
         start_list_item = kwargs.pop('start_list_item', grammar.LIT_GRAMMAR['start_list_item'])
         flush_start_list_item = kwargs.pop('flush_start_list_item', grammar.LIT_GRAMMAR['flush_start_list_item'])
@@ -171,6 +183,9 @@ class BespONEncoder(object):
                 raise TypeError('Unsupported type {0}'.format(t))
         self._encode_funcs = tooling.keydefaultdict(encode_func_factory)
         self._encode_funcs.update(encode_funcs)
+        self._buffer = None
+        self._partial_encode_session = False
+        self._scalar_buffer = []
 
 
     def _reset(self):
@@ -198,6 +213,79 @@ class BespONEncoder(object):
         self._alias_def_buffer_index = None
 
 
+    def partial_encode_scalar(self, obj,
+                              flush_margin=False,
+                              inline=False, at_line_start=True, indent='',
+                              after_start_list_item=False,
+                              key=False, key_path=False,
+                              delim=None, block=False, num_base=None,
+                              type=type, str=str,
+                              none_type=grammar.LIT_GRAMMAR['none_type'],
+                              bool_true=grammar.LIT_GRAMMAR['bool_true'],
+                              bool_false=grammar.LIT_GRAMMAR['bool_false']):
+        '''
+        Encode a scalar within a larger object, like `partial_encode()`, but
+        without the state needed for collections.  Strings use a reusable
+        buffer, and None, bools, and decimal ints and floats are encoded
+        directly.  Other objects are passed on to `partial_encode()`.
+        '''
+        if (delim and num_base) or (key_path and not key):
+            raise TypeError('Invalid argument combination')
+        t = type(obj)
+        if t is str and num_base is None:
+            if delim is None and self._unquoted_str_re.match(obj) is not None:
+                return obj
+            buffer = self._scalar_buffer
+            session_buffer = self._buffer
+            self._buffer = buffer
+            try:
+                if delim or block:
+                    self._encode_str(obj, flush_margin=flush_margin, inline=inline, at_line_start=at_line_start, after_start_list_item=after_start_list_item, key=key, key_path=key_path, delim=delim, block=block)
+                else:
+                    self._encode_str(obj, flush_margin=flush_margin, inline=inline, at_line_start=at_line_start, after_start_list_item=after_start_list_item, key=key, key_path=key_path)
+                encoded = ''.join(buffer)
+            finally:
+                self._buffer = session_buffer
+                del buffer[:]
+            if indent:
+                return encoded.replace('\n', '\n'+indent)
+            return encoded
+        if not delim and not block:
+            if num_base is None:
+                if obj is None:
+                    return none_type
+                if t is bool:
+                    return bool_true if obj else bool_false
+            if t is int:
+                if self.integers and not key_path and (num_base is None or num_base == 10):
+                    return str(obj)
+            elif t is float:
+                if not key and not self.hex_floats and (num_base is None or num_base == 10):
+                    return str(obj)
+        return self.partial_encode(obj, flush_margin=flush_margin,
+                                   inline=inline, at_line_start=at_line_start, indent=indent,
+                                   after_start_list_item=after_start_list_item,
+                                   key=key, key_path=key_path,
+                                   delim=delim, block=block, num_base=num_base)
+
+
+    def _start_partial_encode_session(self):
+        '''
+        Prepare for a sequence of `partial_encode()` calls that share a
+        single buffer, rather than resetting everything for each call.
+        '''
+        self._reset()
+        self._partial_encode_session = True
+
+
+    def _end_partial_encode_session(self):
+        '''
+        End a sequence of `partial_encode()` calls.
+        '''
+        self._partial_encode_session = False
+        self._free()
+
+
     def _encode_none(self, obj,
                      flush_margin=False, inline=False, at_line_start=True, indent='', leading='', after_start_list_item=False, key=False, key_path=False, value=False,
                      none_type=grammar.LIT_GRAMMAR['none_type']):
@@ -452,6 +540,9 @@ class BespONEncoder(object):
                       string_delim_seq_set=grammar.LIT_GRAMMAR['string_delim_seq_set']):
         if key_path:
             raise TypeError('Bytes type cannot be used in key paths')
+        if self.bytes_encoding != 'escaped' and not key and obj:
+            self._encode_bytes_base_n(obj, inline=inline, at_line_start=at_line_start, indent=indent, leading=leading)
+            return
         tag = '(bytes)> '
         if delim is None:
             if self._unquoted_bytes_re.match(obj) is not None:
@@ -467,7 +558,7 @@ class BespONEncoder(object):
             raise ValueError
         if inline and self.compact_inline:
             self._buffer.append(leading)
-            self._buffer.append('"{0}"'.format(self._escape_bytes(obj, '"', inline=True).decode('ascii')))
+            self._buffer.append(tag + '"{0}"'.format(self._escape_bytes(obj, '"', inline=True).decode('ascii')))
             return
         if self._line_terminator_bytes_re.search(obj) is None:
             self._buffer.append(leading)
@@ -546,6 +637,48 @@ class BespONEncoder(object):
         self._buffer.append(tag + template.format('"""', obj_encoded_indented, indent))
 
 
+    def _encode_bytes_base_n(self, obj, inline=False, at_line_start=True, indent='', leading='',
+                             b2a_base64=binascii.b2a_base64, hexlify=binascii.hexlify,
+                             chunk_size=3*2**15):
+        '''
+        Encode bytes as a Base16 or Base64 string.  Data is converted in
+        chunks, and lines are added to the buffer as they are completed, so
+        that no escaped or fully encoded copy of the data is ever created.
+        Chunk size is a multiple of 3 so that Base64 padding only occurs at
+        the end.
+        '''
+        if self.bytes_encoding == 'base64':
+            tag = '(base64)>'
+            # Trailing newline from `b2a_base64()` is stripped
+            encode_chunk = lambda x: b2a_base64(x)[:-1].decode('ascii')
+            encoded_len = 4*((len(obj)+2)//3)
+        else:
+            tag = '(base16)>'
+            encode_chunk = lambda x: hexlify(x).decode('ascii')
+            encoded_len = 2*len(obj)
+        line_length = self.bytes_line_length
+        if inline or encoded_len <= line_length:
+            self._buffer.append(leading)
+            self._buffer.append('{0} "{1}"'.format(tag, encode_chunk(obj)))
+            return
+        if at_line_start:
+            self._buffer.append(leading)
+        else:
+            indent += self.nesting_indent
+            self._buffer.append('\n' + indent)
+        self._buffer.append("{0}\n{1}|'''\n".format(tag, indent))
+        carry = ''
+        for index in range(0, len(obj), chunk_size):
+            encoded = carry + encode_chunk(obj[index:index+chunk_size])
+            len_usable = len(encoded) - len(encoded) % line_length
+            carry = encoded[len_usable:]
+            if len_usable:
+                self._buffer.append(''.join([indent + encoded[n:n+line_length] + '\n' for n in range(0, len_usable, line_length)]))
+        if carry:
+            self._buffer.append(indent + carry + '\n')
+        self._buffer.append("{0}|'''/".format(indent))
+
+
     def _encode_doc_comment(self, obj,
                             flush_margin=False, inline=False, at_line_start=True, indent='', leading='', after_start_list_item=False, key=False, key_path=False, value=False,
                             delim=None, block=None,
@@ -866,7 +999,13 @@ class BespONEncoder(object):
         Encode an object within a larger object in a manner suitable for its
         context.  This is used in RoundtripAst.
         '''
-        self._reset()
+        if not self._partial_encode_session or self._alias_values:
+            # Collections leave alias and path data, so a full reset is
+            # still needed after them within a session.
+            self._reset()
+        else:
+            del self._buffer[:]
+            self._scalar_bidi_rtl = False
         self._nesting_depth = initial_nesting_depth
         if dtype is None:
             if (delim and num_base) or (key_path and not key):
@@ -883,6 +1022,10 @@ class BespONEncoder(object):
             self._encode_line_comment(obj, flush_margin=flush_margin, inline=inline, at_line_start=at_line_start, after_start_list_item=after_start_list_item, key=key, key_path=key_path, delim=delim, block=block)
         else:
             raise ValueError
-        encoded = ''.join(self._buffer).replace('\n', '\n'+indent)
-        self._free()
+        if indent:
+            encoded = ''.join(self._buffer).replace('\n', '\n'+indent)
+        else:
+            encoded = ''.join(self._buffer)
+        if not self._partial_encode_session:
+            self._free()
         return encoded
@@ -12,6 +12,14 @@
 from __future__ import (division, print_function, absolute_import,
                         unicode_literals)
 
+import collections
+
+
+# Location of the object that caused an error.  Line and column numbers are
+# 1-based and inclusive.
+SourceLocation = collections.namedtuple('SourceLocation', ['source_name',
+                                                           'first_lineno', 'first_colno',
+                                                           'last_lineno', 'last_colno'])
 
 class BespONException(Exception):
     '''
@@ -23,9 +31,45 @@ class BespONException(Exception):
 class DecodingException(BespONException):
     '''
     Base decoding exception.
+
+    Exceptions only store references to the relevant state and nodes, plus
+    the position of the error.  Messages are formatted lazily by `__str__()`,
+    so that exceptions are inexpensive when used for control flow.
     '''
+    _position = None
+
+    @staticmethod
+    def _get_position(state_or_node):
+        '''
+        Capture the position of a state or node, since a state's position
+        changes as parsing continues.
+        '''
+        try:
+            if hasattr(state_or_node, 'next_cache'):
+                lineno = state_or_node.lineno
+                colno = state_or_node.colno
+                return (state_or_node.source_name, lineno, colno, lineno, colno)
+            return (state_or_node._state.source_name,
+                    state_or_node.first_lineno, state_or_node.first_colno,
+                    state_or_node.last_lineno, state_or_node.last_colno)
+        except AttributeError:
+            # Incomplete nodes are only reported when the message is formatted
+            return None
+
+    @property
+    def location(self):
+        '''
+        `SourceLocation` of the error, or `None` if unknown.
+        '''
+        if self._position is None:
+            return None
+        return SourceLocation(*self._position)
+
     def fmt_msg_with_traceback(self, msg, state_or_node, other_nodes=None, unresolved_cache=False):
-        source_name = state_or_node._state.source_name
+        position = self._position
+        if position is None:
+            position = self._get_position(state_or_node)
+        source_name = position[0]
         if unresolved_cache:
             if not hasattr(state_or_node, 'next_cache'):
                 raise Bug('Invalid error message', state_or_node)
@@ -44,23 +88,23 @@ class DecodingException(BespONException):
             if cache_obj.first_lineno == cache_obj.last_lineno:
                 if cache_obj.first_colno == cache_obj.last_colno:
                     traceback = 'In "{0}" at line {1}:{2}, in relation to {3} at {4}:{5}:'.format(source_name,
-                                                                                                  state.lineno,
-                                                                                                  state.colno,
+                                                                                                  position[1],
+                                                                                                  position[2],
                                                                                                   cache_name,
                                                                                                   cache_obj.first_lineno,
                                                                                                   cache_obj.first_colno)
                 else:
                     traceback = 'In "{0}" at line {1}:{2}, in relation to {3} at {4}:{5}-{6}:'.format(source_name,
-                                                                                                      state.lineno,
-                                                                                                      state.colno,
+                                                                                                      position[1],
+                                                                                                      position[2],
                                                                                                       cache_name,
                                                                                                       cache_obj.first_lineno,
                                                                                                       cache_obj.first_colno,
                                                                                                       cache_obj.last_colno)
             else:
                 traceback = 'In "{0}" at line {1}:{2}, in relation to {3} at {4}:{5}-{6}:{7}:'.format(source_name,
-                                                                                                      state.lineno,
-                                                                                                      state.colno,
+                                                                                                      position[1],
+                                                                                                      position[2],
                                                                                                       cache_name,
                                                                                                       cache_obj.first_lineno,
                                                                                                       cache_obj.first_colno,
@@ -90,14 +134,7 @@ class DecodingException(BespONException):
                     other_traceback = ', in relation to objects at {0} and {1}'.format(other_obj_locs[0], other_obj_locs[1])
                 else:
                     other_traceback = ', in relation to objects at ' + ', '.join(other_obj_locs[:-1]) + ', and ' + other_obj_locs[-1]
-            if hasattr(state_or_node, 'next_cache'):
-                first_lineno = last_lineno = state_or_node.lineno
-                first_colno = last_colno = state_or_node.colno
-            else:
-                first_lineno = state_or_node.first_lineno
-                first_colno = state_or_node.first_colno
-                last_lineno = state_or_node.last_lineno
-                last_colno = state_or_node.last_colno
+            first_lineno, first_colno, last_lineno, last_colno = position[1:]
             if first_lineno == last_lineno:
                 if first_colno == last_colno:
                     traceback = 'In "{0}" at line {1}:{2}{3}:'.format(source_name,
@@ -116,6 +153,19 @@ class DecodingException(BespONException):
         return '\n  {0}\n    {1}'.format(traceback, msg)
 
 
+class DecodingErrors(DecodingException):
+    '''
+    All errors found during decoding with `collect_errors=True`.
+    '''
+    def __init__(self, errors):
+        self.errors = errors
+        self._position = errors[0]._position
+    def __str__(self):
+        if len(self.errors) == 1:
+            return str(self.errors[0])
+        return '{0} errors:{1}'.format(len(self.errors), ''.join(str(e) for e in self.errors))
+
+
 class Bug(DecodingException):
     '''
     There is a bug in the program, as opposed to invalid user data.
@@ -128,6 +178,7 @@ class Bug(DecodingException):
     def __init__(self, msg, state_or_node):
         self.msg = msg
         self.state_or_node = state_or_node
+        self._position = self._get_position(state_or_node)
     def __str__(self):
         return self.fmt_msg_with_traceback(self.msg, self.state_or_node)
 
@@ -148,6 +199,7 @@ class InvalidLiteralError(DecodingException):
     '''
     def __init__(self, state_or_node, code_point, code_point_esc, comment=None):
         self.state_or_node = state_or_node
+        self._position = self._get_position(state_or_node)
         self.code_point = code_point
         self.code_point_esc = code_point_esc
         self.comment = comment
@@ -179,6 +231,7 @@ class ParseError(DecodingException):
         self.state_or_node = state_or_node
         self.other_obj = other_obj
         self.unresolved_cache = unresolved_cache
+        self._position = self._get_position(state_or_node)
     def __str__(self):
         return self.fmt_msg_with_traceback(self.msg, self.state_or_node, self.other_obj, self.unresolved_cache)
 
@@ -190,5 +243,6 @@ class IndentationError(DecodingException):
     def __init__(self, state_or_node):
         self.msg = 'Inconsistent relative indentation'
         self.state_or_node = state_or_node
+        self._position = self._get_position(state_or_node)
     def __str__(self):
         return self.fmt_msg_with_traceback(self.msg, self.state_or_node)
@@ -34,6 +34,11 @@ elif sys.version_info.major == 2:
 
 NEWLINE = grammar.LIT_GRAMMAR['newline']
 
+# Maximum number of memoized escapes and unescapes beyond those that are
+# prepopulated.  Escape and unescape objects are typically long-lived (for
+# example, in default decoders and encoders), so memoization is bounded.
+MAX_MEMO_SIZE = 4096
+
 
 
 
@@ -79,8 +84,8 @@ class Escape(object):
         # Dict for escaping code points that may not appear literally.  Code
         # points are detected with a regex, and their escaped replacements
         # are then looked up in the dict.  The dict serves to memoize the
-        # escape function.
-        self._escape_unicode_dict = tooling.keydefaultdict(self._escape_unicode_char)
+        # escape function, with a bounded number of memoized values.
+        self._escape_unicode_dict = tooling.boundedkeydefaultdict(self._escape_unicode_char, MAX_MEMO_SIZE)
         self._escape_unicode_dict.update(grammar.SHORT_BACKSLASH_ESCAPES)
 
         # The bytes escape dict is similar to the Unicode equivalent, but
@@ -132,6 +137,20 @@ class Escape(object):
         invalid_literal_or_backslash_multi_doublequote_unicode_pattern = '{bs}|{dq}(?={dq})|(?<={dq}){dq}|{always_escaped_unicode}'.format(**pattern_dict)
         self._invalid_literal_or_backslash_multi_doublequote_unicode_re = re.compile(invalid_literal_or_backslash_multi_doublequote_unicode_pattern)
 
+        # Translation tables for ASCII strings.  Regexes without lookarounds
+        # (everything except the multi-delimiter cases) only ever match
+        # single code points, so for pure ASCII strings, `str.translate()`
+        # gives the same result as substitution with the regex while
+        # avoiding a Python-level function call per escape.
+        self._ascii_translate_tables = {}
+        for r in (self._invalid_literal_or_backslash_singlequote_newline_unicode_re,
+                  self._invalid_literal_or_backslash_doublequote_newline_unicode_re,
+                  self._invalid_literal_or_backslash_singlequote_newline_bidi_rtl_unicode_re,
+                  self._invalid_literal_or_backslash_doublequote_newline_bidi_rtl_unicode_re,
+                  self._invalid_literal_or_backslash_singlequote_unicode_re,
+                  self._invalid_literal_or_backslash_doublequote_unicode_re):
+            self._ascii_translate_tables[r] = {n: self._escape_unicode_dict[chr(n)] for n in range(128) if r.match(chr(n))}
+
         self.invalid_literal_bytes_re = re.compile('{always_escaped_ascii}'.format(**pattern_dict).encode('ascii'))
 
         invalid_literal_or_backslash_singlequote_newline_bytes_pattern = '{bs}|{sq}|{nl}|{always_escaped_ascii}'.format(**pattern_dict).encode('ascii')
@@ -245,6 +264,11 @@ class Escape(object):
                     r = self._invalid_literal_or_backslash_multi_doublequote_unicode_re
                 else:
                     r = self._invalid_literal_or_backslash_doublequote_unicode_re
+        if r.search(s) is None:
+            return s
+        table = self._ascii_translate_tables.get(r)
+        if table is not None and s.isascii():
+            return s.translate(table)
         return r.sub(lambda m: d[m.group(0)], s)
 
 
@@ -279,6 +303,8 @@ class Escape(object):
                     r = self._invalid_literal_or_backslash_multi_doublequote_bytes_re
                 else:
                     r = self._invalid_literal_or_backslash_doublequote_bytes_re
+        if r.search(b) is None:
+            return b
         return r.sub(lambda m: d[m.group(0)], b)
 
 
@@ -303,9 +329,9 @@ class Unescape(object):
         # `indent` (can't use `^` for detecting the start of a line and adding
         # indentation, because empty matches are only substituted when not
         # adjacent to a previous match).
-        self._unescape_unicode_dict = tooling.keydefaultdict(self._unescape_unicode_char, grammar.SHORT_BACKSLASH_UNESCAPES)
+        self._unescape_unicode_dict = tooling.boundedkeydefaultdict(self._unescape_unicode_char, MAX_MEMO_SIZE, grammar.SHORT_BACKSLASH_UNESCAPES)
         self._unescape_unicode_dict[sentinel_codepoint] = ''
-        self._unescape_bytes_dict = tooling.keydefaultdict(self._unescape_byte)
+        self._unescape_bytes_dict = tooling.boundedkeydefaultdict(self._unescape_byte, MAX_MEMO_SIZE)
         self._unescape_bytes_dict.update({'\\x{0:02x}'.format(n).encode('ascii'): chr(n).encode('latin1') for n in range(256)})
         self._unescape_bytes_dict.update({k.encode('ascii'): v.encode('ascii') for k, v in grammar.SHORT_BACKSLASH_UNESCAPES.items()})
         self._unescape_bytes_dict[sentinel_codepoint.encode('ascii')] = b''
@@ -385,19 +411,28 @@ class Unescape(object):
         '''
         Within a string, replace all backslash escapes with the
         corresponding code points.
+
+        Strings without backslashes are handled without regex substitution:
+        they are returned unchanged, or newline and indent replacement is
+        done with `str.replace()`.
         '''
         d = self._unescape_unicode_dict
         if indent is None or indent == '':
             if newline is None or newline == _default_newline:
-                r = self._unescape_unicode_re
-            else:
-                d[_default_newline] = newline
-                r = self._unescape_unicode_or_replace_newline_re
-        else:
-            d[_default_newline] = newline + indent
-            d[_default_newline+_sentinel] = newline
-            r = self._unescape_unicode_or_indent_or_replace_newline_re
-        return r.sub(lambda m: d[m.group()], s)
+                if '\\' not in s:
+                    return s
+                return self._unescape_unicode_re.sub(lambda m: d[m.group()], s)
+            if '\\' not in s:
+                return s.replace(_default_newline, newline)
+            d[_default_newline] = newline
+            return self._unescape_unicode_or_replace_newline_re.sub(lambda m: d[m.group()], s)
+        if newline is None:
+            newline = _default_newline
+        if '\\' not in s:
+            return self._replace_newline_indent(s, newline, indent, _default_newline, _sentinel)
+        d[_default_newline] = newline + indent
+        d[_default_newline+_sentinel] = newline
+        return self._unescape_unicode_or_indent_or_replace_newline_re.sub(lambda m: d[m.group()], s)
 
 
     def unescape_bytes(self, b, newline=None, indent=None,
@@ -406,15 +441,37 @@ class Unescape(object):
         '''
         Within a binary string, replace all backslash escapes with the
         corresponding bytes.
+
+        Binary strings without backslashes are handled without regex
+        substitution, as in `unescape_unicode()`.
         '''
         d = self._unescape_bytes_dict
         if indent is None or indent == b'':
             if newline is None or newline == _default_newline:
-                r = self._unescape_bytes_re
-            else:
-                r = self._unescape_bytes_or_replace_newline_re
-        else:
-            d[_default_newline] = newline + indent
-            d[_default_newline+_sentinel] = newline
-            r = self._unescape_bytes_or_indent_or_replace_newline_re
-        return r.sub(lambda m: d[m.group()], b)
+                if b'\\' not in b:
+                    return b
+                return self._unescape_bytes_re.sub(lambda m: d[m.group()], b)
+            if b'\\' not in b:
+                return b.replace(_default_newline, newline)
+            d[_default_newline] = newline
+            return self._unescape_bytes_or_replace_newline_re.sub(lambda m: d[m.group()], b)
+        if newline is None:
+            newline = _default_newline
+        if b'\\' not in b:
+            return self._replace_newline_indent(b, newline, indent, _default_newline, _sentinel)
+        d[_default_newline] = newline + indent
+        d[_default_newline+_sentinel] = newline
+        return self._unescape_bytes_or_indent_or_replace_newline_re.sub(lambda m: d[m.group()], b)
+
+
+    @staticmethod
+    def _replace_newline_indent(s, newline, indent, default_newline, sentinel):
+        '''
+        Equivalent of the `indent` regex substitution for strings without
+        backslash escapes.  A newline followed by the sentinel becomes
+        `newline`, any other newline becomes `newline + indent`, and any
+        other sentinel is removed.  Works for both Unicode and bytes.
+        '''
+        newline_indent = newline + indent
+        return newline.join([x.replace(sentinel, sentinel[:0]).replace(default_newline, newline_indent)
+                             for x in s.split(default_newline + sentinel)])
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2017, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the BSD 3-Clause License:
+# http://opensource.org/licenses/BSD-3-Clause
+#
+
+
+# pylint: disable=C0301
+
+from __future__ import (division, print_function, absolute_import,
+                        unicode_literals)
+
+from . import erring
+from . import decoding
+
+
+
+
+class IncrementalDecoder(object):
+    '''
+    Decode successive versions of a document, such as a document that is
+    being edited, only decoding the top-level items (sections, or top-level
+    key-value pairs when there are no sections) that have changed.
+
+    Decoded values of unchanged items are shared between the data returned
+    for successive versions, so returned data should not be modified.
+    Documents that cannot be split into independent items (see
+    `BespONDecoder._split_top_level()`) are always decoded as a whole.
+    '''
+    __slots__ = ['decoder', 'source', 'decoded_items', 'reused_items',
+                 '_item_values']
+
+    def __init__(self, decoder=None, **kwargs):
+        if decoder is None:
+            decoder = decoding.BespONDecoder(**kwargs)
+        elif kwargs:
+            raise TypeError('Keyword arguments are not supported when a decoder is given')
+        elif not isinstance(decoder, decoding.BespONDecoder):
+            raise TypeError('decoder must be a BespONDecoder instance')
+        self.decoder = decoder
+        self.source = None
+        # Number of items decoded and reused for the last version
+        self.decoded_items = 0
+        self.reused_items = 0
+        # Map the source of each item in the last version to its value
+        self._item_values = {}
+
+
+    def decode(self, unicode_string_or_bytes, len=len):
+        '''
+        Decode a new version of the document.
+        '''
+        decoder = self.decoder
+        unicode_string = decoder._as_unicode_string(unicode_string_or_bytes)
+        self.source = unicode_string
+        items = decoder._split_top_level(unicode_string)
+        if items is None:
+            return self._decode_whole(unicode_string)
+        last_item_values = self._item_values
+        item_values = {}
+        decoded_items = 0
+        data = {}
+        for index, (start, key_path) in enumerate(items):
+            if index + 1 < len(items):
+                item_source = unicode_string[start:items[index+1][0]]
+            else:
+                item_source = unicode_string[start:]
+            try:
+                val = last_item_values[item_source]
+            except KeyError:
+                try:
+                    val, independent = decoder._decode_items(item_source)
+                except erring.DecodingException:
+                    # Errors are reported with locations in the whole document
+                    return self._decode_whole(unicode_string)
+                if not independent:
+                    # Labels and aliases may connect items
+                    return self._decode_whole(unicode_string)
+                # Find the value of the item.  Dicts along the key path must
+                # only contain the key path, or the item was not independent.
+                for key in key_path:
+                    if not isinstance(val, dict) or len(val) != 1 or key not in val:
+                        return self._decode_whole(unicode_string)
+                    val = val[key]
+                decoded_items += 1
+            item_values[item_source] = val
+            pos = data
+            for key in key_path[:-1]:
+                try:
+                    pos = pos[key]
+                except KeyError:
+                    pos[key] = pos = {}
+            pos[key_path[-1]] = val
+        self._item_values = item_values
+        self.decoded_items = decoded_items
+        self.reused_items = len(items) - decoded_items
+        return data
+
+
+    def edit(self, start, end, replacement):
+        '''
+        Replace `source[start:end]` with `replacement`, where `source` is the
+        last version of the document, and decode the result.
+        '''
+        if self.source is None:
+            raise TypeError('Nothing has been decoded yet; use decode() first')
+        return self.decode(self.source[:start] + replacement + self.source[end:])
+
+
+    def _decode_whole(self, unicode_string):
+        '''
+        Decode a document as a whole, with no reuse.
+        '''
+        self._item_values = {}
+        self.decoded_items = 1
+        self.reused_items = 0
+        return self.decoder.decode(unicode_string)
@@ -16,6 +16,8 @@ from __future__ import (division, print_function, absolute_import,
 import sys
 import collections
 import base64
+import binascii
+import mmap
 import re
 import fractions
 from . import grammar
@@ -111,6 +113,96 @@ def _base64_parser(b, whitespace_bytes_re=WHITESPACE_BYTES_RE,
 
 
 
+class SpilledBytes(object):
+    '''
+    Handle for binary data that was written to a file during loading instead
+    of being kept in memory.  This is used in place of `bytes` for binary
+    scalars at or above the decoder's `spill_bytes_threshold`.
+
+    file:    Binary file-like object containing the data, starting at
+             position zero.
+
+    length:  Number of bytes of data.
+    '''
+    __slots__ = ['file', 'length']
+    def __init__(self, file, length):
+        self.file = file
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return '<SpilledBytes: {0} bytes>'.format(self.length)
+
+    def read(self):
+        '''
+        Read all data into a byte string.
+        '''
+        self.file.seek(0)
+        return self.file.read(self.length)
+
+    def mmap(self):
+        '''
+        Return a read-only memory map of the data.  This requires a file
+        with a working `fileno()`.
+        '''
+        return mmap.mmap(self.file.fileno(), self.length, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.file.close()
+
+
+# Source text is processed in chunks when binary data is spilled, so that
+# the full decoded data never needs to exist in memory.  Chunk sizes must be
+# multiples of the encoding quantum after whitespace is removed; that is
+# handled by carrying over any remainder to the next chunk.
+SPILL_CHUNK_SIZE = 2**20
+
+def _spill_decoded_chunks(b, fp, quantum, decode,
+                          whitespace_bytes_re=WHITESPACE_BYTES_RE,
+                          chunk_size=SPILL_CHUNK_SIZE):
+    length = 0
+    carry = b''
+    for index in range(0, len(b), chunk_size):
+        b_processed = carry + whitespace_bytes_re.sub(b'', b[index:index+chunk_size])
+        len_usable = len(b_processed) - len(b_processed) % quantum
+        carry = b_processed[len_usable:]
+        if len_usable:
+            decoded = decode(b_processed[:len_usable])
+            fp.write(decoded)
+            length += len(decoded)
+    if carry:
+        decoded = decode(carry)
+        fp.write(decoded)
+        length += len(decoded)
+    return length
+
+
+def _base16_spill_writer(b, fp, base16_re=BASE16_RE,
+                         b16decode=base64.b16decode):
+    if not base16_re.match(b):
+        raise ValueError('Invalid character(s) in Base16-encoded data; mixed-case characters are not permitted, spaces are only allowed if a single space separates each byte on a line, and trailing empty lines are not permitted')
+    return _spill_decoded_chunks(b, fp, 2, lambda x: b16decode(x, True))
+
+
+def _base64_spill_writer(b, fp, base64_re=BASE64_RE,
+                         a2b_base64=binascii.a2b_base64):
+    if not base64_re.match(b):
+        raise ValueError('Invalid character(s) in Base64-encoded data; whitespace is only permitted at the end of lines, and trailing empty lines are not permitted')
+    return _spill_decoded_chunks(b, fp, 4, a2b_base64)
+
+
+# Writers that decode directly into a spill file, for the built-in parsers
+# that support this.  Other parsers for `ascii_bytes` types (including custom
+# parsers for built-in types) are run normally, and their output is written
+# to a spill file afterward if it is large enough.
+SPILL_WRITERS = {_base16_parser: _base16_spill_writer,
+                 _base64_parser: _base64_spill_writer}
+
+
+
+
 # There is no explicit validation of parser function arguments here.  Parser
 # functions for scalar types that are always unquoted (none, bool, numbers)
 # are only ever called on arguments that have already been validated.  That
@@ -13,11 +13,15 @@
 from __future__ import (division, print_function, absolute_import,
                         unicode_literals)
 
-import sys
 import collections
+import re
+import sys
 from . import encoding
 from . import load_types
 from . import decoding
+from . import grammar
+from . import tooling
+from .astnodes import parse_key_path_raw_val
 
 if sys.version_info.major == 2:
     str = unicode
@@ -25,6 +29,21 @@ if sys.version_info.major == 2:
 
 _DEFAULT_DECODER = decoding.BespONDecoder()
 
+OPEN_INDENTATION_LIST = grammar.LIT_GRAMMAR['open_indentation_list']
+ASSIGN_KEY_VAL = grammar.LIT_GRAMMAR['assign_key_val']
+INLINE_ELEMENT_SEPARATOR = grammar.LIT_GRAMMAR['inline_element_separator']
+PATH_SEPARATOR = grammar.LIT_GRAMMAR['path_separator']
+START_INLINE_LIST = grammar.LIT_GRAMMAR['start_inline_list']
+END_INLINE_LIST = grammar.LIT_GRAMMAR['end_inline_list']
+
+MAX_PATH_STRING_CACHE_SIZE = 4096
+
+# Change between two versions of data, from `RoundtripAst.diff()`.  `op` is
+# one of `"replace_val"`, `"replace_key"`, `"insert_key"`, `"append"`, or
+# `"delete"`.  For `"replace_key"`, `old` and `new` are keys rather than
+# values.  `after` is only used for `"insert_key"`.
+RoundtripChange = collections.namedtuple('RoundtripChange', ['op', 'path', 'old', 'new', 'after'])
+
 
 
 
@@ -126,6 +145,7 @@ class AstView(object):
     def key_trailing_comment(self):
         if self._node.parent.implicit_type != 'dict':
             raise AttributeError('Keys only exist in dict-like objects')
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.parent.key_nodes[self._node.index].trailing_comment
         if trailing_comment_node is None:
             return None
@@ -135,18 +155,29 @@ class AstView(object):
     def key_trailing_comment(self, val):
         if self._node.parent.implicit_type != 'dict':
             raise AttributeError('Keys only exist in dict-like objects')
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.parent.key_nodes[self._node.index].trailing_comment
         if trailing_comment_node is None:
             raise NotImplementedError('Adding trailing comments where they do not yet exist is not currently supported')
         self._ast._replace_trailing_comment_at_pos(trailing_comment_node, val)
 
 
+    @property
+    def aliases(self):
+        '''
+        Alias nodes whose target is the object at this location.
+        '''
+        return self._ast._ast.alias_dependents(self._node)
+
+
     @property
     def value(self):
         if self._node.implicit_type == 'alias':
             if self._node.target_node.implicit_type in ('dict', 'list'):
                 raise AttributeError('Values for aliased collection types are not accessible')
             return self._node.target_node.final_val
+        if self._ast._renamed_values:
+            self._ast._restore_value_key_order()
         return self._node.final_val
 
     @value.setter
@@ -178,6 +209,7 @@ class ScalarAstView(AstView):
 
     @property
     def value_trailing_comment(self):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.trailing_comment
         if trailing_comment_node is None:
             return None
@@ -185,12 +217,177 @@ class ScalarAstView(AstView):
 
     @value_trailing_comment.setter
     def value_trailing_comment(self, val):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.trailing_comment
         if trailing_comment_node is None:
             raise NotImplementedError('Adding trailing comments where they do not yet exist is not currently supported')
         self._ast._replace_trailing_comment_at_pos(trailing_comment_node, val)
 
 
+_path_string_elem_re = re.compile(r'({key})?((?:{start}-?[0-9]+{end})*)$'.format(key=grammar.RE_GRAMMAR['unquoted_string_unicode'],
+                                                                              start=re.escape(START_INLINE_LIST),
+                                                                              end=re.escape(END_INLINE_LIST)))
+_path_string_index_re = re.compile(r'{start}(-?[0-9]+){end}'.format(start=re.escape(START_INLINE_LIST),
+                                                                    end=re.escape(END_INLINE_LIST)))
+
+def _parse_path_string(path_string, path_separator=PATH_SEPARATOR):
+    '''
+    Split a path string like `a.b[3].c` into a tuple of dict keys and list
+    indices.  Keys follow the key path grammar, so reserved words like
+    `true` give the corresponding values.  List indices are given in square
+    brackets.
+    '''
+    elems = []
+    if path_string:
+        for n, part in enumerate(path_string.split(path_separator)):
+            m = _path_string_elem_re.match(part)
+            if m is None:
+                raise ValueError('Invalid path "{0}"'.format(path_string))
+            key, indices = m.groups()
+            if key is not None:
+                kp_elem_final, implicit_type, _, _ = parse_key_path_raw_val(key)[0]
+                if implicit_type is None:
+                    raise ValueError(kp_elem_final)
+                elems.append(kp_elem_final)
+            elif n > 0 or not indices:
+                raise ValueError('Invalid path "{0}"'.format(path_string))
+            if indices:
+                elems.extend(int(index) for index in _path_string_index_re.findall(indices))
+    return tuple(elems)
+
+_path_strings = tooling.boundedkeydefaultdict(_parse_path_string, MAX_PATH_STRING_CACHE_SIZE)
+
+
+def _normalize_path(path):
+    if isinstance(path, tuple):
+        return path
+    if isinstance(path, list):
+        return tuple(path)
+    if isinstance(path, str):
+        return _path_strings[path]
+    raise TypeError('Path must be a string, or a list or tuple of dict keys/list indices')
+
+
+def _restore_key_order(node):
+    '''
+    Apply the key order of a dict-like node after keys have been replaced.
+    '''
+    key_order = node._key_order
+    if key_order is not None:
+        key_nodes = node.key_nodes
+        items = [(k, node[k]) for k in key_order]
+        key_node_items = [(k, key_nodes[k]) for k in key_order]
+        node.clear()
+        node.update(items)
+        key_nodes.clear()
+        key_nodes.update(key_node_items)
+        node._key_order = None
+        node._key_index = None
+
+
+def _node_value(node):
+    if node.implicit_type == 'alias':
+        return node.target_node.final_val
+    return node.final_val
+
+
+def _values_equal(a, b):
+    '''
+    Compare values, distinguishing types such as `bool`, `int`, and `float`
+    that compare equal, and treating NaNs as equal.
+    '''
+    if type(a) is not type(b):
+        return False
+    if a == b:
+        return True
+    return isinstance(a, float) and a != a and b != b
+
+
+# Marks deleted keys in `_PendingCollection`, since any hashable object,
+# including `None`, may be a key
+_DELETED_KEY = object()
+
+
+class _PendingCollection(object):
+    '''
+    Elements of a dict-like or list-like node as they will be after a
+    sequence of changes, so that the changes can be checked before any of
+    them are applied.  For dicts, the current names of keys in the AST are
+    tracked by their original positions, along with keys that are only in
+    the value.  For lists, the element nodes in the AST and the elements of
+    the value are tracked.
+    '''
+    __slots__ = ['node', 'keys', 'ast_keys', 'index', 'num_keys', 'other_keys',
+                 'elements', 'values']
+
+    def __init__(self, node):
+        self.node = node
+        final_val = node.final_val
+        if node.implicit_type == 'dict':
+            keys = list(node) if node._key_order is None else node._key_order
+            self.keys = list(keys)
+            self.ast_keys = list(keys)
+            self.index = {k: n for n, k in enumerate(keys)}
+            self.num_keys = len(keys)
+            if final_val is None:
+                self.other_keys = {}
+            else:
+                self.other_keys = {k: v for k, v in final_val.items() if k not in node}
+        else:
+            self.elements = list(node)
+            self.values = None if final_val is None else list(final_val)
+
+
+    def ast_key(self, key):
+        '''
+        Find the original key in the AST for a key, or `None`.
+        '''
+        n = self.index.get(key)
+        if n is None:
+            return None
+        return self.ast_keys[n]
+
+
+    def last_ast_key(self):
+        keys = self.keys
+        while keys and keys[-1] is _DELETED_KEY:
+            keys.pop()
+        if not keys:
+            return None
+        return self.ast_keys[len(keys)-1]
+
+
+    def has_key(self, key):
+        return key in self.index or key in self.other_keys
+
+
+    def key_value(self, key):
+        n = self.index.get(key)
+        if n is None:
+            return self.other_keys[key]
+        return _node_value(self.node[self.ast_keys[n]])
+
+
+    def replace_key(self, key, obj):
+        n = self.index.pop(key)
+        self.keys[n] = obj
+        self.index[obj] = n
+
+
+    def insert_key(self, key, obj):
+        self.other_keys[key] = obj
+
+
+    def delete(self, k):
+        if self.node.implicit_type == 'dict':
+            self.keys[self.index.pop(k)] = _DELETED_KEY
+            self.num_keys -= 1
+        else:
+            del self.elements[k]
+            if self.values is not None:
+                del self.values[k]
+
+
 _ast_view_by_implicit_type = {}
 
 
@@ -215,6 +412,7 @@ class DictAstView(AstView):
 
 
     def __iter__(self):
+        _restore_key_order(self._node)
         return iter(self._node)
 
 
@@ -224,6 +422,7 @@ class DictAstView(AstView):
 
     @property
     def value_start_trailing_comment(self):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.start_trailing_comment
         if trailing_comment_node is None:
             return None
@@ -231,6 +430,7 @@ class DictAstView(AstView):
 
     @value_start_trailing_comment.setter
     def value_start_trailing_comment(self, val):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.start_trailing_comment
         if trailing_comment_node is None:
             raise NotImplementedError('Adding trailing comments where they do not yet exist is not currently supported')
@@ -239,6 +439,7 @@ class DictAstView(AstView):
 
     @property
     def value_end_trailing_comment(self):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.end_trailing_comment
         if trailing_comment_node is None:
             return None
@@ -246,6 +447,7 @@ class DictAstView(AstView):
 
     @value_end_trailing_comment.setter
     def value_end_trailing_comment(self, val):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.end_trailing_comment
         if trailing_comment_node is None:
             raise NotImplementedError('Adding trailing comments where they do not yet exist is not currently supported')
@@ -278,6 +480,7 @@ class ListAstView(AstView):
 
     @property
     def value_start_trailing_comment(self):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.start_trailing_comment
         if trailing_comment_node is None:
             return None
@@ -285,6 +488,7 @@ class ListAstView(AstView):
 
     @value_start_trailing_comment.setter
     def value_start_trailing_comment(self, val):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.start_trailing_comment
         if trailing_comment_node is None:
             raise NotImplementedError('Adding trailing comments where they do not yet exist is not currently supported')
@@ -293,6 +497,7 @@ class ListAstView(AstView):
 
     @property
     def value_end_trailing_comment(self):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.end_trailing_comment
         if trailing_comment_node is None:
             return None
@@ -300,6 +505,7 @@ class ListAstView(AstView):
 
     @value_end_trailing_comment.setter
     def value_end_trailing_comment(self, val):
+        self._ast._associate_trailing_comments()
         trailing_comment_node = self._node.end_trailing_comment
         if trailing_comment_node is None:
             raise NotImplementedError('Adding trailing comments where they do not yet exist is not currently supported')
@@ -320,6 +526,7 @@ class RoundtripAst(object):
     encoded to produce a minimal diff compared to the original source.
     '''
     def __init__(self, ast, encoder=None, enforce_types=None):
+        self._ast = ast
         self.source = ast.source
         self.source_name = self.source.source_name
         self.root = ast.root
@@ -342,19 +549,74 @@ class RoundtripAst(object):
         else:
             raise TypeError
 
-        # Need a way to see what objects are on a line.  Since objects are
-        # added to `scalar_nodes` as created, they are already sorted.  Since
-        # line comments are always last on a line, if they are added after all
-        # other objects, then sorting is preserved.
-        objects_starting_on_line = collections.defaultdict(list)
-        for obj in self.scalar_nodes:
-            objects_starting_on_line[obj.first_lineno].append(obj)
-        for obj in self.line_comments:
-            objects_starting_on_line[obj.first_lineno].append(obj)
-        self._objects_starting_on_line = objects_starting_on_line
+        # Trailing comments are only associated with nodes when they are
+        # first needed, since this involves all nodes.
+        self._trailing_comments_associated = False
+
+        # Replacements are keyed by location.  Their order in the output is
+        # tracked separately as they are added, so that output does not
+        # require sorting everything again.  Source offsets are only created
+        # when output is first needed.
+        self._replacements = {}
+        self._insertion_parts = {}
+        self._replacement_order = []
+        self._replacement_order_sorted = True
+        self._source_text = None
+
+        # Nodes are cached by path for repeated access.  The cache is cleared
+        # whenever keys are renamed or nodes are replaced or removed.
+        self._node_index = {}
+
+        # Dict values with replaced keys, with their key order, which is
+        # applied when values are next accessed
+        self._renamed_values = {}
+        self._line_offsets = None
+
+        # Replaced collections, by id.  The AST within them no longer
+        # corresponds to their values, so they cannot be modified further.
+        self._replaced_collections = {}
+
+        # Insertions into collections, by collection id:
+        # `[collection, insertion keys, last insertion key]`.  Insertions at
+        # the end of a collection follow all previous insertions into it,
+        # including those after elements that have since been deleted.
+        self._collection_insertions = {}
+
 
+    def _last_object_starting_on_line(self, lineno):
+        '''
+        Find the last scalar or line comment starting on a line, or `None`.
+        Since objects are added to `scalar_nodes` and `line_comments` as
+        created, they are already sorted, and line comments are always last
+        on a line.
+        '''
+        for objs in (self.line_comments, self.scalar_nodes):
+            # Last object with `first_lineno <= lineno`
+            lo = 0
+            hi = len(objs)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if objs[mid].first_lineno <= lineno:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo and objs[lo-1].first_lineno == lineno:
+                return objs[lo-1]
+        return None
+
+
+    def _associate_trailing_comments(self):
+        '''
+        Assign line comments as trailing comments of the last node on their
+        line.
+        '''
+        if self._trailing_comments_associated:
+            return
+        self._trailing_comments_associated = True
+        if not self.line_comments:
+            return
         last_node_on_line = {}
-        for node in self._iter_nodes():
+        for node in self._ast.walk():
             if node.implicit_type not in ('dict', 'list', 'tag'):
                 if node.last_lineno not in last_node_on_line:
                     last_node_on_line[node.last_lineno] = node
@@ -394,9 +656,6 @@ class RoundtripAst(object):
                         node.start_trailing_comment = comment_node
 
 
-        self._replacements = {}
-
-
     def __getitem__(self, subscript):
         return self._view[subscript]
 
@@ -413,45 +672,42 @@ class RoundtripAst(object):
         return getattr(self._view, name)
 
 
-    def _iter_nodes(self):
-        return self._iter_node(self.root[0])
+    def alias_sites(self, label):
+        '''
+        Return a list of all alias nodes that refer to a given label.
+        '''
+        return self._ast.alias_sites(label)
 
 
-    def _iter_node(self, node):
-        if node.implicit_type not in ('doc_comment', 'tag'):
-            if node.doc_comment is not None:
-                yield node.doc_comment
-            if node.tag is not None:
-                yield node.tag
-        yield node
-        if node.implicit_type == 'dict':
-            for k, v in zip(node.key_nodes.values(), node.values()):
-                for x in self._iter_node(k):
-                    yield x
-                for x in self._iter_node(v):
-                    yield x
-        elif node.implicit_type == 'list':
-            for v in node:
-                for x in self._iter_node(v):
-                    yield x
+    def walk(self, node=None, implicit_types=None, events=False):
+        '''
+        Iterate over AST nodes in document order.  See `Ast.walk()`.
+        '''
+        return self._ast.walk(node, implicit_types=implicit_types, events=events)
 
 
     def replace_val(self, path, obj):
         '''
         Replace a value in the AST.
         '''
-        if not isinstance(path, list) and not isinstance(path, tuple):
-            raise TypeError('Path to value must be a list or tuple of dict keys/list indices')
-        pos = self.root[0]
-        for k in path:
-            pos = pos[k]
-        self._replace_val_at_pos(pos, obj)
+        self._replace_val_at_pos(self._get_node_at_path(path), obj)
 
 
-    def _replace_val_at_pos(self, pos, obj):
+    def _replace_val_at_pos(self, pos, obj, enforce_types=None):
+        self._apply_replace_val(pos, obj, self._encode_replace_val(pos, obj, enforce_types))
+
+
+    def _encode_replace_val(self, pos, obj, enforce_types=None, pending_replaced=None):
+        '''
+        Check a value replacement and encode the new value, without modifying
+        anything.
+        '''
         if pos.tag is not None:
             raise TypeError('Value replacement is not currently supported for tagged objects')
-        if self.enforce_types and type(obj) != type(pos.final_val) and not (self.encoder.baseclass and issubclass(type(obj), type(pos.final_val))):
+        self._check_not_replaced(pos.parent, pending_replaced)
+        if enforce_types is None:
+            enforce_types = self.enforce_types
+        if enforce_types and type(obj) != type(pos.final_val) and not (self.encoder.baseclass and issubclass(type(obj), type(pos.final_val))):
             raise TypeError('Value replacement is only allowed for values of the same type (enforce_types=True); trying to replace {0} with {1}'.format(type(pos.final_val), type(obj)))
         if pos.implicit_type in ('dict', 'list'):
             encoded_val = self.encoder.partial_encode(obj, flush_margin=pos.parent.implicit_type == 'list',
@@ -459,30 +715,44 @@ class RoundtripAst(object):
                                                       inline=pos.inline, at_line_start=pos.at_line_start, indent=pos.indent,
                                                       initial_nesting_depth=pos.nesting_depth)
         else:
-            encoded_val = self.encoder.partial_encode(obj, flush_margin=pos.parent.implicit_type == 'list',
-                                                      after_start_list_item=not pos.inline and pos.parent.implicit_type == 'list',
-                                                      inline=pos.inline, at_line_start=pos.at_line_start, indent=pos.indent,
-                                                      delim=pos.delim, block=pos.block, num_base=pos.num_base)
+            if type(obj) is type(pos.final_val):
+                delim, block, num_base = pos.delim, pos.block, pos.num_base
+            else:
+                # Formatting of the replaced value only applies to its type
+                delim = block = num_base = None
+            encoded_val = self.encoder.partial_encode_scalar(obj, flush_margin=pos.parent.implicit_type == 'list',
+                                                             after_start_list_item=not pos.inline and pos.parent.implicit_type == 'list',
+                                                             inline=pos.inline, at_line_start=pos.at_line_start, indent=pos.indent,
+                                                             delim=delim, block=block, num_base=num_base)
             if isinstance(obj, str) and self.encoder.bidi_rtl_re.search(encoded_val) is not None and self.encoder.bidi_rtl_re.search(pos.raw_val) is None:
-                if pos.first_colno < self._objects_starting_on_line[pos.first_lineno][-1].first_colno:
+                if pos.first_colno < self._last_object_starting_on_line(pos.first_lineno).first_colno:
                     raise ValueError('Replacing strings that do not contain right-to-left code points with strings that do contain them is currently not supported when this would require reformatting to avoid a following object on the same line')
+        return encoded_val
+
+
+    def _apply_replace_val(self, pos, obj, encoded_val):
         pos.final_val = obj
         if pos.implicit_type not in ('dict', 'list'):
             pos.raw_val = encoded_val
+            if pos.implicit_type == 'alias':
+                self._clear_node_caches(pos)
+        else:
+            # Nodes within the collection no longer correspond to its value
+            self._clear_node_caches(pos)
+            self._replaced_collections[id(pos)] = pos
         if hasattr(pos, 'index'):
             pos.parent.final_val[pos.index] = obj
-        self._replacements[(pos.first_lineno, pos.first_colno, pos.last_lineno, pos.last_colno)] = encoded_val
+        self._add_replacement(pos, encoded_val)
 
 
     def replace_key(self, path, obj):
         '''
         Replace a key in the AST.
         '''
-        if not isinstance(path, list) and not isinstance(path, tuple):
-            raise TypeError('Path to key must be a list or tuple of dict keys/list indices')
-        pos = self.root[0]
-        for k in path[:-1]:
-            pos = pos[k]
+        path = _normalize_path(path)
+        if not path:
+            raise ValueError('Path to key cannot be empty')
+        pos = self._get_node_at_path(path[:-1])
         # Must check type of collection object, given that the key extraction
         # method could also work on a list.
         if not isinstance(pos, dict):
@@ -491,49 +761,849 @@ class RoundtripAst(object):
         self._replace_key_at_pos(pos, key, obj)
 
 
-    def _replace_key_at_pos(self, pos, key, obj):
-        current_dict = pos
+    def _replace_key_at_pos(self, pos, key, obj, enforce_types=None):
+        if obj != key and (obj in pos or (pos.final_val is not None and obj in pos.final_val)):
+            raise ValueError('Key {0} already exists'.format(repr(obj)))
+        self._apply_replace_key(pos, key, obj, self._encode_replace_key(pos, key, obj, enforce_types))
+
+
+    def _encode_replace_key(self, pos, key, obj, enforce_types=None, pending_replaced=None):
+        '''
+        Check a key replacement and encode the new key, without modifying
+        anything.
+        '''
+        self._check_not_replaced(pos, pending_replaced)
         pos = pos.key_nodes[key]
         if pos.tag is not None:
             raise TypeError('Key replacement is not currently supported for tagged objects')
-        if self.enforce_types and type(obj) != type(pos.final_val) and not (self.encoder.baseclass and issubclass(type(obj), type(pos.final_val))):
+        if enforce_types is None:
+            enforce_types = self.enforce_types
+        if enforce_types and type(obj) != type(pos.final_val) and not (self.encoder.baseclass and issubclass(type(obj), type(pos.final_val))):
             raise TypeError('Key replacement is only allowed for keys of the same type (enforce_types=True); trying to replace {0} with {1}'.format(type(pos.final_val), type(obj)))
         key_path = False if pos.key_path is None else True
-        encoded_val = self.encoder.partial_encode(obj,
-                                                  inline=pos.inline, at_line_start=pos.at_line_start, indent=pos.indent,
-                                                  key=True, key_path=key_path,
-                                                  delim=pos.delim, block=pos.block, num_base=pos.num_base)
+        if type(obj) is type(pos.final_val):
+            delim, block, num_base = pos.delim, pos.block, pos.num_base
+        else:
+            delim = block = num_base = None
+        encoded_val = self.encoder.partial_encode_scalar(obj,
+                                                         inline=pos.inline, at_line_start=pos.at_line_start, indent=pos.indent,
+                                                         key=True, key_path=key_path,
+                                                         delim=delim, block=block, num_base=num_base)
         if isinstance(obj, str) and self.encoder.bidi_rtl_re.search(encoded_val) is not None and self.encoder.bidi_rtl_re.search(pos.raw_val) is None:
-            if pos.first_colno < self._objects_starting_on_line[pos.first_lineno][-1].first_colno:
+            if pos.first_colno < self._last_object_starting_on_line(pos.first_lineno).first_colno:
                 raise ValueError('Replacing strings that do not contain right-to-left code points with strings that do contain them is currently not supported when this would require reformatting to avoid a following object on the same line')
+        return encoded_val
+
+
+    def _apply_replace_key(self, current_dict, key, obj, encoded_val):
+        pos = current_dict.key_nodes[key]
         # Need to update the dict so that the key ordering is kept, the new
-        # key is recognized as a key, and the old key is removed.  The
-        # easiest way to do this while keeping all dict attributes and all
-        # existing references to the dict is to remove all keys, change the
-        # key object, and then add everything back again.
-        current_dict_kv_pairs = [(k, v) for k, v in current_dict.items()]
-        for k, v in current_dict_kv_pairs:
-            del current_dict[k]
+        # key is recognized as a key, and the old key is removed, while
+        # keeping all dict attributes and all existing references to the
+        # dict.  Rather than removing and re-adding every key, the key is
+        # replaced in place and its position is tracked in a separate key
+        # order, which is only applied to the dict when it is iterated.
+        key_order = current_dict._key_order
+        if key_order is None:
+            key_order = current_dict._key_order = list(current_dict)
+            current_dict._key_index = {k: n for n, k in enumerate(key_order)}
+        key_index = current_dict._key_index
+        n = key_index.pop(key)
+        key_order[n] = obj
+        key_index[obj] = n
+        v = current_dict.pop(key)
+        if hasattr(v, 'index'):
+            v.index = obj
+        current_dict[obj] = v
         pos.final_val = obj
         pos.raw_val = encoded_val
-        for k, v in current_dict_kv_pairs:
-            if k == key:
-                if hasattr(v, 'index'):
-                    v.index = obj
-                current_dict[obj] = v
-            else:
-                current_dict[k] = v
-        # The dict of key nodes isn't ordered and has no special attributes,
-        # so it's simpler to update.
         del current_dict.key_nodes[key]
         current_dict.key_nodes[obj] = pos
-        self._replacements[(pos.first_lineno, pos.first_colno, pos.last_lineno, pos.last_colno)] = encoded_val
+        final_val = current_dict.final_val
+        if final_val is not None and key in final_val:
+            renamed = self._renamed_values.get(id(final_val))
+            if renamed is None:
+                order = list(final_val)
+                renamed = self._renamed_values[id(final_val)] = (final_val, order, {k: n for n, k in enumerate(order)})
+            final_val, order, index = renamed
+            n = index.pop(key)
+            order[n] = obj
+            index[obj] = n
+            final_val[obj] = final_val.pop(key)
+        self._clear_node_caches()
+        self._add_replacement(pos, encoded_val)
         # The key path nodes aren't being updated, since they aren't being
         # used directly, and the relevant changes are covered (at least for
         # now) by modifying the individual key path elements.
         if pos.key_path_occurrences is not None:
             for occ in pos.key_path_occurrences:
-                self._replacements[(occ.first_lineno, occ.first_colno, occ.last_lineno, occ.last_colno)] = encoded_val
+                self._add_replacement(occ, encoded_val)
+
+
+    def _clear_node_caches(self, removed=None):
+        '''
+        Clear caches of nodes by path and of alias dependents after keys are
+        renamed or nodes are replaced or removed.  Aliases within `removed`
+        (including in tags) no longer appear in the data, so they are no
+        longer alias sites.
+        '''
+        self._node_index.clear()
+        ast = self._ast
+        ast._alias_dependents = None
+        if removed is None:
+            return
+        removed_alias_ids = set()
+        for node in ast.walk(removed, implicit_types=('alias', 'tag')):
+            if node.implicit_type == 'alias':
+                removed_alias_ids.add(id(node))
+            else:
+                for tag_val in node.values():
+                    if tag_val.implicit_type == 'alias':
+                        removed_alias_ids.add(id(tag_val))
+                    elif tag_val.implicit_type == 'alias_list':
+                        removed_alias_ids.update(id(alias_node) for alias_node in tag_val)
+        if removed_alias_ids:
+            alias_sites = ast._alias_sites
+            for label, alias_nodes in list(alias_sites.items()):
+                alias_nodes = [x for x in alias_nodes if id(x) not in removed_alias_ids]
+                if alias_nodes:
+                    alias_sites[label] = alias_nodes
+                else:
+                    del alias_sites[label]
+
+
+    def _restore_value_key_order(self):
+        '''
+        Apply the key order of dict values after keys have been replaced.
+        '''
+        for final_val, order, _ in self._renamed_values.values():
+            items = [(k, final_val[k]) for k in order if k in final_val]
+            final_val.clear()
+            final_val.update(items)
+        self._renamed_values.clear()
+
+
+    def apply_edits(self, edits):
+        '''
+        Apply a sequence of `(path, op, obj)` edits, where `op` is
+        `"replace_val"` or `"replace_key"`.  All paths refer to the AST before
+        any edits.  Edits are applied atomically:  every edit is checked and
+        encoded, in a single encoder session, before anything is modified.
+        '''
+        if not isinstance(edits, list) and not isinstance(edits, tuple):
+            edits = list(edits)
+        root = self.root[0]
+        # Consecutive edits usually share a collection, so the last
+        # collection is reused when possible.
+        last_collection_path = None
+        collection = None
+        # Keys of dicts with key replacements, as they will be after the
+        # preceding edits
+        pending_keys = {}
+        # Collections that will be replaced by the preceding edits
+        pending_replaced = {}
+        actions = []
+        encoder = self.encoder
+        encoder._start_partial_encode_session()
+        try:
+            encode_replace_val = self._encode_replace_val
+            encode_replace_key = self._encode_replace_key
+            for path, op, obj in edits:
+                path = _normalize_path(path)
+                if op == 'replace_val':
+                    if not path:
+                        actions.append((op, root, None, obj, encode_replace_val(root, obj)))
+                        if root.implicit_type in ('dict', 'list'):
+                            pending_replaced[id(root)] = root
+                        continue
+                elif op == 'replace_key':
+                    if not path:
+                        raise ValueError('Path to key cannot be empty')
+                else:
+                    raise ValueError('Unknown edit operation "{0}"'.format(op))
+                collection_path = path[:-1]
+                if collection_path != last_collection_path:
+                    collection = root
+                    for k in collection_path:
+                        collection = collection[k]
+                    last_collection_path = collection_path
+                k = path[-1]
+                if op == 'replace_val':
+                    pos = collection[k]
+                    actions.append((op, pos, None, obj, encode_replace_val(pos, obj, pending_replaced=pending_replaced)))
+                    if pos.implicit_type in ('dict', 'list'):
+                        pending_replaced[id(pos)] = pos
+                else:
+                    if not isinstance(collection, dict):
+                        raise TypeError('Key replacement is only possible for dicts')
+                    keys = pending_keys.get(id(collection))
+                    if keys is None:
+                        keys = pending_keys[id(collection)] = set(collection.key_nodes)
+                    if k not in keys:
+                        raise KeyError(k)
+                    keys.remove(k)
+                    final_val = collection.final_val
+                    if obj in keys or (final_val is not None and obj in final_val and obj not in collection.key_nodes):
+                        raise ValueError('Key replacement would create a duplicate key at path {0}'.format(repr(path)))
+                    keys.add(obj)
+                    actions.append((op, collection, k, obj, encode_replace_key(collection, k, obj, pending_replaced=pending_replaced)))
+        finally:
+            encoder._end_partial_encode_session()
+        apply_replace_val = self._apply_replace_val
+        apply_replace_key = self._apply_replace_key
+        for op, pos, k, obj, encoded_val in actions:
+            if op == 'replace_val':
+                apply_replace_val(pos, obj, encoded_val)
+            else:
+                apply_replace_key(pos, k, obj, encoded_val)
+
+
+    def batch(self):
+        '''
+        Collect edits in a context manager, and apply them together with
+        `apply_edits()` on exit.
+        '''
+        return RoundtripEditBatch(self)
+
+
+    def diff(self, other):
+        '''
+        Compare with another RoundtripAst for a different version of the
+        data.  Dict keys are aligned by key and list elements by index, and
+        a key that is only in one version is treated as renamed if the other
+        version has a new key with an equal value at the same position.
+        Returns a list of `RoundtripChange` in an order in which they can be
+        applied with `apply_changes()`.
+        '''
+        if not isinstance(other, RoundtripAst):
+            raise TypeError('Can only compare with another RoundtripAst')
+        changes = []
+        stack = [((), self.root[0], other.root[0])]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            path, node, other_node = pop()
+            implicit_type = node.implicit_type
+            if implicit_type != other_node.implicit_type or implicit_type not in ('dict', 'list'):
+                old = _node_value(node)
+                new = _node_value(other_node)
+                if not _values_equal(old, new):
+                    changes.append(RoundtripChange('replace_val', path, old, new, None))
+                continue
+            children = []
+            if implicit_type == 'dict':
+                _restore_key_order(node)
+                _restore_key_order(other_node)
+                # Keys that are only in one version are grouped into slots
+                # by the number of shared keys that precede them.  Renamed
+                # keys are then found by pairing removed and added keys
+                # within a slot.
+                removed_by_slot = {}
+                slot = 0
+                for k in node:
+                    if k in other_node:
+                        children.append(k)
+                        slot += 1
+                    else:
+                        removed_by_slot.setdefault(slot, []).append(k)
+                added = []
+                renamed_keys = {}
+                slot = 0
+                anchor = None
+                for k in other_node:
+                    if k in node:
+                        slot += 1
+                        anchor = k
+                        continue
+                    removed = removed_by_slot.get(slot)
+                    if removed:
+                        old_k = removed[0]
+                        old = _node_value(node[old_k])
+                        if _values_equal(old, _node_value(other_node[k])):
+                            del removed[0]
+                            renamed_keys[old_k] = k
+                            anchor = k
+                            changes.append(RoundtripChange('replace_key', path + (old_k,), old_k, k, None))
+                            continue
+                    added.append((k, anchor))
+                for removed in removed_by_slot.values():
+                    for k in removed:
+                        changes.append(RoundtripChange('delete', path + (k,), _node_value(node[k]), None, None))
+                # Insertions after the same key are made in reverse order,
+                # since each is placed immediately after the key
+                for n in range(len(added)-1, -1, -1):
+                    k, anchor = added[n]
+                    if anchor is None:
+                        continue
+                    changes.append(RoundtripChange('insert_key', path + (k,), None, _node_value(other_node[k]), anchor))
+                for k, anchor in added:
+                    if anchor is None:
+                        changes.append(RoundtripChange('insert_key', path + (k,), None, _node_value(other_node[k]), None))
+            else:
+                len_node = len(node)
+                len_other_node = len(other_node)
+                len_shared = min(len_node, len_other_node)
+                for n in range(len_node-1, len_shared-1, -1):
+                    changes.append(RoundtripChange('delete', path + (n,), _node_value(node[n]), None, None))
+                for n in range(len_shared, len_other_node):
+                    changes.append(RoundtripChange('append', path + (n,), None, _node_value(other_node[n]), None))
+                children = range(len_shared)
+            for k in reversed(children):
+                push((path + (k,), node[k], other_node[k]))
+        return changes
+
+
+    def apply_changes(self, changes):
+        '''
+        Apply changes from `diff()`.  For a three-way merge, the changes
+        between a base version and one derived version may be applied to
+        another derived version.  Changes that are already present are
+        skipped.  A ValueError is raised for conflicts, when the existing data
+        differs from both the old and the new data.  Paths must still exist,
+        except for data that has already been deleted.
+
+        All changes are checked and encoded before anything is modified.
+        Since changes describe another version of the data, values and keys
+        may be replaced with objects of a different type regardless of
+        `enforce_types`.
+        '''
+        # Collections as they will be after the preceding changes
+        pending = {}
+        # Collections that will be replaced by the preceding changes
+        pending_replaced = {}
+        actions = []
+        encoder = self.encoder
+        encoder._start_partial_encode_session()
+        try:
+            for change in changes:
+                op = change.op
+                path = change.path
+                if op == 'replace_val':
+                    pos = self._get_node_at_path(path)
+                    current = _node_value(pos)
+                    if _values_equal(current, change.new):
+                        continue
+                    if not _values_equal(current, change.old):
+                        raise ValueError('Conflicting change at path {0}'.format(repr(path)))
+                    actions.append((op, pos, None, change.new,
+                                    self._encode_replace_val(pos, change.new, enforce_types=False, pending_replaced=pending_replaced)))
+                    if pos.implicit_type in ('dict', 'list'):
+                        pending_replaced[id(pos)] = pos
+                    continue
+                if not path:
+                    raise ValueError('Path in change cannot be empty')
+                pos = self._get_node_at_path(path[:-1])
+                k = path[-1]
+                if op == 'replace_key':
+                    if pos.implicit_type != 'dict':
+                        raise TypeError('Key replacement is only possible for dicts')
+                    state = pending.get(id(pos))
+                    if state is None:
+                        state = pending[id(pos)] = _PendingCollection(pos)
+                    key = state.ast_key(k)
+                    if key is None:
+                        if state.ast_key(change.new) is not None:
+                            continue
+                        raise KeyError(k)
+                    if change.new != k and state.has_key(change.new):
+                        raise ValueError('Key {0} already exists'.format(repr(change.new)))
+                    actions.append((op, pos, k, change.new,
+                                    self._encode_replace_key(pos, key, change.new, enforce_types=False, pending_replaced=pending_replaced)))
+                    state.replace_key(k, change.new)
+                elif op == 'insert_key':
+                    if pos.implicit_type != 'dict':
+                        raise TypeError('Key insertion is only possible for dicts')
+                    state = pending.get(id(pos))
+                    if state is None:
+                        state = pending[id(pos)] = _PendingCollection(pos)
+                    if state.has_key(k):
+                        if _values_equal(state.key_value(k), change.new):
+                            continue
+                        raise ValueError('Conflicting change at path {0}'.format(repr(path)))
+                    after = change.after
+                    if after is not None and state.ast_key(after) is None:
+                        after = None
+                    anchor_key = state.last_ast_key() if after is None else state.ast_key(after)
+                    if anchor_key is None:
+                        anchor_key_node = anchor_val = None
+                    else:
+                        anchor_key_node = pos.key_nodes[anchor_key]
+                        anchor_val = pos[anchor_key]
+                    encoded_val = self._encode_insert_key(pos, k, change.new, anchor_key_node, pending_replaced)
+                    actions.append((op, pos, k, change.new, (after, anchor_key_node, anchor_val, encoded_val)))
+                    state.insert_key(k, change.new)
+                elif op == 'append':
+                    if pos.implicit_type != 'list':
+                        raise TypeError('Appending is only possible for lists')
+                    state = pending.get(id(pos))
+                    if state is None:
+                        state = pending[id(pos)] = _PendingCollection(pos)
+                    values = state.values
+                    if values is not None and k < len(values) and _values_equal(values[k], change.new):
+                        continue
+                    last_val = state.elements[-1] if state.elements else None
+                    encoded_val = self._encode_append(pos, change.new, last_val, pending_replaced)
+                    actions.append((op, pos, None, change.new, (last_val, encoded_val)))
+                    if values is not None:
+                        values.append(change.new)
+                elif op == 'delete':
+                    if pos.implicit_type not in ('dict', 'list'):
+                        raise TypeError('Deletion is only possible for dict keys and list elements')
+                    state = pending.get(id(pos))
+                    if state is None:
+                        state = pending[id(pos)] = _PendingCollection(pos)
+                    if pos.implicit_type == 'dict':
+                        key = state.ast_key(k)
+                        if key is None:
+                            continue
+                        key_node = pos.key_nodes[key]
+                        val = pos[key]
+                        num_elements = state.num_keys
+                    else:
+                        elements = state.elements
+                        num_elements = len(elements)
+                        if not -num_elements <= k < num_elements:
+                            continue
+                        if k < 0:
+                            k += num_elements
+                        key_node = None
+                        val = elements[k]
+                    if not _values_equal(_node_value(val), change.old):
+                        raise ValueError('Conflicting change at path {0}'.format(repr(path)))
+                    self._check_delete(pos, key_node, val, num_elements, pending_replaced)
+                    actions.append((op, pos, k, None, None))
+                    state.delete(k)
+                else:
+                    raise ValueError('Unknown change operation "{0}"'.format(op))
+        finally:
+            encoder._end_partial_encode_session()
+        for op, pos, k, obj, encoded_val in actions:
+            if op == 'replace_val':
+                self._apply_replace_val(pos, obj, encoded_val)
+            elif op == 'replace_key':
+                self._apply_replace_key(pos, k, obj, encoded_val)
+            elif op == 'insert_key':
+                after, anchor_key_node, anchor_val, encoded_val = encoded_val
+                self._apply_insert_key(pos, k, obj, after, anchor_key_node, anchor_val, encoded_val)
+            elif op == 'append':
+                last_val, encoded_val = encoded_val
+                self._apply_append(pos, obj, last_val, encoded_val)
+            else:
+                self._apply_delete(pos, k)
+
+
+    def insert_key(self, path, key, obj, after=None):
+        '''
+        Insert a key and value into the dict at `path`, immediately after
+        the existing key `after`, or at the end of the dict.  The new data is
+        included in the `.value` of the dict, but is not part of the AST
+        until the data is loaded again.
+        '''
+        pos = self._get_node_at_path(path)
+        if pos.implicit_type != 'dict':
+            raise TypeError('Key insertion is only possible for dicts')
+        if key in pos or (pos.final_val is not None and key in pos.final_val):
+            raise ValueError('Key {0} already exists'.format(repr(key)))
+        _restore_key_order(pos)
+        if after is None:
+            anchor_key = list(pos)[-1] if pos else None
+        elif after not in pos:
+            raise KeyError(after)
+        else:
+            anchor_key = after
+        if anchor_key is None:
+            anchor_key_node = anchor_val = None
+        else:
+            anchor_key_node = pos.key_nodes[anchor_key]
+            anchor_val = pos[anchor_key]
+        encoded_val = self._encode_insert_key(pos, key, obj, anchor_key_node)
+        self._apply_insert_key(pos, key, obj, after, anchor_key_node, anchor_val, encoded_val)
+
+
+    def _encode_insert_key(self, pos, key, obj, anchor_key_node, pending_replaced=None):
+        '''
+        Check a key insertion after the key `anchor_key_node`, or into an
+        empty dict, and encode the new key and value, without modifying
+        anything.
+        '''
+        self._check_structure_edit(pos, pending_replaced)
+        if anchor_key_node is not None and anchor_key_node.key_path is not None:
+            raise NotImplementedError('Key insertion after keys in key paths is not currently supported')
+        encoder = self.encoder
+        if pos.inline:
+            indent = pos.inline_indent or ''
+            if anchor_key_node is not None:
+                indent = self._get_inline_item_leading(self._get_item_lead(anchor_key_node), indent)[1]
+            encoded_key = encoder.partial_encode(key, inline=True, at_line_start=False, indent=indent, key=True)
+            encoded_val = encoder.partial_encode(obj, inline=True, at_line_start=False, indent=indent,
+                                                 initial_nesting_depth=pos.nesting_depth + 1)
+            return '{0} {1} {2}'.format(encoded_key, ASSIGN_KEY_VAL, encoded_val)
+        return '\n' + pos.indent + encoder.partial_encode({key: obj}, inline=False, at_line_start=True, indent=pos.indent,
+                                                          initial_nesting_depth=pos.nesting_depth)
+
+
+    def _apply_insert_key(self, pos, key, obj, after, anchor_key_node, anchor_val, encoded_val):
+        _restore_key_order(pos)
+        if self._renamed_values:
+            self._restore_value_key_order()
+        if pos.inline:
+            if anchor_key_node is None:
+                # Empty collection, possibly with previous insertions
+                lineno = pos.first_lineno
+                colno = pos.first_colno + 1
+                if id(pos) in self._collection_insertions:
+                    leading = INLINE_ELEMENT_SEPARATOR + '\x20'
+                else:
+                    leading = ''
+            else:
+                lineno = anchor_val.last_lineno
+                colno = anchor_val.last_colno + 1
+                leading = self._get_inline_item_leading(self._get_item_lead(anchor_key_node), '')[0]
+            if after is None:
+                lineno, colno = self._get_insertion_end(pos, lineno, colno)
+            text = leading + encoded_val
+        else:
+            lineno = self._get_subtree_end(anchor_val)[0]
+            colno = len(self.source_lines[lineno-1]) + 1
+            if after is None:
+                lineno, colno = self._get_insertion_end(pos, lineno, colno)
+            text = encoded_val
+        self._add_insertion(pos, lineno, colno, text, prepend=after is not None)
+        final_val = pos.final_val
+        if final_val is not None:
+            if after is None:
+                final_val[key] = obj
+            else:
+                final_val_items = list(final_val.items())
+                final_val.clear()
+                for k, v in final_val_items:
+                    final_val[k] = v
+                    if k == after:
+                        final_val[key] = obj
+                if key not in final_val:
+                    final_val[key] = obj
+
+
+    def append(self, path, obj):
+        '''
+        Append a value to the list at `path`.  The new data is included in
+        the `.value` of the list, but is not part of the AST until the data is
+        loaded again.
+        '''
+        pos = self._get_node_at_path(path)
+        if pos.implicit_type != 'list':
+            raise TypeError('Appending is only possible for lists')
+        last_val = pos[-1] if pos else None
+        self._apply_append(pos, obj, last_val, self._encode_append(pos, obj, last_val))
+
+
+    def _encode_append(self, pos, obj, last_val, pending_replaced=None):
+        '''
+        Check appending after the element `last_val`, or to an empty list,
+        and encode the new value, without modifying anything.
+        '''
+        self._check_structure_edit(pos, pending_replaced)
+        encoder = self.encoder
+        if pos.inline:
+            indent = pos.inline_indent or ''
+            if last_val is not None:
+                indent = self._get_inline_item_leading(self._get_item_lead(last_val), indent)[1]
+            return encoder.partial_encode(obj, inline=True, at_line_start=False, indent=indent,
+                                          initial_nesting_depth=pos.nesting_depth + 1)
+        lead = self._get_item_lead(last_val)
+        start_list_item = self.source_lines[lead.first_lineno-1][:lead.first_colno-1]
+        if start_list_item.strip() != OPEN_INDENTATION_LIST:
+            raise NotImplementedError('Appending is only supported for lists in indentation-style syntax when each element starts on the same line as its "{0}"'.format(OPEN_INDENTATION_LIST))
+        encoded_val = encoder.partial_encode(obj, flush_margin=True, after_start_list_item=True,
+                                             inline=False, at_line_start=last_val.at_line_start, indent=last_val.indent,
+                                             initial_nesting_depth=pos.nesting_depth + 1)
+        if encoded_val[:1] == '\n':
+            start_list_item = start_list_item.rstrip()
+        return '\n' + start_list_item + encoded_val
+
+
+    def _apply_append(self, pos, obj, last_val, encoded_val):
+        if pos.inline:
+            if last_val is not None:
+                lineno = last_val.last_lineno
+                colno = last_val.last_colno + 1
+                leading = self._get_inline_item_leading(self._get_item_lead(last_val), '')[0]
+            else:
+                # Empty collection, possibly with previous insertions
+                lineno = pos.first_lineno
+                colno = pos.first_colno + 1
+                if id(pos) in self._collection_insertions:
+                    leading = INLINE_ELEMENT_SEPARATOR + '\x20'
+                else:
+                    leading = ''
+            text = leading + encoded_val
+        else:
+            lineno = self._get_subtree_end(last_val)[0]
+            colno = len(self.source_lines[lineno-1]) + 1
+            text = encoded_val
+        lineno, colno = self._get_insertion_end(pos, lineno, colno)
+        self._add_insertion(pos, lineno, colno, text)
+        if pos.final_val is not None:
+            pos.final_val.append(obj)
+
+
+    def delete(self, path):
+        '''
+        Delete the dict key and value or the list element at `path`.
+        '''
+        path = _normalize_path(path)
+        if not path:
+            raise ValueError('Path to object cannot be empty')
+        pos = self._get_node_at_path(path[:-1])
+        k = path[-1]
+        if pos.implicit_type == 'dict':
+            if k not in pos:
+                raise KeyError(k)
+            key_node = pos.key_nodes[k]
+        elif pos.implicit_type == 'list':
+            if not isinstance(k, int):
+                raise TypeError('List indices must be integers')
+            if k < 0:
+                k += len(pos)
+            if not 0 <= k < len(pos):
+                raise IndexError('List index out of range')
+            key_node = None
+        else:
+            raise TypeError('Deletion is only possible for dict keys and list elements')
+        self._check_delete(pos, key_node, pos[k], len(pos))
+        self._apply_delete(pos, k)
+
+
+    def _check_delete(self, pos, key_node, val, num_elements, pending_replaced=None):
+        '''
+        Check deletion of the value `val` and its key `key_node`, if any,
+        from a collection with `num_elements` elements, without modifying
+        anything.
+        '''
+        if key_node is not None and (key_node.key_path is not None or key_node.key_path_occurrences is not None):
+            raise NotImplementedError('Deletion of keys in key paths is not currently supported')
+        self._check_structure_edit(pos, pending_replaced)
+        if pos.inline:
+            return
+        if num_elements == 1:
+            raise NotImplementedError('Deleting the only element of a collection in indentation-style syntax is not currently supported')
+        lead = self._get_item_lead(val if key_node is None else key_node)
+        leading = self.source_lines[lead.first_lineno-1][:lead.first_colno-1].strip()
+        if leading != ('' if pos.implicit_type == 'dict' else OPEN_INDENTATION_LIST):
+            raise NotImplementedError('Deletion is only supported for elements of collections in indentation-style syntax that start on their own line')
+        last_lineno, last_colno = self._get_subtree_end(val)
+        last_obj = self._last_object_starting_on_line(last_lineno)
+        if (last_obj is not None and last_obj.implicit_type != 'line_comment' and
+                (last_obj.first_lineno, last_obj.first_colno) > (last_lineno, last_colno)):
+            raise NotImplementedError('Deletion is only supported for elements of collections in indentation-style syntax that end their last line')
+
+
+    def _apply_delete(self, pos, k):
+        if pos.implicit_type == 'dict':
+            _restore_key_order(pos)
+            keys = list(pos)
+            index = keys.index(k)
+            lead = self._get_item_lead(pos.key_nodes[k])
+            val = pos[k]
+            prev_val = pos[keys[index-1]] if index > 0 else None
+            next_lead = self._get_item_lead(pos.key_nodes[keys[index+1]]) if index + 1 < len(keys) else None
+        else:
+            index = k
+            val = pos[k]
+            lead = self._get_item_lead(val)
+            prev_val = pos[k-1] if k > 0 else None
+            next_lead = self._get_item_lead(pos[k+1]) if k + 1 < len(pos) else None
+        source_lines = self.source_lines
+        if pos.inline:
+            # Remove the element and one separator, or everything within an
+            # inline collection that would become empty.  Insertions after
+            # the element are kept, so then the separator before the element
+            # is removed if there is one, and otherwise the separator that
+            # starts the insertions.  Insertions may follow the element
+            # directly, or follow elements after it that were deleted.
+            insertion_key = (val.last_lineno, val.last_colno+1, val.last_lineno, val.last_colno)
+            insertion_parts = self._insertion_parts.get(insertion_key)
+            if not insertion_parts and id(pos) in self._collection_insertions:
+                if next_lead is None:
+                    end = (pos.last_lineno, pos.last_colno)
+                else:
+                    end = (next_lead.first_lineno, next_lead.first_colno)
+                later_keys = [key for key in self._collection_insertions[id(pos)][1]
+                              if (val.last_lineno, val.last_colno) < key[:2] <= end and self._insertion_parts[key]]
+                if later_keys:
+                    insertion_key = min(later_keys)
+                    insertion_parts = self._insertion_parts[insertion_key]
+            if prev_val is not None and (insertion_parts or next_lead is None):
+                span = (prev_val.last_lineno, prev_val.last_colno+1, val.last_lineno, val.last_colno)
+            elif insertion_parts:
+                # The separator is followed by a space, or by a newline and
+                # indentation when the insertion is on its own line
+                span = (lead.first_lineno, lead.first_colno, insertion_key[2], insertion_key[3])
+                nesting_depth, text = insertion_parts[0]
+                if text.startswith(INLINE_ELEMENT_SEPARATOR):
+                    insertion_parts[0] = (nesting_depth, text[len(INLINE_ELEMENT_SEPARATOR):].lstrip('\x20\t\n'))
+                    self._replacements[insertion_key] = ''.join(part_text for _, part_text in insertion_parts)
+            elif next_lead is not None:
+                span = (lead.first_lineno, lead.first_colno, next_lead.first_lineno, next_lead.first_colno-1)
+            else:
+                span = (lead.first_lineno, lead.first_colno, pos.last_lineno, pos.last_colno-1)
+        else:
+            last_lineno = self._get_subtree_end(val)[0]
+            # Remove whole lines.  When possible, the preceding newline is
+            # removed rather than the final newline, so that insertions at
+            # the end of the last line are kept.  Otherwise, insertions take
+            # the place of the removed lines.
+            len_last_line = len(source_lines[last_lineno-1])
+            insertion_key = (last_lineno, len_last_line+1, last_lineno, len_last_line)
+            insertion_parts = self._insertion_parts.get(insertion_key)
+            if insertion_parts:
+                # Insertions into collections within the element are removed
+                # with it
+                kept_parts = [part for part in insertion_parts if part[0] <= pos.nesting_depth]
+                if len(kept_parts) < len(insertion_parts):
+                    insertion_parts[:] = kept_parts
+                    self._replacements[insertion_key] = ''.join(part_text for _, part_text in insertion_parts)
+            if lead.first_lineno > 1:
+                span = (lead.first_lineno-1, len(source_lines[lead.first_lineno-2])+1, last_lineno, len_last_line)
+            else:
+                if insertion_parts:
+                    span = (1, 1, last_lineno, len_last_line)
+                    nesting_depth, text = insertion_parts[0]
+                    if text[:1] == '\n':
+                        insertion_parts[0] = (nesting_depth, text[1:])
+                        self._replacements[insertion_key] = ''.join(part_text for _, part_text in insertion_parts)
+                else:
+                    span = (1, 1, last_lineno, len_last_line+1)
+        self._add_replacement_at(span[0], span[1], span[2], span[3], '')
+        if pos.implicit_type == 'dict':
+            dict.__delitem__(pos, k)
+            del pos.key_nodes[k]
+            if pos.final_val is not None:
+                pos.final_val.pop(k, None)
+        else:
+            list.__delitem__(pos, index)
+            for n in range(index, len(pos)):
+                pos[n].index = n
+            if pos.final_val is not None:
+                del pos.final_val[index]
+        self._clear_node_caches(val)
+
+
+    def node_at(self, path):
+        '''
+        Return the AST node at a path.  The path may be a list or tuple of
+        dict keys and list indices, or a string like `"a.b[3].c"`.
+        '''
+        return self._get_node_at_path(path)
+
+
+    def _get_node_at_path(self, path):
+        path = _normalize_path(path)
+        if not path:
+            return self.root[0]
+        # Only collections are cached, since a node within a cached
+        # collection is then a single lookup away.  Short paths are walked
+        # directly, since that is as fast as a cache lookup.
+        collection_path = path[:-1]
+        if len(collection_path) < 3:
+            pos = self.root[0]
+            for k in collection_path:
+                pos = pos[k]
+        else:
+            node_index = self._node_index
+            pos = node_index.get(collection_path)
+            if pos is None:
+                # Start from the longest path prefix that is already cached,
+                # and cache each new prefix along the way
+                n = len(collection_path) - 1
+                while n > 0 and collection_path[:n] not in node_index:
+                    n -= 1
+                pos = node_index[collection_path[:n]] if n > 0 else self.root[0]
+                for m in range(n, len(collection_path)):
+                    pos = pos[collection_path[m]]
+                    node_index[collection_path[:m+1]] = pos
+        return pos[path[-1]]
+
+
+    @staticmethod
+    def _get_item_lead(node):
+        '''
+        Find the first node among a node and its doc comment and tag.
+        '''
+        lead = node
+        for other in (node.doc_comment, node.tag):
+            if other is not None and (other.first_lineno, other.first_colno) < (lead.first_lineno, lead.first_colno):
+                lead = other
+        return lead
+
+
+    def _get_inline_item_leading(self, lead, indent):
+        '''
+        Find the text that precedes an element inserted after an element of
+        an inline collection, and the indentation for the inserted element.
+        When the existing element starts on its own line, the inserted
+        element is placed on a new line with the same indentation.
+        '''
+        line_start = self.source_lines[lead.first_lineno-1][:lead.first_colno-1]
+        if line_start and not line_start.lstrip('\x20\t'):
+            return (INLINE_ELEMENT_SEPARATOR + '\n' + line_start, line_start)
+        return (INLINE_ELEMENT_SEPARATOR + '\x20', indent)
+
+
+    def _get_subtree_end(self, node):
+        '''
+        Find the end of a node and everything it contains, including
+        insertions.  Collections in indentation-style syntax do not track
+        the ends of inline collections that they contain.
+        '''
+        last_lineno = node.last_lineno
+        last_colno = node.last_colno
+        collection_insertions = self._collection_insertions
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if (node.last_lineno, node.last_colno) > (last_lineno, last_colno):
+                last_lineno = node.last_lineno
+                last_colno = node.last_colno
+            if collection_insertions and id(node) in collection_insertions:
+                insertion_lineno, insertion_colno = collection_insertions[id(node)][2][:2]
+                if (insertion_lineno, insertion_colno-1) > (last_lineno, last_colno):
+                    last_lineno = insertion_lineno
+                    last_colno = insertion_colno - 1
+            implicit_type = node.implicit_type
+            if implicit_type == 'dict':
+                stack.extend(node.values())
+            elif implicit_type == 'list':
+                stack.extend(node)
+        return (last_lineno, last_colno)
+
+
+    def _check_not_replaced(self, pos, pending_replaced=None):
+        '''
+        Check that neither a node nor any node containing it has been
+        replaced, or will be replaced according to `pending_replaced`.
+        '''
+        replaced = self._replaced_collections
+        if not replaced and not pending_replaced:
+            return
+        root = self.root
+        while pos is not root:
+            if id(pos) in replaced or (pending_replaced and id(pos) in pending_replaced):
+                raise NotImplementedError('Modifying replaced dict-like or list-like objects, or objects within them, is not currently supported')
+            pos = pos.parent
+
+
+    def _check_structure_edit(self, pos, pending_replaced=None):
+        if pos.implicit_type not in ('dict', 'list'):
+            raise TypeError('Insertion and deletion are only possible for dicts and lists')
+        self._check_not_replaced(pos, pending_replaced)
+        if pos.tag is not None and (pos.tag.type is not None or pos.tag.collection_config):
+            raise NotImplementedError('Insertion and deletion are not currently supported for collections with explicit types or collection configuration')
+        if not pos.inline:
+            if self._ast._first_section is not None:
+                raise NotImplementedError('Insertion and deletion are not currently supported for collections in indentation-style syntax in data with sections')
+            if pos.key_path_parent is not None or pos._key_path_traversable:
+                raise NotImplementedError('Insertion and deletion are not currently supported for collections created by key paths')
 
 
     def _replace_doc_comment_at_pos(self, pos, obj):
@@ -546,50 +1616,310 @@ class RoundtripAst(object):
             else:
                 continuation_indent = pos.indent + self.encoder.nesting_indent
         encoded_val = self.encoder.partial_encode(obj, dtype='doc_comment', indent=continuation_indent, delim=pos.delim, block=pos.block)
-        self._replacements[(pos.first_lineno, pos.first_colno, pos.last_lineno, pos.last_colno)] = encoded_val
+        self._add_replacement(pos, encoded_val)
 
 
     def _replace_trailing_comment_at_pos(self, pos, obj):
         if not isinstance(obj, str):
             raise TypeError
         encoded_val = self.encoder.partial_encode(obj, dtype='line_comment')
-        self._replacements[(pos.first_lineno, pos.first_colno, pos.last_lineno, pos.last_colno)] = encoded_val
+        self._add_replacement(pos, encoded_val)
 
 
-    def dumps(self):
+    def _add_replacement(self, pos, encoded_val):
+        self._add_replacement_at(pos.first_lineno, pos.first_colno, pos.last_lineno, pos.last_colno, encoded_val)
+
+
+    def _add_replacement_at(self, first_lineno, first_colno, last_lineno, last_colno, encoded_val,
+                            order_key=None):
+        key = (first_lineno, first_colno, last_lineno, last_colno)
+        if key not in self._replacements:
+            # Order by start, and then with enclosing objects before the
+            # objects they contain.
+            order = self._replacement_order
+            if order_key is None:
+                order_key = (first_lineno, first_colno, -last_lineno, -last_colno)
+            if order and order_key < order[-1]:
+                self._replacement_order_sorted = False
+            order.append(order_key)
+        self._replacements[key] = encoded_val
+
+
+    def _get_insertion_end(self, pos, lineno, colno):
         '''
-        Return the modified data as a string.
+        Find where to insert at the end of a collection, given the location
+        after its last element.
         '''
-        new_source = []
-        prev_last_lineno = self.source.first_lineno
-        # Back up by one column, to be before start of content
-        prev_last_colno = self.source.first_colno - 1
-        source_lines = self.source_lines
-        len_source_lines = len(source_lines)
-        len_source = sum(len(x) for x in source_lines)
-        for (first_lineno, first_colno, last_lineno, last_colno), encoded_val in sorted(self._replacements.items(), key=lambda x: (x[0][0], x[0][1], len_source_lines-x[0][2], len_source-x[0][3])):
-            # Note that all `lineno` and `colno` are 1-indexed to agree with
-            # text editors, so that must be corrected in indexing operations.
-            if last_lineno < prev_last_lineno or (last_lineno == prev_last_lineno and last_colno <= prev_last_colno):
+        insertions = self._collection_insertions.get(id(pos))
+        if insertions is not None and insertions[2][:2] > (lineno, colno):
+            return insertions[2][:2]
+        return (lineno, colno)
+
+
+    def _add_insertion(self, pos, lineno, colno, text, prepend=False):
+        '''
+        Insert text into a collection before a given column.  Insertions are
+        replacements that end before they start.  They are ordered before
+        any replacement starting at the same location, using a line number
+        that is less than that of any replacement.
+
+        Multiple insertions at the same location are combined, with
+        insertions into more deeply nested collections first, since they
+        belong to collections that end earlier.
+        '''
+        nesting_depth = pos.nesting_depth
+        key = (lineno, colno, lineno, colno-1)
+        insertions = self._collection_insertions.get(id(pos))
+        if insertions is None:
+            self._collection_insertions[id(pos)] = [pos, set([key]), key]
+        else:
+            insertions[1].add(key)
+            if key > insertions[2]:
+                insertions[2] = key
+        parts = self._insertion_parts.get(key)
+        if parts is None:
+            parts = self._insertion_parts[key] = []
+        n = 0
+        for n, (part_nesting_depth, part_text) in enumerate(parts):
+            if part_nesting_depth < nesting_depth or (prepend and part_nesting_depth == nesting_depth):
+                break
+        else:
+            n = len(parts)
+        parts.insert(n, (nesting_depth, text))
+        self._add_replacement_at(lineno, colno, lineno, colno-1, ''.join(part_text for _, part_text in parts),
+                                 order_key=(lineno, colno, -self.source.last_lineno-1, 0))
+
+
+    def _get_source_offsets(self):
+        '''
+        Source text, and offset of the start of each line within it.  If the
+        source doesn't end with `\n`, it is treated as if it did.
+        '''
+        if self._source_text is None:
+            # Going up to, but not including, `source.last_lineno` is
+            # correct, because `source.last_lineno` is always an empty line.
+            line_offsets = []
+            offset = 0
+            for line in self.source_lines[:self.source.last_lineno-1]:
+                line_offsets.append(offset)
+                offset += len(line) + 1
+            line_offsets.append(offset)
+            self._source_text = ''.join(line + '\n' for line in self.source_lines[:self.source.last_lineno-1])
+            self._line_offsets = line_offsets
+        return (self._source_text, self._line_offsets)
+
+
+    def _iter_edits(self):
+        '''
+        Iterate over non-overlapping replacements in output order, as
+        `(first_lineno, last_lineno, start_offset, end_offset, replacement)`.
+        Offsets are within the source text, with the end offset exclusive.
+        '''
+        order = self._replacement_order
+        if not self._replacement_order_sorted:
+            # The order is mostly sorted, with any new replacements at the
+            # end, which makes this much cheaper than a full sort.
+            order.sort()
+            self._replacement_order_sorted = True
+        source_text, line_offsets = self._get_source_offsets()
+        replacements = self._replacements
+        # Note that all `lineno` and `colno` are 1-indexed to agree with
+        # text editors, so that must be corrected in indexing operations.
+        prev_end = line_offsets[self.source.first_lineno-1] + self.source.first_colno - 1
+        insertion_neg_last_lineno = -self.source.last_lineno-1
+        for first_lineno, first_colno, neg_last_lineno, neg_last_colno in order:
+            if neg_last_lineno == insertion_neg_last_lineno:
+                last_lineno = first_lineno
+                last_colno = first_colno - 1
+            else:
+                last_lineno = -neg_last_lineno
+                last_colno = -neg_last_colno
+            start = line_offsets[first_lineno-1] + first_colno - 1
+            end = line_offsets[last_lineno-1] + last_colno
+            if start < prev_end and end <= prev_end:
                 # Could have modified a value inside a collection, then
-                # replaced the collection
+                # replaced the collection.  Insertions at the end of a
+                # replacement are kept.
                 continue
-            elif first_lineno == prev_last_lineno:
-                new_source.append(source_lines[first_lineno-1][prev_last_colno:first_colno-1])
+            yield (first_lineno, last_lineno, start, end,
+                   replacements[(first_lineno, first_colno, last_lineno, last_colno)])
+            prev_end = end
+
+
+    def _iter_output(self):
+        '''
+        Iterate over the modified data as a sequence of pieces, alternating
+        between unmodified source text and replacements.
+        '''
+        source_text = self._get_source_offsets()[0]
+        prev_end = 0
+        for first_lineno, last_lineno, start, end, encoded_val in self._iter_edits():
+            if start > prev_end:
+                yield source_text[prev_end:start]
+            yield encoded_val
+            prev_end = end
+        yield source_text[prev_end:]
+
+
+    def edits(self):
+        '''
+        Return the modifications as a list of `(start_offset, end_offset,
+        replacement)`, in order and without overlaps.  Offsets are character
+        offsets within the source text (with `\n` newlines), with the end
+        offset exclusive.
+        '''
+        return [(start, end, encoded_val) for first_lineno, last_lineno, start, end, encoded_val in self._iter_edits()]
+
+
+    def write_patch(self, fp, fromfile=None, tofile=None, context=3):
+        '''
+        Write the modifications to a file-like object as a unified diff,
+        with `context` lines of context.  `fromfile` and `tofile` default to
+        the source name.
+        '''
+        if fromfile is None:
+            fromfile = self.source_name
+        if tofile is None:
+            tofile = self.source_name
+        if not isinstance(context, int) or context < 0:
+            raise ValueError('"context" must be an int >= 0')
+        source_text, line_offsets = self._get_source_offsets()
+        num_lines = len(line_offsets) - 1
+        # Merge edits into changes covering whole lines, so that edits
+        # sharing a line are combined:  `[first_lineno, last_lineno, pieces]`.
+        changes = []
+        prev_end = None
+        for first_lineno, last_lineno, start, end, encoded_val in self._iter_edits():
+            if changes and first_lineno <= changes[-1][1]:
+                change = changes[-1]
+                change[2].append(source_text[prev_end:start])
+                change[1] = last_lineno
+            else:
+                if changes:
+                    change = changes[-1]
+                    change[2].append(source_text[prev_end:line_offsets[change[1]]])
+                change = [first_lineno, last_lineno, [source_text[line_offsets[first_lineno-1]:start]]]
+                changes.append(change)
+            change[2].append(encoded_val)
+            prev_end = end
+        if not changes:
+            return
+        change = changes[-1]
+        change[2].append(source_text[prev_end:line_offsets[change[1]]])
+        # Lines at the start or end of a change that are not modified are
+        # context, so that insertions are only `+` lines.  Changes become
+        # `(first_lineno, last_lineno, new_lines)`, with
+        # `last_lineno == first_lineno - 1` when no lines are removed.
+        trimmed_changes = []
+        for first_lineno, last_lineno, pieces in changes:
+            new_lines = [line + '\n' for line in ''.join(pieces).split('\n')[:-1]]
+            len_new_lines = len(new_lines)
+            n = 0
+            while (first_lineno <= last_lineno and n < len_new_lines and
+                   new_lines[n] == source_text[line_offsets[first_lineno-1]:line_offsets[first_lineno]]):
+                first_lineno += 1
+                n += 1
+            m = len_new_lines
+            while (first_lineno <= last_lineno and n < m and
+                   new_lines[m-1] == source_text[line_offsets[last_lineno-1]:line_offsets[last_lineno]]):
+                last_lineno -= 1
+                m -= 1
+            if first_lineno <= last_lineno or n < m:
+                if trimmed_changes and first_lineno == trimmed_changes[-1][1] + 1:
+                    # Adjacent changes are combined, so that all removed
+                    # lines come before all added lines
+                    prev_first_lineno, _, prev_new_lines = trimmed_changes.pop()
+                    trimmed_changes.append((prev_first_lineno, last_lineno, prev_new_lines + new_lines[n:m]))
+                else:
+                    trimmed_changes.append((first_lineno, last_lineno, new_lines[n:m]))
+        if not trimmed_changes:
+            return
+        # Group changes into hunks when their context would overlap.
+        hunks = []
+        for change in trimmed_changes:
+            if hunks and change[0] - hunks[-1][-1][1] - 1 <= 2*context:
+                hunks[-1].append(change)
             else:
-                new_source.append(source_lines[prev_last_lineno-1][prev_last_colno:] + '\n')
-                for lineno in range(prev_last_lineno + 1, first_lineno):
-                    new_source.append(source_lines[lineno-1] + '\n')
-                new_source.append(source_lines[first_lineno-1][:first_colno-1])
-            new_source.append(encoded_val)
-            prev_last_lineno = last_lineno
-            prev_last_colno = last_colno
-        new_source.append(source_lines[prev_last_lineno-1][prev_last_colno:] + '\n')
-        # Going up to, but not including, `source.last_lineno` is correct,
-        # because `source.last_lineno` is always an empty line.  If a file
-        # doesn't end with `\n`, it is treated as if it were, so that
-        # `source.last_lineno` always refers to a line containing only an
-        # empty string.
-        for n in range(prev_last_lineno + 1, self.source.last_lineno):
-            new_source.append(source_lines[n-1] + '\n')
-        return ''.join(new_source)
+                hunks.append([change])
+        write = fp.write
+        write('--- {0}\n+++ {1}\n'.format(fromfile, tofile))
+        line_delta = 0
+        for hunk in hunks:
+            hunk_first_lineno = max(hunk[0][0] - context, 1)
+            hunk_last_lineno = min(hunk[-1][1] + context, num_lines)
+            hunk_lines = []
+            lineno = hunk_first_lineno
+            old_count = hunk_last_lineno - hunk_first_lineno + 1
+            new_count = old_count
+            for first_lineno, last_lineno, new_lines in hunk:
+                for n in range(lineno, first_lineno):
+                    hunk_lines.append(' ' + source_text[line_offsets[n-1]:line_offsets[n]])
+                for n in range(first_lineno, last_lineno+1):
+                    hunk_lines.append('-' + source_text[line_offsets[n-1]:line_offsets[n]])
+                for line in new_lines:
+                    hunk_lines.append('+' + line)
+                new_count += len(new_lines) - (last_lineno - first_lineno + 1)
+                lineno = last_lineno + 1
+            for n in range(lineno, hunk_last_lineno+1):
+                hunk_lines.append(' ' + source_text[line_offsets[n-1]:line_offsets[n]])
+            write('@@ -{0} +{1} @@\n'.format(self._format_patch_range(hunk_first_lineno, old_count),
+                                             self._format_patch_range(hunk_first_lineno + line_delta, new_count)))
+            write(''.join(hunk_lines))
+            line_delta += new_count - old_count
+
+
+    @staticmethod
+    def _format_patch_range(lineno, count):
+        if count == 1:
+            return str(lineno)
+        if count == 0:
+            return '{0},0'.format(lineno - 1)
+        return '{0},{1}'.format(lineno, count)
+
+
+    def dumps(self):
+        '''
+        Return the modified data as a string.
+        '''
+        return ''.join(self._iter_output())
+
+
+    def dump(self, fp):
+        '''
+        Write the modified data to a file-like object, without assembling
+        it into a single string.
+        '''
+        write = fp.write
+        for piece in self._iter_output():
+            if piece:
+                write(piece)
+
+
+
+class RoundtripEditBatch(object):
+    '''
+    Edits to a RoundtripAst that are applied together on exit.
+    '''
+    __slots__ = ['_ast', 'edits']
+
+    def __init__(self, ast):
+        self._ast = ast
+        self.edits = []
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._ast.apply_edits(self.edits)
+        self.edits = []
+
+
+    def replace_val(self, path, obj):
+        self.edits.append((path, 'replace_val', obj))
+
+
+    def replace_key(self, path, obj):
+        self.edits.append((path, 'replace_key', obj))
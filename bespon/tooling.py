@@ -33,3 +33,33 @@ class keydefaultdict(collections.defaultdict):
         else:
             self[k] = self.default_factory(k)
             return self[k]
+
+
+class boundedkeydefaultdict(keydefaultdict):
+    '''
+    `keydefaultdict` that stores at most `max_size` values generated by the
+    factory function.  When the limit is reached, all generated values are
+    discarded before the next one is stored.  Values that are set directly
+    (including initial values) are never discarded.  This allows
+    memoization in long-lived objects without unbounded memory growth.
+    '''
+    def __init__(self, default_factory, max_size, *args, **kwargs):
+        super(boundedkeydefaultdict, self).__init__(default_factory, *args, **kwargs)
+        if not isinstance(max_size, int):
+            raise TypeError
+        if max_size < 1:
+            raise ValueError
+        self.max_size = max_size
+        self._generated_keys = []
+
+    def __missing__(self, k):
+        if self.default_factory is None:
+            raise KeyError(k)
+        generated_keys = self._generated_keys
+        if len(generated_keys) >= self.max_size:
+            for gk in generated_keys:
+                self.pop(gk, None)
+            del generated_keys[:]
+        v = self[k] = self.default_factory(k)
+        generated_keys.append(k)
+        return v
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2017, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the BSD 3-Clause License:
+# http://opensource.org/licenses/BSD-3-Clause
+#
+
+
+# pylint: disable=C0301
+
+from __future__ import (division, print_function, absolute_import,
+                        unicode_literals)
+
+
+import sys
+import os
+import io
+import random
+import base64
+import binascii
+if all(os.path.isdir(x) for x in ['bespon', 'test']):
+    sys.path.insert(0, '.')
+
+import bespon
+import pytest
+
+
+
+
+def test_interning():
+    source = 'a = (label=s)> "text"\nb = $s\nc = [text, text]\nd = {text = text}\ne = (label=l)> [1]\nf = $l'
+    value = bespon.loads(source, intern_keys=True, intern_values=8)
+    assert value == bespon.loads(source)
+    assert value['a'] is value['b'] is value['c'][0] is value['c'][1] is value['d']['text']
+    assert value['e'] is value['f']
+    assert bespon.loads(source, compact_ast=True, intern_values=8) == value
+
+
+def test_escape_fast_paths():
+    rnd = random.Random(0)
+    alphabet = [chr(n) for n in range(128)] + ['\u05d0', '\x85', '\u00e9', '\u2028']
+    for only_ascii_source in (False, True):
+        escape = bespon.escape.Escape(only_ascii_source=only_ascii_source)
+        translate_tables = escape._ascii_translate_tables
+        for n in range(2000):
+            s = ''.join(rnd.choice(alphabet[:128] if n % 2 else alphabet) for _ in range(rnd.randint(0, 10)))
+            for kwargs in ({}, {'multidelim': True}, {'inline': True}, {'inline': True, 'bidi_rtl': True}):
+                for delim in ("'", '"'):
+                    escaped = escape.escape_unicode(s, delim, **kwargs)
+                    # Without translation tables, regex substitution is used
+                    escape._ascii_translate_tables = {}
+                    try:
+                        assert escaped == escape.escape_unicode(s, delim, **kwargs)
+                    finally:
+                        escape._ascii_translate_tables = translate_tables
+        assert escape.escape_bytes(b'abc', '"') == b'abc'
+
+
+def test_unescape_fast_paths():
+    # Strings without backslashes skip regex substitution.  Appending an
+    # escape gives the same string processed by regex substitution.
+    rnd = random.Random(0)
+    unescape = bespon.escape.Unescape()
+    alphabet = ['a', ' ', '\n', '\x03', '\u00e9', '\u05d0']
+    for n in range(2000):
+        s = ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 10)))
+        for newline, indent in ((None, None), ('\n', ''), ('\r\n', None), ('', None), (None, '  '), ('\r\n', '\t')):
+            assert unescape.unescape_unicode(s + '\\x41', newline, indent) == unescape.unescape_unicode(s, newline, indent) + 'A'
+            if s.isascii():
+                b = s.encode('ascii')
+                newline_b = None if newline is None else newline.encode('ascii')
+                indent_b = None if indent is None else indent.encode('ascii')
+                assert unescape.unescape_bytes(b + b'\\x41', newline_b, indent_b) == unescape.unescape_bytes(b, newline_b, indent_b) + b'A'
+
+
+def test_bounded_memoization():
+    decoder = bespon.BespONDecoder()
+    encoder = bespon.BespONEncoder(only_ascii_source=True)
+    memos = (decoder._unescape._unescape_unicode_dict, encoder._escape._escape_unicode_dict)
+    prepopulated = [dict(memo) for memo in memos]
+    # Enough distinct code points that each memo is cleared at least once
+    for m in range(3):
+        source = '\n'.join('k{0} = "\\u{{{1:x}}}"'.format(n, 0x4E00 + m*2000 + n) for n in range(2000))
+        value = decoder.decode(source)
+        assert value['k0'] == chr(0x4E00 + m*2000)
+        assert bespon.loads(encoder.encode(value)) == value
+    for memo, initial in zip(memos, prepopulated):
+        assert len(memo) <= len(initial) + bespon.escape.MAX_MEMO_SIZE
+        assert all(memo[k] == v for k, v in initial.items())
+
+
+def test_parallel_sections(monkeypatch):
+    decoder = bespon.BespONDecoder(parallel_sections=2)
+    # Alias and label syntax in strings and comments does not connect sections
+    source = '\n'.join('|=== s{0}.t\na.b = "$x label {0}"\nc = [1, `$y`]  # $z (label=w)>'.format(n) for n in range(4))
+    data = decoder._decode_sections_parallel(source)
+    assert data is not None
+    assert data == bespon.loads(source)
+    monkeypatch.setattr(bespon.decoding, 'MIN_PARALLEL_SECTIONS_LENGTH', 1)
+    assert decoder.decode(source) == bespon.loads(source)
+    for section in ('|=== u\nd = (label=x)> 1', '|=== u\nd = $~.s0.t.c', '|=== u\nd = (dict, init=$~.s0.t)> {e = 1}'):
+        connected_source = source + '\n' + section
+        assert decoder._decode_sections_parallel(connected_source) is None
+        assert decoder.decode(connected_source) == bespon.loads(connected_source)
+
+
+def test_spill_bytes():
+    data = bytes(bytearray(range(256))) * 40
+    encoded = base64.b64encode(data).decode('ascii')
+    lines = '\n'.join('  ' + encoded[n:n+76] for n in range(0, len(encoded), 76))
+    source = "x = (base64)>\n  |'''\n{0}\n  |'''/\ny = (base16)> '414243'\nz = (bytes)> 'abcd'\n".format(lines)
+    files = []
+    def sink():
+        files.append(io.BytesIO())
+        return files[-1]
+    value = bespon.loads(source, spill_bytes_threshold=4, spill_bytes_sink=sink)
+    assert isinstance(value['x'], bespon.load_types.SpilledBytes)
+    assert len(value['x']) == len(data) and value['x'].read() == data
+    assert value['z'].read() == b'abcd'
+    # Data below the threshold is not spilled, and any file opened for it
+    # is closed
+    assert value['y'] == b'ABC'
+    assert len([fp for fp in files if not fp.closed]) == 2
+    assert bespon.loads(source) == {'x': data, 'y': b'ABC', 'z': b'abcd'}
+    with pytest.raises(ValueError):
+        bespon.BespONDecoder(spill_bytes_sink=sink)
+    with pytest.raises(TypeError):
+        bespon.BespONDecoder(spill_bytes_threshold=4, spill_bytes_sink=io.BytesIO())
+
+
+def test_spill_chunk_boundaries():
+    data = bytes(bytearray(range(256)))
+    for encoded, quantum, decode in ((base64.b64encode(data), 4, binascii.a2b_base64),
+                                     (base64.b16encode(data), 2, lambda x: base64.b16decode(x, True))):
+        with_newlines = b'\n'.join(encoded[n:n+7] for n in range(0, len(encoded), 7))
+        # Chunks split encoding quanta and lines at varying positions, so
+        # that remainders must be carried over
+        for chunk_size in (1, 3, 5, 8, 13, 1000):
+            fp = io.BytesIO()
+            length = bespon.load_types._spill_decoded_chunks(with_newlines, fp, quantum, decode, chunk_size=chunk_size)
+            assert length == len(data) and fp.getvalue() == data
+    fp = io.BytesIO()
+    assert bespon.load_types._base16_spill_writer(b'41 42\n43', fp) == 3 and fp.getvalue() == b'ABC'
+    with pytest.raises(ValueError):
+        bespon.load_types._base64_spill_writer(b'QUJD!', io.BytesIO())
+
+
+def test_error_location():
+    for source, location in (('a = 1\na = 2', (2, 1, 2, 1)),
+                             ('a = (int)> "x"', (1, 5, 1, 10)),
+                             ('[1, 2', (1, 1, 1, 5)),
+                             ('x = $y', (1, 5, 1, 6)),
+                             ('\x01', (1, 1, 1, 1))):
+        with pytest.raises(bespon.erring.DecodingException) as e:
+            bespon.loads(source)
+        assert e.value.location == bespon.erring.SourceLocation('<data>', *location)
+        assert str(e.value).startswith('\n  In "<data>" at line {0}:{1}'.format(*location))
+    with pytest.raises(bespon.erring.SourceDecodeError) as e:
+        bespon.loads(b'\xff')
+    assert e.value.location is None
+
+
+def test_collect_errors():
+    decoder = bespon.BespONDecoder(collect_errors=True)
+    source = 'a = 1\na = 2\nb = "\\q"\nc = (int)> "x"\nd = ok'
+    with pytest.raises(bespon.erring.DecodingErrors) as e:
+        decoder.decode(source)
+    assert [(type(x), tuple(x.location)[1:]) for x in e.value.errors] == [(bespon.erring.ParseError, (2, 1, 2, 1)),
+                                                                          (bespon.erring.ParseError, (3, 5, 3, 8)),
+                                                                          (bespon.erring.ParseError, (4, 5, 4, 10))]
+    assert e.value.location == e.value.errors[0].location
+    assert str(e.value).startswith('3 errors:') and all(str(x) in str(e.value) for x in e.value.errors)
+    # Errors that end parsing are reported after earlier errors
+    with pytest.raises(bespon.erring.DecodingErrors) as e:
+        decoder.decode('a = 1\na = 2\n[1')
+    assert [tuple(x.location)[1:3] for x in e.value.errors] == [(2, 1), (3, 1)]
+    # A single error has the same message as without collect_errors
+    for source in ('a.b = 1\na.b = 2', '"x\\q"', 'a = 1\n b = 2'):
+        with pytest.raises(bespon.erring.DecodingErrors) as e:
+            decoder.decode(source)
+        with pytest.raises(bespon.erring.DecodingException) as e_single:
+            bespon.loads(source)
+        assert len(e.value.errors) == 1 and str(e.value) == str(e_single.value)
+        assert not isinstance(e_single.value, bespon.erring.DecodingErrors)
+    assert decoder.decode('x = 1') == {'x': 1}
+
+
+def test_incremental_decoder():
+    source = ''.join('k{0} =\n  name = "item {0}"\n  sub.x = [{0}]\n'.format(n) for n in range(20)) + 'g.a = 1\ng.b = "$x label"\n'
+    decoder = bespon.IncrementalDecoder()
+    assert decoder.decode(source) == bespon.loads(source)
+    assert (decoder.decoded_items, decoder.reused_items) == (22, 0)
+    start = source.index('item 7')
+    value = decoder.edit(start, start + 4, 'ITEM')
+    assert value == bespon.loads(decoder.source) and value['k7']['name'] == 'ITEM 7'
+    assert (decoder.decoded_items, decoder.reused_items) == (1, 21)
+    # Errors are the same as for the whole document
+    start = decoder.source.index('k9 =')
+    with pytest.raises(bespon.erring.ParseError) as e:
+        decoder.edit(start, start + 2, 'k8')
+    with pytest.raises(bespon.erring.ParseError) as e_whole:
+        bespon.loads(decoder.source)
+    assert str(e.value) == str(e_whole.value)
+    # Sections, and documents that cannot be split or whose items are
+    # connected by labels or aliases
+    for source, decoded_items in (('# s\n|=== a.b\nx = 1\n|=== a.c\nx = 3\n|=== d\nz = [1]\n', 3),
+                                  ('a = (label=x)> 1\nb = $x', 1),
+                                  ('a = 1\nb = $~.a', 1),
+                                  ('* 1\n* 2', 1),
+                                  ('a = {\nb = 1}\nc = 2', 1),
+                                  ('a.b = 1\na.c = 2', 2)):
+        decoder = bespon.IncrementalDecoder()
+        assert decoder.decode(source) == bespon.loads(source)
+        assert decoder.decoded_items == decoded_items
+    with pytest.raises(TypeError):
+        bespon.IncrementalDecoder().edit(0, 0, 'a = 1')
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2017, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the BSD 3-Clause License:
+# http://opensource.org/licenses/BSD-3-Clause
+#
+
+
+# pylint: disable=C0301
+
+from __future__ import (division, print_function, absolute_import,
+                        unicode_literals)
+
+
+import sys
+import os
+if all(os.path.isdir(x) for x in ['bespon', 'test']):
+    sys.path.insert(0, '.')
+
+import bespon
+import pytest
+
+
+
+
+def test_key_path_cache():
+    parse = bespon.astnodes.parse_key_path_raw_val
+    assert parse('a.bc.*') == (('a', 'str', 0, 0), ('bc', 'str', 2, 3), '*')
+    assert parse('none.true') == ((None, 'none', 0, 3), (True, 'bool', 5, 8))
+    assert parse('x.NONE.y') == (('x', 'str', 0, 0), ('Invalid capitalization of reserved word "none"', None, 2, 5))
+    decoder = bespon.BespONDecoder()
+    assert decoder.decode('a.b.c = 1\na.b.d = 2') == {'a': {'b': {'c': 1, 'd': 2}}}
+    elems = decoder._key_path_elems['a.b.c']
+    assert decoder.decode('|=== x\na.b.c = 1\n|=== y\na.b.c = 2') == {'x': {'a': {'b': {'c': 1}}}, 'y': {'a': {'b': {'c': 2}}}}
+    assert decoder._key_path_elems['a.b.c'] is elems
+    # Cached elements give locations relative to each use
+    for source, location in (('x.NONE = 2', '1:3-6'), ('q =\n  x.NONE = 2', '2:5-8')):
+        for n in range(2):
+            with pytest.raises(bespon.erring.ParseError) as e:
+                decoder.decode(source)
+            assert 'line {0}:'.format(location) in str(e.value)
+    # The cache is bounded
+    for m in range(3):
+        source = '\n'.join('k{0}.x{1} = 1'.format(n, m) for n in range(2000))
+        assert decoder.decode(source)['k0'] == {'x{0}'.format(m): 1}
+        assert len(decoder._key_path_elems) <= bespon.decoding.MAX_KEY_PATH_CACHE_SIZE
+    ast = bespon.loads_roundtrip_ast('a.b.c = 1\na.b.d = 2\n')
+    ast['a']['b']['d'].value = 5
+    ast['a']['b'].key = 'bb'
+    assert ast.dumps() == 'a.bb.c = 1\na.bb.d = 5\n'
+
+
+def check_same_as_full_ast(source):
+    # Decoding to a full AST never uses key path tries
+    value = bespon.loads(source)
+    assert value == bespon.loads_roundtrip_ast(source).value
+    return value
+
+
+def test_inline_key_paths():
+    assert check_same_as_full_ast('x = {a.b = 1}\ny = 2') == {'x': {'a': {'b': 1}}, 'y': 2}
+    assert check_same_as_full_ast('x = {a.b.c = 1, a.x.y = 2}') == {'x': {'a': {'b': {'c': 1}, 'x': {'y': 2}}}}
+    assert check_same_as_full_ast('x = [{a.b = 1}, {c.d = 2}]\ny =\n  z = 3') == {'x': [{'a': {'b': 1}}, {'c': {'d': 2}}], 'y': {'z': 3}}
+
+
+def test_key_path_values():
+    for source in ('a.b.c = 1\na.b.d = "s"\na.x = true\ne = none',
+                   'a.b = 1\na.c =\n  d.e = 2\n  f = 3\na.g = 4',
+                   'a.b = {x = 1}\na.c.d = [1, 2]\na.c.e = (bytes)> "x"',
+                   'a.b =\n  * 1\n  * 2\na.c = 0x10',
+                   'a.b.c = 1\nd = $~.a.b.c\na.b.e = $~.d',
+                   'a.b = 1\nc.d = $~.a\na.e = $_.b',
+                   'l =\n  * a.b = 1\n    a.c = {x = 2}\n  * a.b = 3',
+                   '|=== s\na.b = 1\n|=== t\na.b = 2\na.c.d = 3'):
+        check_same_as_full_ast(source)
+
+
+def test_key_path_errors():
+    for source, msg in (('a.b = 1\na.b = 2', 'in relation to object at 1:3'),
+                        ('a.b = 1\na.b.c = 2', 'in relation to object at 1:7'),
+                        ('|=== x\na.b = 1\n|=== x.a\nc = 2', 'locked'),
+                        ('a.b.c.d.e = 1', 'nesting depth')):
+        with pytest.raises(bespon.erring.ParseError) as e:
+            bespon.loads(source, max_nesting_depth=3)
+        assert msg in str(e.value)
+
+
+def test_key_path_error_locations():
+    # Errors in levels built by key paths have the same locations as errors
+    # in levels built from AST nodes
+    for source, msg in (('a.b.c = 1\na.b.c = 2', 'line 2:5, in relation to object at 1:5'),
+                        ('a.b.c = 1\na.b.c.d = 2', 'in relation to object at 1:9'),
+                        ('a.b = 1\na.c = [1]\na.b = 2', 'line 3:3, in relation to object at 1:3'),
+                        ('x = {a.b = 1, a.b = 2}', 'in relation to object at 1:8')):
+        for kwargs in ({}, {'spill_bytes_threshold': 4}):
+            with pytest.raises(bespon.erring.ParseError) as e:
+                bespon.loads(source, **kwargs)
+            assert msg in str(e.value)
+            with pytest.raises(bespon.erring.ParseError) as e_full:
+                bespon.loads_roundtrip_ast(source)
+            assert str(e.value) == str(e_full.value)
+
+
+def test_key_paths_spill_bytes():
+    source = 'a.b = (bytes)> "abcdef"\na.c = 1'
+    value = bespon.loads(source, spill_bytes_threshold=4)
+    assert value['a']['c'] == 1
+    assert bytes(value['a']['b'].read()) == b'abcdef'
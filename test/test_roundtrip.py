@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2017, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the BSD 3-Clause License:
+# http://opensource.org/licenses/BSD-3-Clause
+#
+
+
+# pylint: disable=C0301
+
+from __future__ import (division, print_function, absolute_import,
+                        unicode_literals)
+
+
+import sys
+import os
+import difflib
+import io
+import itertools
+if all(os.path.isdir(x) for x in ['bespon', 'test']):
+    sys.path.insert(0, '.')
+
+import bespon
+import pytest
+
+
+
+
+def test_bytes_encoding():
+    data = bytes(bytearray(range(256)))
+    for bytes_encoding in ('base16', 'base64'):
+        for length in (0, 1, 2, 3, 57, 256):
+            obj = {'a': data[:length], 'l': [data[:length], {'x': data[:length]}]}
+            for kwargs in ({}, {'bytes_line_length': 7}, {'inline_depth': 1}, {'compact_inline': True, 'inline_depth': 0}):
+                assert bespon.loads(bespon.dumps(obj, bytes_encoding=bytes_encoding, **kwargs)) == obj
+        encoded = bespon.dumps({'a': data[:40]}, bytes_encoding=bytes_encoding, bytes_line_length=20)
+        assert all(len(line.strip()) <= 20 for line in encoded.splitlines())
+    assert bespon.dumps({'a': b'xyz'}, bytes_encoding='base64', compact_inline=True, inline_depth=0) == '{a = (base64)> "eHl6"}\n'
+    assert bespon.dumps({'a': b'xyz'}, compact_inline=True, inline_depth=0) == '{a = (bytes)> xyz}\n'
+
+
+def test_dump():
+    source = 'a = 1\nb = {x = 2, y = [3, 4]}\n# c\nc.d.e = "s"  # t\n'
+    ast = bespon.loads_roundtrip_ast(source)
+    # The source text is only assembled for output
+    assert ast._source_text is None
+    assert ast.dumps() == source
+    # Replacements out of output order
+    ast.replace_val(['c', 'd', 'e'], 'u')
+    ast.replace_val(['b', 'x'], 5)
+    ast.replace_val(['a'], 6)
+    ast.replace_key(['b'], 'bb')
+    expected = 'a = 6\nbb = {x = 5, y = [3, 4]}\n# c\nc.d.e = "u"  # t\n'
+    assert ast.dumps() == expected
+    fp = io.StringIO()
+    ast.dump(fp)
+    assert fp.getvalue() == expected
+    assert bespon.loads_roundtrip_ast('a = 1').dumps() == 'a = 1\n'
+
+
+def test_trailing_comments():
+    source = 'a = 1  # one\nb = {x = 2, y = [3, 4]}  # two\nc =\n  d = "s"\n  e = [1]  # four\n'
+    ast = bespon.loads_roundtrip_ast(source)
+    # Comments are associated when first needed
+    assert not ast._trailing_comments_associated
+    ast.replace_val(['c', 'd'], 't')
+    assert not ast._trailing_comments_associated
+    assert ast['a'].value_trailing_comment == ' one'
+    assert ast._trailing_comments_associated
+    assert ast['b'].value_end_trailing_comment == ' two'
+    assert ast['c']['e'].value_end_trailing_comment == ' four'
+    assert ast['c']['d'].value_trailing_comment is None
+    ast['a'].value_trailing_comment = 'uno'
+    assert ast.dumps() == 'a = 1  #uno\nb = {x = 2, y = [3, 4]}  # two\nc =\n  d = "t"\n  e = [1]  # four\n'
+    assert bespon.loads_roundtrip_ast('a = 1\n')['a'].value_trailing_comment is None
+    ast = bespon.loads_roundtrip_ast('a = 1  # one\nb = {x = 2, y = [3, 4]}\n\nc =\n  d = "s"\n')
+    objs = [ast._last_object_starting_on_line(lineno) for lineno in range(1, 7)]
+    assert [None if obj is None else (obj.implicit_type, obj.first_colno) for obj in objs] == [('line_comment', 8), ('int', 21), None, ('str', 1), ('str', 7), None]
+
+
+def test_walk():
+    def walk_recursive(node):
+        if node.implicit_type not in ('doc_comment', 'tag'):
+            if node.doc_comment is not None:
+                yield node.doc_comment
+            if node.tag is not None:
+                yield node.tag
+        yield node
+        if node.implicit_type == 'dict':
+            for k in node:
+                for x in walk_recursive(node.key_nodes[k]):
+                    yield x
+                for x in walk_recursive(node[k]):
+                    yield x
+        elif node.implicit_type == 'list':
+            for v in node:
+                for x in walk_recursive(v):
+                    yield x
+    source = '### d ###\na = 1\nb = (dict, label=x)> {c = [1, 2, {d = 3}]}\ne = $x\nf.g.h = "s"\n|=== sec\ni =\n  * 1\n  * (int)> 2\n'
+    ast = bespon.loads_roundtrip_ast(source)
+    nodes = list(ast.walk())
+    assert [id(x) for x in nodes] == [id(x) for x in walk_recursive(ast.root[0])]
+    events = list(ast.walk(events=True))
+    assert [node for event, node in events if event == 'enter'] == nodes
+    depth = 0
+    for event, node in events:
+        depth += 1 if event == 'enter' else -1
+        assert depth >= 0
+    assert depth == 0
+    assert [node.final_val for node in ast.walk(implicit_types=['int'])] == [1, 1, 2, 3, 1, 2]
+    assert [node.final_val for node in ast.walk(ast.root[0]['b'], implicit_types={'int'})] == [1, 2, 3]
+    assert [(event, node.implicit_type) for event, node in ast.walk(ast.root[0]['sec']['i'], implicit_types=['list'], events=True)] == [('enter', 'list'), ('exit', 'list')]
+    # Deep nesting does not depend on recursion
+    deep = 'a = ' + '[' * 2000 + '1' + ']' * 2000 + '\n'
+    ast = bespon.loads_roundtrip_ast(deep, max_nesting_depth=3000)
+    assert sum(1 for _ in ast.walk()) == 2003
+
+
+def test_partial_encode_scalar():
+    objs = [None, True, 0, -12, 2**70, 1.5, float('inf'), 'abc', 'a b', '', 'true', 'x\ny', "it's", '\u05d0', 'a.b', ' lead']
+    for kwargs in ({}, {'hex_floats': True, 'integers': False, 'only_ascii_source': True}):
+        encoder = bespon.BespONEncoder(**kwargs)
+        for session in (False, True):
+            if session:
+                encoder._start_partial_encode_session()
+            for obj in objs:
+                for options in itertools.product((False, True), (False, True), (False, True), (False, True), (False, True),
+                                                 (None, '"', "'", '"""'), (False, True), (None, 16), ('', '  ')):
+                    options = dict(zip(('inline', 'at_line_start', 'flush_margin', 'key', 'key_path', 'delim', 'block', 'num_base', 'indent'), options))
+                    results = []
+                    for partial_encode in (encoder.partial_encode_scalar, encoder.partial_encode):
+                        try:
+                            results.append(partial_encode(obj, **options))
+                        except Exception as e:
+                            results.append(type(e))
+                    assert results[0] == results[1], (obj, options)
+            if session:
+                encoder._end_partial_encode_session()
+
+
+def test_string_paths():
+    ast = bespon.loads_roundtrip_ast('a =\n  b = [0, 1, 2, {c = "x", true = 5}]\n  d = 3\n')
+    assert ast.node_at('a.b[3].c') is ast.node_at(['a', 'b', 3, 'c'])
+    assert ast.node_at('a.b[3].true').final_val == 5
+    assert ast.node_at('a.b[-1]').implicit_type == 'dict'
+    assert ast.node_at('').implicit_type == 'dict'
+    # Parsed paths are cached
+    assert bespon.roundtrip._path_strings['a.b[3].c'] is bespon.roundtrip._path_strings['a.b[3].c']
+    ast.replace_val('a.b[3].c', 'y')
+    ast.replace_key('a.b[3].c', 'cc')
+    with pytest.raises(KeyError):
+        ast.node_at('a.b[3].c')
+    assert ast.node_at('a.b[3].cc').final_val == 'y'
+    ast.delete('a.b[0]')
+    assert ast.node_at('a.b[0]').final_val == 1
+    assert ast.dumps() == 'a =\n  b = [1, 2, {cc = "y", true = 5}]\n  d = 3\n'
+    ast.apply_edits([('a.b[-1].cc', 'replace_val', 'z'), ('a.d', 'replace_key', 'e')])
+    assert ast.dumps() == 'a =\n  b = [1, 2, {cc = "z", true = 5}]\n  e = 3\n'
+    for path in ('a..b', '[x]', 'a.*', 'a.inf', '.a', 'a[1]b', 'a.b['):
+        with pytest.raises(ValueError):
+            ast.node_at(path)
+    assert bespon.loads_roundtrip_ast('[[1, 2], 3]').node_at('[0][1]').final_val == 2
+
+
+def check_roundtrip_edits(source, edits):
+    ast = bespon.loads_roundtrip_ast(source)
+    for method, args in edits:
+        getattr(ast, method)(*args)
+    assert bespon.loads(ast.dumps()) == ast.value
+    return ast
+
+
+def test_insertion_after_replacement():
+    ast = check_roundtrip_edits('y = {a = 1}', [('replace_val', (['y', 'a'], 3)),
+                                                ('insert_key', (['y'], 'b', 4))])
+    assert ast.dumps() == 'y = {a = 3, b = 4}\n'
+    ast = check_roundtrip_edits('root0 =\n  * 1\n', [('append', (['root0'], 2)),
+                                                     ('replace_val', (['root0', 0], 5))])
+    assert ast.dumps() == 'root0 =\n  * 5\n  * 2\n'
+    check_roundtrip_edits('root0 =\n  * 1\n  * 2\n', [('append', (['root0'], 3)),
+                                                      ('replace_val', (['root0', 1], 5))])
+
+
+def test_insertion_after_deleted_anchor():
+    for source in ('y = {a = 1, c = 3}', 'y = {a = 1}', 'y = {z = 0, a = 1}',
+                   'a = 1\nc = 3\n', 'x = 0\na = 1\nc = 3\n'):
+        path = ['y'] if source.startswith('y') else []
+        check_roundtrip_edits(source, [('insert_key', (path, 'b', 4, 'a')),
+                                       ('delete', (path + ['a'],))])
+    for source in ('x = [1, 2]', 'x = [1]'):
+        check_roundtrip_edits(source, [('append', (['x'], 3)),
+                                       ('delete', (['x', -1],))])
+
+
+def test_insertion_order_after_deletion():
+    for source, edits in (('e =\n  a =\n    * true\n  b = [\n      none\n  ]\n', [('replace_val', (['e', 'b'], [7])), ('insert_key', ([], 'a', {'y': [3]}, 'e'))]),
+                          ('e = 2.5\nd =\n  * none\n  * {\n        e = 1,\n    }\n', [('append', (['d'], {})), ('delete', (['d', 1],)), ('insert_key', ([], 'n', [1, 2], 'd'))]),
+                          ('a =\n  e =\n    * 2.5\n    * true\n    * 2.5\nd = 2.5\n', [('append', (['a', 'e'], {'z': 1})), ('delete', (['a', 'e', 2],)), ('append', (['a', 'e'], 5))]),
+                          ('a = 1\nb =\n  * 2.5\n  * {e = none}\n', [('append', (['b'], None)), ('append', (['b'], 1.25)), ('delete', (['b'],))]),
+                          ('d =\n  a = [\n      true,\n  ]\n  b = 1\ne = 2\n', [('insert_key', (['d'], 'n', 'new')), ('delete', (['d'],))]),
+                          ('a = 1\nd = [\n    abc,\n    none\n]  # c\n', [('append', (['d'], 1.25)), ('delete', (['d', 1],)), ('delete', (['d', 0],)), ('append', (['d'], 2))]),
+                          ('x = [1, 2]', [('append', (['x'], 3)), ('delete', (['x', 1],)), ('append', (['x'], 4))]),
+                          ('x = {a = 1, b = 2, c = 3, d = 4}', [('insert_key', (['x'], 'y', 5, 'c')), ('delete', (['x', 'c'],)), ('delete', (['x', 'b'],)),
+                                                               ('insert_key', (['x'], 'z', 6)), ('delete', (['x', 'a'],))]),
+                          ('a = 1\nb = 2\n', [('insert_key', ([], 'c', 3)), ('delete', (['b'],)), ('insert_key', ([], 'd', 4))])):
+        ast = check_roundtrip_edits(source, edits)
+        assert list(bespon.loads(ast.dumps()).items()) == list(ast.value.items())
+    ast = check_roundtrip_edits('x = {a = 1, b = 2, c = 3, d = 4}', [('insert_key', (['x'], 'y', 5, 'c')), ('delete', (['x', 'c'],)), ('delete', (['x', 'b'],)),
+                                                                     ('insert_key', (['x'], 'z', 6)), ('delete', (['x', 'a'],))])
+    assert ast.dumps() == 'x = {y = 5, d = 4, z = 6}\n'
+
+
+def test_delete_subtree_ending_with_inline_collection():
+    ast = check_roundtrip_edits('root0 =\n  * true\n  * [\n        1,\n        2\n    ]\nroot1 = 2\n',
+                                [('delete', (['root0'],))])
+    assert ast.dumps() == 'root1 = 2\n'
+    ast = check_roundtrip_edits('a =\n  b =\n    c = 1\n  d = {\n    e = 1\n  }\nz = 1\n',
+                                [('delete', (['a'],))])
+    assert ast.dumps() == 'z = 1\n'
+
+
+def test_edit_after_replacement():
+    for source, path, new, edits in (('d = [1]\n', ['d'], [5, 6], [('append', (['d'], 7))]),
+                                     ('x = {a = 1}\n', ['x'], {'b': 1}, [('insert_key', (['x'], 'c', 2)), ('delete', (['x', 'a'],))]),
+                                     ('r = [0, [1]]\n', ['r', 1], [], [('delete', (['r', 1, 0],)), ('append', (['r', 1], 2)), ('replace_val', (['r', 1, 0], 3))]),
+                                     ('r = {a = {b = 1}}\n', ['r'], {}, [('insert_key', (['r', 'a'], 'c', 2)), ('replace_key', (['r', 'a', 'b'], 'c'))])):
+        ast = bespon.loads_roundtrip_ast(source)
+        original_new = repr(new)
+        ast.replace_val(path, new)
+        output = ast.dumps()
+        value = ast.value
+        for method, args in edits:
+            with pytest.raises(NotImplementedError):
+                getattr(ast, method)(*args)
+            assert ast.dumps() == output
+            assert ast.value == value == bespon.loads(output)
+        assert repr(new) == original_new
+    ast = bespon.loads_roundtrip_ast('r = {a = {b = 1}}\n')
+    with pytest.raises(NotImplementedError):
+        ast.apply_edits([(['r'], 'replace_val', {}), (['r', 'a', 'b'], 'replace_val', 2)])
+    assert ast.dumps() == 'r = {a = {b = 1}}\n'
+    check_roundtrip_edits('r = [[1], 2]\n', [('replace_val', (['r', 0], [3])), ('replace_val', (['r', 0], [4])),
+                                              ('delete', (['r', 0],)), ('append', (['r'], 5))])
+
+
+def test_insertion_in_multiline_inline_collection():
+    ast = check_roundtrip_edits('x = {\n    a = 1,\n    b = {\n        c = 2\n    }\n}\ny = [\n    1,\n    [2, 3],\n]\nz = {a = 1,\n     b = 2}\n',
+                                [('insert_key', (['x'], 't', 1.5, 'b')),
+                                 ('insert_key', (['x'], 'v', {'e': None, 'f': [1, {'g': 2}]})),
+                                 ('insert_key', (['x'], 'u', 1, 'a')),
+                                 ('append', (['y'], {'e': None})),
+                                 ('insert_key', (['z'], 'c', 3))])
+    assert ast.dumps() == ('x = {\n    a = 1,\n    u = 1,\n    b = {\n        c = 2\n    },\n    t = 1.5,\n'
+                           '    v = {\n        e = none,\n        f = [\n            1,\n            {\n                g = 2\n            }\n        ]\n    }\n}\n'
+                           'y = [\n    1,\n    [2, 3],\n    {\n        e = none\n    },\n]\n'
+                           'z = {a = 1,\n     b = 2,\n     c = 3}\n')
+    ast = check_roundtrip_edits('x = {\n    a = 1,\n    b = 2\n}\n', [('insert_key', (['x'], 't', 3, 'a')),
+                                                                   ('delete', (['x', 'a'],))])
+    assert ast.dumps() == 'x = {\n    t = 3,\n    b = 2\n}\n'
+
+
+def test_list_element_index():
+    ast = check_roundtrip_edits('x = [1, 2, 3]', [('replace_val', (['x', 2], 9)),
+                                                  ('replace_val', (['x', 0], 7))])
+    assert ast.value == {'x': [7, 2, 9]}
+    ast = check_roundtrip_edits('x = [1, 2, 3]', [('delete', (['x', 0],)),
+                                                  ('replace_val', (['x', 1], 9))])
+    assert ast.value == {'x': [2, 9]}
+
+
+def check_merge(base, other, target=None):
+    changes = bespon.loads_roundtrip_ast(base).diff(bespon.loads_roundtrip_ast(other))
+    ast = bespon.loads_roundtrip_ast(base if target is None else target)
+    ast.apply_changes(changes)
+    assert bespon.loads(ast.dumps()) == ast.value
+    return ast
+
+
+def test_diff_apply_changes():
+    for base, other in [('r0 = [none]', 'r0 = [chg, 7]'),
+                        ('r2 =\n k4 = s\n k5 = none\n', 'r2 =\n k4 = s\n k5 = chg\n new1 = 1\n'),
+                        ('a = 1\nb = 0x10\nc = [1, 2]\n', 'a = "x"\nb = "y"\nc = {k = 1}\n'),
+                        ('x = {a = 1, b = 2, c = [1, 2, 3]}', 'x = {a = 1, b = 2, c = [1, 5], d = 4}')]:
+        ast = check_merge(base, other)
+        assert ast.value == bespon.loads(other)
+        ast = check_merge(base, other, other)
+        assert ast.dumps() == other + ('' if other.endswith('\n') else '\n')
+    ast = check_merge('a = 1  # a\nb = 2\n', 'a = 1  # a\nb = 3\n', 'a = 1  # comment\nb = 2\n')
+    assert ast.dumps() == 'a = 1  # comment\nb = 3\n'
+    ast = check_merge('x = {a = 1, b = 2, c = [1, 2, 3]}', 'x = {a = 1, bb = 2, c = [1, 5], d = 4}')
+    assert ast.value == bespon.loads('x = {a = 1, bb = 2, c = [1, 5], d = 4}')
+
+
+def test_apply_changes_conflict():
+    changes = bespon.loads_roundtrip_ast('a = 1\nb = 2\n').diff(bespon.loads_roundtrip_ast('a = 5\nb = 6\n'))
+    ast = bespon.loads_roundtrip_ast('a = 1\nb = 3\n')
+    try:
+        ast.apply_changes(changes)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError
+    assert ast.dumps() == 'a = 1\nb = 3\n'
+
+
+def test_apply_changes_atomic():
+    # The last change would delete the only remaining key of `d`
+    base = 'h = 2\nc = 1\nd =\n    a = true\n    e = abc\n'
+    changes = bespon.loads_roundtrip_ast(base).diff(bespon.loads_roundtrip_ast('h = none\nc = 1\nd =\n    o = abc\n'))
+    ast = bespon.loads_roundtrip_ast(base)
+    with pytest.raises(NotImplementedError):
+        ast.apply_changes(changes)
+    assert ast.dumps() == base
+    assert ast.value == bespon.loads(base)
+    # The append would follow an element that does not start on the line of
+    # its `*`
+    changes = bespon.loads_roundtrip_ast('a = 1\nb =\n  * 1\n').diff(bespon.loads_roundtrip_ast('a = 2\nb =\n  * 1\n  * 2\n'))
+    target = 'a = 1\nb =\n  * 1\n  *\n    c = 3\n'
+    ast = bespon.loads_roundtrip_ast(target)
+    with pytest.raises(NotImplementedError):
+        ast.apply_changes(changes)
+    assert ast.dumps() == target
+    assert ast.value == {'a': 1, 'b': [1, {'c': 3}]}
+    # Later changes are checked against the data as it will be after
+    # earlier changes
+    ast = check_merge('x =\n  a = 1\n  b = 2\n', 'x =\n  aa = 1\n  n = 0\n  b = 2\n')
+    assert ast.dumps() == 'x =\n  aa = 1\n  n = 0\n  b = 2\n'
+    ast = check_merge('x = [1, 2, 3]\n', 'x = [1]\n')
+    assert ast.dumps() == 'x = [1]\n'
+
+
+def test_replace_key_value():
+    ast = check_roundtrip_edits('x = {a = 1, b = 2, c = 3}', [('replace_key', (['x', 'b'], 'bb')),
+                                                              ('replace_key', (['x', 'a'], 'aa')),
+                                                              ('replace_key', (['x', 'c'], 'cc'))])
+    assert list(ast.value['x']) == ['aa', 'bb', 'cc']
+    for key in ('bb', 'aa'):
+        with pytest.raises(ValueError):
+            ast.replace_key(['x', 'cc'], key)
+    assert list(ast.value['x']) == ['aa', 'bb', 'cc']
+    assert bespon.loads(ast.dumps()) == ast.value
+
+
+def test_replace_key_after_insertion():
+    ast = check_roundtrip_edits('x = {a = 1, b = 2, c = 3}', [('replace_key', (['x', 'b'], 'bb')),
+                                                              ('replace_key', (['x', 'a'], 'aa')),
+                                                              ('insert_key', (['x'], 'z', 0, 'bb')),
+                                                              ('replace_key', (['x', 'c'], 'cc')),
+                                                              ('delete', (['x', 'aa'],))])
+    assert list(ast.value['x']) == ['bb', 'z', 'cc']
+    for key in ('bb', 'z'):
+        with pytest.raises(ValueError):
+            ast.replace_key(['x', 'cc'], key)
+    with pytest.raises(ValueError):
+        ast.apply_edits([(['x', 'cc'], 'replace_key', 'z')])
+    assert list(ast.value['x']) == ['bb', 'z', 'cc']
+    assert bespon.loads(ast.dumps()) == ast.value
+
+
+def test_apply_edits_atomic():
+    source = 'key =\n  first = 1  # comment\n  second = "x"\nother = 2\n'
+    ast = bespon.loads_roundtrip_ast(source)
+    for edits, exception in (([(['key', 'first'], 'replace_val', 2), (['key', 'second'], 'replace_val', 3)], TypeError),
+                             ([(['key', 'first'], 'replace_val', 2), (['key', 'missing'], 'replace_val', 3)], KeyError),
+                             ([(['key', 'first'], 'replace_val', 2), (['key'], 'replace_key', 'other')], ValueError),
+                             ([(['key'], 'replace_key', 'k'), (['key'], 'replace_key', 'j')], KeyError)):
+        with pytest.raises(exception):
+            ast.apply_edits(edits)
+        assert ast.dumps() == source
+        assert ast.value == bespon.loads(source)
+    ast.apply_edits([(['key', 'first'], 'replace_val', 5), (['key'], 'replace_key', 'k'),
+                     (('key', 'second'), 'replace_val', 'y'), (['other'], 'replace_val', 9)])
+    assert ast.dumps() == 'k =\n  first = 5  # comment\n  second = "y"\nother = 9\n'
+    assert ast.value == {'k': {'first': 5, 'second': 'y'}, 'other': 9}
+
+
+def test_alias_sites():
+    source = 'base = (label=b)> {x = 1}\nother = (label=o)> {y = 2}\nd = (init=$b)> {z = 3}\ng = {e = (init=[$b, $o])> {w = 4}, h = $o}\nn = (dict, default=$o)> {}\nf = $b\n'
+    ast = bespon.loads_roundtrip_ast(source)
+    def sites(label):
+        return [(node.first_lineno, node.first_colno) for node in ast.alias_sites(label)]
+    def dependents(path):
+        return [(node.first_lineno, node.first_colno) for node in ast[path].aliases]
+    assert sites('b') == dependents('base') == [(3, 11), (4, 17), (6, 5)]
+    assert sites('o') == dependents('other') == [(4, 21), (4, 40), (5, 20)]
+    ast.replace_val(['g'], {'w': 4})
+    assert sites('b') == dependents('base') == [(3, 11), (6, 5)]
+    assert sites('o') == dependents('other') == [(5, 20)]
+    ast.replace_key(['d'], 'e')
+    assert dependents('base') == [(3, 11), (6, 5)]
+
+
+def test_alias_sites_after_delete():
+    source = 'base = (label=b)> {x = 1}\nd = (init=$b)> {z = 3}\nf = $b\n'
+    ast = bespon.loads_roundtrip_ast(source)
+    assert [(node.first_lineno, node.first_colno) for node in ast['base'].aliases] == [(2, 11), (3, 5)]
+    ast.delete(['f'])
+    assert [(node.first_lineno, node.first_colno) for node in ast.alias_sites('b')] == [(2, 11)]
+    assert [(node.first_lineno, node.first_colno) for node in ast['base'].aliases] == [(2, 11)]
+
+
+def check_patch(source, edits):
+    ast = check_roundtrip_edits(source, edits)
+    for context in (0, 1, 3):
+        patch = io.StringIO()
+        ast.write_patch(patch, context=context)
+        assert patch.getvalue() == ''.join(difflib.unified_diff(source.splitlines(True), ast.dumps().splitlines(True),
+                                                                '<data>', '<data>', n=context))
+
+
+def test_write_patch():
+    source = ''.join('a{0} = {0}\n'.format(n) for n in range(10)) + 'd =\n  x = 1\n  y = 2\nl = [1, 2]\n'
+    for edits in ([('replace_val', (['a2'], 5))],
+                  [('replace_val', (['d', 'x'], 7)), ('replace_val', (['a8'], 80))],
+                  [('replace_key', (['a6'], 'b')), ('replace_val', (['a5'], 0)), ('replace_val', (['l'], [3]))]):
+        check_patch(source, edits)
+
+
+def test_write_patch_insertions():
+    source = ''.join('a{0} = {0}\n'.format(n) for n in range(10)) + 'd =\n  x = 1\n  y = 2\nl = [1, 2]\n'
+    for edits in ([('insert_key', ([], 'b', 1, 'a3'))],
+                  [('insert_key', (['d'], 'z', 3, 'x')), ('append', (['l'], 3))],
+                  [('insert_key', ([], 'b', {'c': [1, 2]}, 'a1')), ('replace_val', (['a2'], 5))],
+                  [('delete', (['a5'],)), ('replace_key', (['a6'], 'b')), ('insert_key', ([], 'c', 2, 'b'))]):
+        check_patch(source, edits)